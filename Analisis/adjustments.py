@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+#3.13 Eventos corporativos: splits y dividendos
+
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from Datos.prices import PRICE_DTYPE, PriceStore
+
+
+@dataclass
+class CorporateAction:
+    """Split o dividendo de un símbolo, efectivo desde la fecha ex (inclusive)"""
+    symbol: str
+    ex_date: np.datetime64
+    kind: str                   # 'split' o 'dividend'
+    value: float                # Acciones nuevas por acción (split) o monto por acción (dividendo)
+    factor: float               # Factor de ajuste de los precios anteriores a ex_date
+
+
+class _SymbolActions:
+    """Eventos de un símbolo ordenados por fecha con sus factores acumulados desde el final."""
+
+    def __init__(self):
+        self.actions: List[CorporateAction] = []
+        self.dates = np.zeros(0, dtype='datetime64[D]')
+        self.factors = np.zeros(0)
+        self.split_factors = np.zeros(0)
+        # price[k] = producto de los factores de los eventos k..n-1 (price[n] = 1)
+        self.price = np.ones(1)
+        self.split = np.ones(1)
+
+    def insert(self, action: CorporateAction):
+        position = int(np.searchsorted(self.dates, action.ex_date, side='right'))
+        self.actions.insert(position, action)
+        self.dates = np.insert(self.dates, position, action.ex_date)
+        self.factors = np.insert(self.factors, position, action.factor)
+        self.split_factors = np.insert(self.split_factors, position, action.factor if action.kind == 'split' else 1.0)
+        self.price = np.append(np.cumprod(self.factors[::-1])[::-1], 1.0)
+        self.split = np.append(np.cumprod(self.split_factors[::-1])[::-1], 1.0)
+
+
+class CorporateActions:
+    """
+    Registro de splits y dividendos por símbolo. El historial guardado no se modifica:
+    las series ajustadas se calculan al pedirlas multiplicando por el factor acumulado de
+    los eventos posteriores a cada fecha, que se obtiene con una búsqueda binaria sobre las
+    fechas de los eventos. Agregar un evento solo recalcula los factores del símbolo (O(eventos)).
+    Convenciones: un split 2:1 tiene factor 1/2 para los precios anteriores y multiplica
+    por 2 las cantidades anteriores; un dividendo D con cierre previo P tiene factor 1 - D / P.
+    """
+
+    def __init__(self, price_store: Optional[PriceStore] = None):
+        """
+        :param price_store: Almacén de precios (para el cierre previo de los dividendos y
+                            las series ajustadas).
+        """
+        self.price_store = price_store
+        self.version = 0
+        self._symbols: Dict[str, _SymbolActions] = {}
+
+    def actions(self, symbol: str) -> List[CorporateAction]:
+        """
+        Eventos de un símbolo en orden de fecha.
+        :param symbol: Símbolo del activo.
+        :return: Lista de CorporateAction.
+        """
+        entry = self._symbols.get(symbol)
+        return list(entry.actions) if entry is not None else []
+
+    def _add(self, action: CorporateAction) -> CorporateAction:
+        self._symbols.setdefault(action.symbol, _SymbolActions()).insert(action)
+        self.version += 1
+        return action
+
+    def add_split(self, symbol: str, ex_date, ratio: float) -> CorporateAction:
+        """
+        Registra un split.
+        :param symbol: Símbolo del activo.
+        :param ex_date: Primera fecha con el precio ya dividido.
+        :param ratio: Acciones nuevas por cada acción anterior (2.0 para un 2:1, 0.1 para un contrasplit 1:10).
+        :return: CorporateAction registrado.
+        """
+        if ratio <= 0:
+            raise ValueError("El ratio del split debe ser positivo.")
+        return self._add(CorporateAction(symbol, np.datetime64(ex_date, 'D'), 'split', float(ratio), 1.0 / ratio))
+
+    def add_dividend(self, symbol: str, ex_date, amount: float,
+                     previous_close: Optional[float] = None) -> CorporateAction:
+        """
+        Registra un dividendo en efectivo.
+        :param symbol: Símbolo del activo.
+        :param ex_date: Fecha ex del dividendo.
+        :param amount: Monto por acción.
+        :param previous_close: Cierre del día hábil anterior a la fecha ex (por defecto, del
+                               almacén de precios).
+        :return: CorporateAction registrado.
+        """
+        ex_date = np.datetime64(ex_date, 'D')
+        if previous_close is None:
+            if self.price_store is None:
+                raise ValueError("Sin almacén de precios hay que indicar el cierre previo.")
+            history = self.price_store.history(symbol, end=ex_date - np.timedelta64(1, 'D'))
+            if not len(history):
+                raise ValueError(f"No hay cierres de {symbol} anteriores a {ex_date}.")
+            previous_close = float(history['close'][-1])
+        if amount < 0 or amount >= previous_close:
+            raise ValueError("El dividendo debe ser no negativo y menor que el cierre previo.")
+        return self._add(CorporateAction(symbol, ex_date, 'dividend', float(amount), 1.0 - amount / previous_close))
+
+    def _factors(self, symbol: str, dates, splits_only: bool) -> np.ndarray:
+        dates = np.asarray(dates, dtype='datetime64[D]')
+        entry = self._symbols.get(symbol)
+        if entry is None:
+            return np.ones(dates.shape)
+        cumulative = entry.split if splits_only else entry.price
+        return cumulative[np.searchsorted(entry.dates, dates, side='right')]
+
+    def price_factors(self, symbol: str, dates) -> np.ndarray:
+        """
+        Factor por el que se multiplica el precio de cada fecha para llevarlo a términos actuales.
+        :param symbol: Símbolo del activo.
+        :param dates: Fechas.
+        :return: Factores (1 después del último evento).
+        """
+        return self._factors(symbol, dates, splits_only=False)
+
+    def split_factors(self, symbol: str, dates) -> np.ndarray:
+        """
+        Factor de splits de cada fecha (los dividendos no cambian cantidades).
+        :param symbol: Símbolo del activo.
+        :param dates: Fechas.
+        :return: Factores (las cantidades se dividen por ellos).
+        """
+        return self._factors(symbol, dates, splits_only=True)
+
+    def adjust_prices(self, symbol: str, dates, prices) -> np.ndarray:
+        """
+        Precios ajustados por splits y dividendos.
+        :param symbol: Símbolo del activo.
+        :param dates: Fecha de cada precio.
+        :param prices: Precios sin ajustar.
+        :return: Nuevo array con los precios ajustados.
+        """
+        return np.asarray(prices, dtype=np.float64) * self.price_factors(symbol, dates)
+
+    def adjust_quantities(self, symbol: str, dates, quantities) -> np.ndarray:
+        """
+        Cantidades históricas expresadas en acciones actuales (ajustadas por splits).
+        :param symbol: Símbolo del activo.
+        :param dates: Fecha de cada cantidad.
+        :param quantities: Cantidades sin ajustar.
+        :return: Nuevo array con las cantidades ajustadas.
+        """
+        return np.asarray(quantities, dtype=np.float64) / self.split_factors(symbol, dates)
+
+    def adjusted_history(self, symbol: str, start=None, end=None) -> np.ndarray:
+        """
+        Historial del almacén de precios con OHLC ajustados y volumen ajustado por splits.
+        :param symbol: Símbolo del activo.
+        :param start: Fecha inicial (opcional).
+        :param end: Fecha final (opcional).
+        :return: Copia con PRICE_DTYPE (el archivo no se modifica).
+        """
+        if self.price_store is None:
+            raise ValueError("No hay almacén de precios configurado.")
+        history = np.array(self.price_store.history(symbol, start, end), dtype=PRICE_DTYPE)
+        dates = history['date'].astype('datetime64[D]')
+        factors = self.price_factors(symbol, dates)
+        for name in ('open', 'high', 'low', 'close'):
+            history[name] *= factors
+        history['volume'] /= self.split_factors(symbol, dates)
+        return history
+
+    def adjust_matrix(self, symbols: Sequence[Optional[str]], dates, prices: np.ndarray,
+                      splits_only: bool = False) -> np.ndarray:
+        """
+        Ajusta una matriz fechas x símbolos (como la de PriceStore.closes).
+        :param symbols: Símbolo de cada columna (None deja la columna sin cambios).
+        :param dates: Calendario de las filas.
+        :param prices: Matriz de precios sin ajustar.
+        :param splits_only: Si solo se ajustan los splits (precios por acción actual, para valuar
+                            junto con cantidades de adjust_quantity_column).
+        :return: Nueva matriz ajustada.
+        """
+        adjusted = np.array(prices, dtype=np.float64)
+        for column, symbol in enumerate(symbols):
+            if symbol in self._symbols:
+                adjusted[:, column] *= self._factors(symbol, dates, splits_only)
+        return adjusted
+
+    def _adjust_rows(self, symbols: Sequence[Optional[str]], codes: np.ndarray, dates, values,
+                     adjust: Callable[[str, np.ndarray, np.ndarray], np.ndarray]) -> np.ndarray:
+        adjusted = np.array(values, dtype=np.float64)
+        dates = np.asarray(dates, dtype='datetime64[D]')
+        for code, symbol in enumerate(symbols):
+            if symbol in self._symbols:
+                rows = np.nonzero(codes == code)[0]
+                adjusted[rows] = adjust(symbol, dates[rows], adjusted[rows])
+        return adjusted
+
+    def adjust_quantity_column(self, symbols: Sequence[Optional[str]], codes: np.ndarray, dates,
+                               quantities) -> np.ndarray:
+        """
+        Ajusta por splits una columna de cantidades de varios activos (como la del libro de
+        transacciones), expresándolas en acciones actuales.
+        :param symbols: Símbolo de cada código de activo (None deja sus filas sin cambios).
+        :param codes: Código de activo de cada fila.
+        :param dates: Fecha de cada fila.
+        :param quantities: Cantidades sin ajustar.
+        :return: Nuevo array con las cantidades ajustadas.
+        """
+        return self._adjust_rows(symbols, codes, dates, quantities, self.adjust_quantities)
+
+    def adjust_price_column(self, symbols: Sequence[Optional[str]], codes: np.ndarray, dates, prices,
+                            splits_only: bool = False) -> np.ndarray:
+        """
+        Ajusta una columna de precios de varios activos (como la del libro de transacciones).
+        :param symbols: Símbolo de cada código de activo (None deja sus filas sin cambios).
+        :param codes: Código de activo de cada fila.
+        :param dates: Fecha de cada fila.
+        :param prices: Precios sin ajustar.
+        :param splits_only: Si solo se ajustan los splits (precio por acción actual).
+        :return: Nuevo array con los precios ajustados.
+        """
+        return self._adjust_rows(symbols, codes, dates, prices,
+                                 lambda symbol, days, values: values * self._factors(symbol, days, splits_only))
+
+def _benchmark(days: int = 10_000, events: int = 200, symbols: int = 500):
+    """Mide el alta de eventos y el cálculo de series ajustadas."""
+    import time
+
+    rng = np.random.default_rng(0)
+    dates = np.arange(np.datetime64('1990-01-01'), np.datetime64('1990-01-01') + days)
+    actions = CorporateActions()
+    started = time.perf_counter()
+    for code in range(symbols):
+        for ex_date in np.sort(rng.choice(dates, events, replace=False)):
+            if rng.random() < 0.1:
+                actions.add_split(f"S{code}", ex_date, 2.0)
+            else:
+                actions.add_dividend(f"S{code}", ex_date, 0.5, previous_close=100.0)
+    added = time.perf_counter() - started
+
+    prices = 100 * np.cumprod(1 + rng.normal(0, 0.01, (days, symbols)), axis=0)
+    started = time.perf_counter()
+    adjusted = actions.adjust_matrix([f"S{code}" for code in range(symbols)], dates, prices)
+    elapsed = time.perf_counter() - started
+    print(f"{symbols * events:,} eventos en {symbols:,} símbolos: {added:.2f} s")
+    print(f"  matriz ajustada {adjusted.shape}: {elapsed * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    _benchmark()
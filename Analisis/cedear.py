@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+#3.12 CEDEARs: ratios de conversión y dólar MEP / CCL
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from Analisis.fx import FxRateStore
+from Entidades.holdings import HoldingsTable
+from Entidades.models import AssetType
+
+# Canales de dólar admitidos: pesos por dólar según la operatoria
+DOLLAR_RATES = ('MEP', 'CCL')
+
+
+@dataclass
+class CedearReport:
+    """Valuación de las tenencias de CEDEARs contra su subyacente (una entrada por fila)"""
+    dollar: str
+    asset_ids: List[str]
+    symbols: List[str]
+    ratio: np.ndarray
+    underlying_price: np.ndarray
+    implied_price: np.ndarray
+    market_price: np.ndarray
+    gap: np.ndarray
+    implied_rate: np.ndarray
+    reference_rate: float
+
+    def by_asset(self) -> Dict[str, Dict[str, float]]:
+        """
+        Resume la valuación por activo.
+        :return: Diccionario asset_id -> {'ratio', 'underlying_price', 'implied_price',
+                 'market_price', 'gap', 'implied_rate'}.
+        """
+        columns = ('ratio', 'underlying_price', 'implied_price', 'market_price', 'gap', 'implied_rate')
+        return {asset_id: {name: float(getattr(self, name)[index]) for name in columns}
+                for index, asset_id in enumerate(self.asset_ids)}
+
+
+class CedearConverter:
+    """
+    Tabla de ratios de CEDEARs, precios de los subyacentes en dólares e historial del dólar
+    MEP y CCL (en pesos por dólar, guardados en un FxRateStore con esos nombres como monedas).
+    El reporte se calcula de una sola pasada vectorizada y se reutiliza mientras no cambie
+    ninguna de sus entradas (tenencias, ratios, precios o cotizaciones).
+    """
+
+    def __init__(self, rates: Optional[FxRateStore] = None):
+        self.rates = rates or FxRateStore(pivot='USD')
+        self.version = 0
+        self._index: Dict[str, int] = {}
+        self._underlying: List[str] = []
+        self._ratios = np.zeros(0)
+        self._underlying_prices = np.zeros(0)
+        self._rows_cache: Optional[tuple] = None
+        self._report_cache: Optional[tuple] = None
+
+    def set_ratio(self, symbol: str, underlying: str, ratio: float):
+        """
+        Registra el ratio de un CEDEAR.
+        :param symbol: Símbolo del CEDEAR (por ejemplo 'AAPL').
+        :param underlying: Símbolo del subyacente en su mercado de origen.
+        :param ratio: Cantidad de CEDEARs que equivalen a una acción del subyacente.
+        """
+        self.set_ratios([symbol], [underlying], [ratio])
+
+    def set_ratios(self, symbols: Sequence[str], underlyings: Sequence[str], ratios: Sequence[float]):
+        """
+        Registra o actualiza varios ratios.
+        :param symbols: Símbolos de los CEDEARs.
+        :param underlyings: Símbolos de los subyacentes.
+        :param ratios: Ratios de conversión (CEDEARs por acción).
+        """
+        ratios = np.asarray(ratios, dtype=np.float64)
+        if not (len(symbols) == len(underlyings) == len(ratios)):
+            raise ValueError("Símbolos, subyacentes y ratios deben tener el mismo largo.")
+        if (ratios <= 0).any():
+            raise ValueError("Los ratios deben ser positivos.")
+        added = [symbol for symbol in dict.fromkeys(symbols) if symbol not in self._index]
+        if added:
+            start = len(self._underlying)
+            self._index.update((symbol, start + offset) for offset, symbol in enumerate(added))
+            self._underlying.extend([''] * len(added))
+            self._ratios = np.concatenate((self._ratios, np.full(len(added), np.nan)))
+            self._underlying_prices = np.concatenate((self._underlying_prices, np.full(len(added), np.nan)))
+        positions = np.array([self._index[symbol] for symbol in symbols], dtype=np.int64)
+        self._ratios[positions] = ratios
+        for position, underlying in zip(positions.tolist(), underlyings):
+            self._underlying[position] = underlying
+        self.version += 1
+
+    def set_underlying_prices(self, prices: Dict[str, float]):
+        """
+        Actualiza los precios en dólares de los subyacentes (un nuevo snapshot de precios).
+        :param prices: Diccionario símbolo del subyacente -> precio en USD.
+        """
+        self._underlying_prices = np.array([prices.get(underlying, price) for underlying, price
+                                            in zip(self._underlying, self._underlying_prices.tolist())])
+        self.version += 1
+
+    def add_dollar_rates(self, dollar: str, dates: Sequence, rates: Sequence[float]):
+        """
+        Agrega cotizaciones históricas del dólar MEP o CCL.
+        :param dollar: 'MEP' o 'CCL'.
+        :param dates: Fechas.
+        :param rates: Pesos por dólar.
+        """
+        if dollar not in DOLLAR_RATES:
+            raise ValueError(f"Dólar desconocido: {dollar}")
+        self.rates.add_rates(dollar, dates, rates)
+
+    def _rows(self, holdings: HoldingsTable):
+        """Filas de CEDEARs y su posición en la tabla de ratios (-1 si no tiene ratio)."""
+        key = (holdings.version, self.version)
+        if self._rows_cache is None or self._rows_cache[0] != key:
+            rows = np.flatnonzero(holdings.column('type_code') == AssetType.CEDEAR.value)
+            symbols = holdings.text_column('symbol')
+            positions = np.array([self._index.get(symbols[row], -1) for row in rows.tolist()], dtype=np.int64)
+            self._rows_cache = (key, rows, positions)
+        return self._rows_cache[1], self._rows_cache[2]
+
+    def report(self, holdings: HoldingsTable, dollar: str = 'CCL', as_of=None) -> CedearReport:
+        """
+        Valúa todos los CEDEARs de la tabla contra su subyacente:
+        precio implícito en pesos = precio del subyacente (USD) * dólar / ratio,
+        brecha = precio de mercado / precio implícito - 1,
+        dólar implícito = precio de mercado * ratio / precio del subyacente.
+        Los CEDEARs cotizados en USD se pasan a pesos con el mismo dólar. Sin ratio,
+        precio del subyacente o cotización, los resultados quedan en NaN.
+        :param holdings: Tabla de tenencias.
+        :param dollar: 'MEP' o 'CCL'.
+        :param as_of: Fecha del dólar (por defecto, la última cotización).
+        :return: CedearReport.
+        """
+        if dollar not in DOLLAR_RATES:
+            raise ValueError(f"Dólar desconocido: {dollar}")
+        reference = float(self.rates.rates([dollar], as_of)[0])
+        key = (holdings.version, self.version, self.rates.version, dollar, as_of)
+        if self._report_cache is not None and self._report_cache[0] == key:
+            return self._report_cache[1]
+
+        rows, positions = self._rows(holdings)
+        known = positions >= 0
+        safe = np.where(known, positions, 0)
+        ratio = np.where(known, self._ratios[safe] if len(self._ratios) else np.nan, np.nan)
+        underlying_price = np.where(known, self._underlying_prices[safe] if len(self._ratios) else np.nan, np.nan)
+
+        prices = holdings.column('current_price')[rows].astype(np.float64)
+        currency_labels = holdings.labels('currency')
+        in_dollars = np.array([currency_labels[code] == 'USD' for code in holdings.column('currency_code')[rows].tolist()],
+                              dtype=bool)
+        market_price = np.where(in_dollars, prices * reference, prices)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            implied_price = underlying_price * reference / ratio
+            gap = market_price / implied_price - 1.0
+            implied_rate = market_price * ratio / underlying_price
+
+        ids = holdings.text_column('id')
+        symbols = holdings.text_column('symbol')
+        result = CedearReport(
+            dollar=dollar,
+            asset_ids=[ids[row] for row in rows.tolist()],
+            symbols=[symbols[row] for row in rows.tolist()],
+            ratio=ratio,
+            underlying_price=underlying_price,
+            implied_price=implied_price,
+            market_price=market_price,
+            gap=gap,
+            implied_rate=implied_rate,
+            reference_rate=reference,
+        )
+        self._report_cache = (key, result)
+        return result
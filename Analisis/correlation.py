@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+#3.8 Covarianza y correlación incrementales entre activos
+
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+
+def _clean(returns: np.ndarray) -> np.ndarray:
+    """Reemplaza los rendimientos no finitos (sin precio previo) por cero."""
+    returns = np.asarray(returns, dtype=np.float64)
+    return np.where(np.isfinite(returns), returns, 0.0)
+
+
+class OnlineCovariance:
+    """
+    Matriz de covarianza de rendimientos que se actualiza en línea (Welford) al llegar
+    cada día nuevo, sin recalcular la matriz completa. Los lotes de días se combinan con
+    la fórmula de Chan, que da el mismo resultado que procesar los días de a uno.
+    Los rendimientos faltantes (NaN) cuentan como cero, igual que un precio sin cambios
+    en la valuación completada hacia adelante.
+    """
+
+    def __init__(self, asset_ids: Sequence[str]):
+        self.asset_ids: List[str] = list(asset_ids)
+        size = len(self.asset_ids)
+        self.count = 0
+        self.mean = np.zeros(size)
+        self._comoment = np.zeros((size, size))
+
+    def __len__(self) -> int:
+        return len(self.asset_ids)
+
+    def update(self, returns: np.ndarray):
+        """
+        Agrega un día de rendimientos (actualización de rango uno).
+        :param returns: Array con un rendimiento por activo, en el orden de asset_ids.
+        """
+        returns = _clean(returns)
+        if returns.shape != self.mean.shape:
+            raise ValueError("Se espera un rendimiento por activo.")
+        self.count += 1
+        before = returns - self.mean
+        self.mean += before / self.count
+        self._comoment += np.outer(before, returns - self.mean)
+
+    def update_batch(self, returns: np.ndarray):
+        """
+        Agrega varios días de rendimientos de una vez.
+        :param returns: Matriz días x activos, en el orden de asset_ids.
+        """
+        returns = _clean(returns)
+        if returns.ndim != 2 or returns.shape[1] != len(self.mean):
+            raise ValueError("Se espera una matriz días x activos.")
+        added = len(returns)
+        if not added:
+            return
+        batch_mean = returns.mean(axis=0)
+        centered = returns - batch_mean
+        batch_comoment = centered.T @ centered
+        total = self.count + added
+        delta = batch_mean - self.mean
+        self._comoment += batch_comoment + np.outer(delta, delta) * (self.count * added / total)
+        self.mean += delta * (added / total)
+        self.count = total
+
+    def covariance(self) -> np.ndarray:
+        """
+        Matriz de covarianza muestral.
+        :return: Matriz activos x activos (NaN si hay menos de dos días).
+        """
+        if self.count < 2:
+            return np.full(self._comoment.shape, np.nan)
+        return self._comoment / (self.count - 1)
+
+    def volatility(self) -> np.ndarray:
+        """
+        Desvío estándar de los rendimientos de cada activo.
+        :return: Array con un desvío por activo.
+        """
+        return np.sqrt(np.maximum(np.diag(self.covariance()), 0.0))
+
+    def correlation(self) -> np.ndarray:
+        """
+        Matriz de correlación. Los activos sin variación tienen correlación NaN con el resto.
+        :return: Matriz activos x activos con unos en la diagonal.
+        """
+        deviation = self.volatility()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result = self.covariance() / np.outer(deviation, deviation)
+        np.clip(result, -1.0, 1.0, out=result)
+        np.fill_diagonal(result, 1.0)
+        return result
+
+    def copy(self) -> 'OnlineCovariance':
+        """
+        Devuelve una copia independiente.
+        :return: Nuevo OnlineCovariance con el mismo historial.
+        """
+        return self.subset(self.asset_ids)
+
+    def subset(self, asset_ids: Sequence[str]) -> 'OnlineCovariance':
+        """
+        Devuelve una copia restringida a algunos activos.
+        :param asset_ids: Activos a conservar, en el orden deseado.
+        :return: Nuevo OnlineCovariance con el mismo historial.
+        """
+        positions = {asset_id: index for index, asset_id in enumerate(self.asset_ids)}
+        indices = np.array([positions[asset_id] for asset_id in asset_ids], dtype=np.int64)
+        result = OnlineCovariance(asset_ids)
+        result.count = self.count
+        result.mean = self.mean[indices].copy()
+        result._comoment = self._comoment[np.ix_(indices, indices)].copy()
+        return result
+
+
+def weighted_volatility(weights: np.ndarray, covariance: np.ndarray, periods_per_year: Optional[int] = None) -> float:
+    """
+    Volatilidad de una cartera a partir de sus pesos y la matriz de covarianza: sqrt(w' Σ w).
+    :param weights: Peso de cada activo (en el orden de la matriz).
+    :param covariance: Matriz de covarianza de rendimientos por período.
+    :param periods_per_year: Si se indica, anualiza el resultado.
+    :return: Volatilidad de la cartera.
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    variance = float(weights @ np.nan_to_num(covariance) @ weights)
+    volatility = np.sqrt(max(variance, 0.0))
+    return float(volatility * np.sqrt(periods_per_year)) if periods_per_year else float(volatility)
+
+
+def _benchmark(assets: int = 2_000, days: int = 252 * 5):
+    """Mide la carga inicial por lotes y la actualización de un día nuevo."""
+    import time
+
+    rng = np.random.default_rng(0)
+    returns = rng.normal(0.0, 0.02, size=(days, assets))
+    tracker = OnlineCovariance([f"asset-{code}" for code in range(assets)])
+
+    started = time.perf_counter()
+    tracker.update_batch(returns)
+    batch = time.perf_counter() - started
+
+    started = time.perf_counter()
+    tracker.update(rng.normal(0.0, 0.02, size=assets))
+    daily = time.perf_counter() - started
+
+    started = time.perf_counter()
+    tracker.correlation()
+    correlation = time.perf_counter() - started
+
+    print(f"{days:,} días / {assets:,} activos")
+    print(f"  carga inicial:      {batch:.2f} s")
+    print(f"  día nuevo:          {daily * 1000:.2f} ms")
+    print(f"  matriz correlación: {correlation * 1000:.2f} ms")
+
+
+if __name__ == '__main__':
+    _benchmark()
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+#3.11 Cotizaciones de monedas y valuación en moneda base
+
+import time
+from datetime import date
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Fecha usada para "la última cotización disponible"
+_LATEST = np.datetime64('9999-12-31', 'D')
+
+
+class FxRateStore:
+    """
+    Historial de cotizaciones por moneda con búsquedas "a la fecha" (as-of).
+    Todas las cotizaciones se expresan como unidades de la moneda por una unidad de la
+    moneda pivote (por ejemplo ARS 1000 por USD), así cualquier par se obtiene cruzando
+    contra el pivote. Los factores de conversión ya calculados se guardan en memoria con
+    un tiempo de vida (TTL); agregar cotizaciones los invalida.
+    """
+
+    def __init__(self, pivot: str = 'USD', ttl: float = 300.0,
+                 fetcher: Optional[Callable[[str], float]] = None):
+        """
+        :param pivot: Moneda pivote de las cotizaciones.
+        :param ttl: Segundos que se reutiliza un factor de conversión o una cotización obtenida.
+        :param fetcher: Función opcional moneda -> cotización actual contra el pivote; se consulta
+                        como mucho una vez por moneda cada `ttl` segundos.
+        """
+        self.pivot = pivot
+        self.ttl = ttl
+        self.fetcher = fetcher
+        self.version = 0
+        self._dates: Dict[str, np.ndarray] = {}
+        self._rates: Dict[str, np.ndarray] = {}
+        self._fetched: Dict[str, float] = {}
+        self._factors: Dict[Tuple[Tuple[str, ...], str, np.datetime64], Tuple[float, np.ndarray]] = {}
+
+    def currencies(self) -> list:
+        """Monedas con cotizaciones cargadas (además del pivote)."""
+        return sorted(self._dates)
+
+    def add_rates(self, currency: str, dates: Sequence, rates: Sequence[float]):
+        """
+        Agrega cotizaciones de una moneda. Si una fecha ya existía, prevalece la nueva.
+        :param currency: Código de la moneda (por ejemplo 'ARS').
+        :param dates: Fechas de las cotizaciones.
+        :param rates: Unidades de la moneda por unidad del pivote.
+        """
+        if currency == self.pivot:
+            raise ValueError("La moneda pivote no lleva cotización.")
+        new_dates = np.asarray(dates, dtype='datetime64[D]').reshape(-1)
+        new_rates = np.asarray(rates, dtype=np.float64).reshape(-1)
+        if len(new_dates) != len(new_rates):
+            raise ValueError("Fechas y cotizaciones deben tener el mismo largo.")
+        if (new_rates <= 0).any():
+            raise ValueError("Las cotizaciones deben ser positivas.")
+        if currency in self._dates:
+            new_dates = np.concatenate((self._dates[currency], new_dates))
+            new_rates = np.concatenate((self._rates[currency], new_rates))
+        # Orden estable invertido: ante fechas repetidas se conserva la última agregada
+        order = np.argsort(new_dates[::-1], kind='stable')
+        reversed_dates = new_dates[::-1][order]
+        reversed_rates = new_rates[::-1][order]
+        unique_dates, first = np.unique(reversed_dates, return_index=True)
+        self._dates[currency] = unique_dates
+        self._rates[currency] = reversed_rates[first]
+        self.version += 1
+        self._factors.clear()
+
+    def add_rate(self, currency: str, rate: float, on: Optional[date] = None):
+        """
+        Agrega una cotización puntual.
+        :param currency: Código de la moneda.
+        :param rate: Unidades de la moneda por unidad del pivote.
+        :param on: Fecha de la cotización (por defecto, hoy).
+        """
+        self.add_rates(currency, [on or date.today()], [rate])
+
+    def _refresh(self, currency: str):
+        """Consulta la cotización actual si hay fetcher y la anterior venció."""
+        if self.fetcher is None or currency == self.pivot:
+            return
+        fetched_at = self._fetched.get(currency)
+        if fetched_at is not None and time.monotonic() - fetched_at < self.ttl:
+            return
+        self._fetched[currency] = time.monotonic()
+        self.add_rate(currency, self.fetcher(currency))
+
+    def rates(self, currencies: Sequence[str], as_of=None) -> np.ndarray:
+        """
+        Cotizaciones contra el pivote vigentes a una fecha (la última publicada hasta esa fecha).
+        :param currencies: Códigos de moneda.
+        :param as_of: Fecha de referencia (por defecto, la última cotización).
+        :return: Array con una cotización por moneda (NaN si no hay cotización a esa fecha).
+        """
+        moment = _LATEST if as_of is None else np.datetime64(as_of, 'D')
+        result = np.full(len(currencies), np.nan)
+        for index, currency in enumerate(currencies):
+            if currency == self.pivot:
+                result[index] = 1.0
+                continue
+            if as_of is None:
+                self._refresh(currency)
+            dates = self._dates.get(currency)
+            if dates is None:
+                continue
+            position = np.searchsorted(dates, moment, side='right') - 1
+            if position >= 0:
+                result[index] = self._rates[currency][position]
+        return result
+
+    def factors(self, currencies: Sequence[str], to: str, as_of=None) -> np.ndarray:
+        """
+        Factores para convertir montos de cada moneda a la moneda destino. Se reutilizan
+        mientras no venza el TTL ni se agreguen cotizaciones.
+        :param currencies: Monedas de origen.
+        :param to: Moneda destino.
+        :param as_of: Fecha de referencia (por defecto, la última cotización).
+        :return: Array de factores (NaN si falta alguna cotización).
+        """
+        key = (tuple(currencies), to, _LATEST if as_of is None else np.datetime64(as_of, 'D'))
+        cached = self._factors.get(key)
+        now = time.monotonic()
+        if cached is not None and now < cached[0]:
+            return cached[1]
+        source = self.rates(currencies, as_of)
+        target = self.rates([to], as_of)[0]
+        factors = target / source
+        # Refrescar cotizaciones puede haber invalidado la caché: se guarda después
+        self._factors[key] = (now + self.ttl, factors)
+        return factors
+
+    def convert(self, amount: float, source: str, to: str, as_of=None) -> float:
+        """
+        Convierte un monto entre dos monedas.
+        :param amount: Monto en la moneda de origen.
+        :param source: Moneda de origen.
+        :param to: Moneda destino.
+        :param as_of: Fecha de referencia (por defecto, la última cotización).
+        :return: Monto convertido.
+        """
+        factor = self.factors([source], to, as_of)[0]
+        if np.isnan(factor):
+            raise ValueError(f"No hay cotización para convertir {source} a {to}.")
+        return amount * float(factor)
+
+    def convert_codes(self, amounts: np.ndarray, codes: np.ndarray, labels: Sequence[str], to: str,
+                      as_of=None) -> np.ndarray:
+        """
+        Convierte montos cuya moneda viene como código interno (por ejemplo, la columna
+        currency_code de HoldingsTable). Cada cotización se busca una sola vez por moneda y
+        se aplica a todas sus filas con una indexación.
+        :param amounts: Montos en la moneda de cada fila.
+        :param codes: Código de moneda de cada fila.
+        :param labels: Lista código -> moneda.
+        :param to: Moneda destino.
+        :param as_of: Fecha de referencia (por defecto, la última cotización).
+        :return: Montos convertidos.
+        """
+        used = np.unique(codes)
+        factors = np.full(len(labels), np.nan)
+        factors[used] = self.factors([labels[code] for code in used.tolist()], to, as_of)
+        missing = [labels[code] for code in used.tolist() if np.isnan(factors[code])]
+        if missing:
+            raise ValueError(f"No hay cotización para convertir {', '.join(map(str, missing))} a {to}.")
+        return np.asarray(amounts, dtype=np.float64) * factors[codes]
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+#3.1 Motor de agrupación de tenencias
+
+from typing import Dict, Optional, Sequence, Union
+
+import numpy as np
+
+from Entidades.holdings import CODED_COLUMNS, HoldingsTable
+from Entidades.models import AssetType
+
+# Dimensiones por las que se puede agrupar
+GROUP_DIMENSIONS = ('type',) + tuple(CODED_COLUMNS)
+
+_TYPE_CODE_COUNT = max(t.value for t in AssetType) + 1
+
+
+def _value_column(holdings: HoldingsTable, value) -> np.ndarray:
+    """Resuelve la columna de valores a agregar."""
+    if isinstance(value, np.ndarray):
+        if len(value) != len(holdings):
+            raise ValueError("La columna de valores debe tener una entrada por activo.")
+        return value.astype(np.float64, copy=False)
+    quantity = holdings.column('quantity')
+    if value == 'market_value':
+        return holdings.market_values()
+    if value == 'cost':
+        return quantity * holdings.column('purchase_price')
+    if value == 'unrealized_gain_loss':
+        return (holdings.column('current_price') - holdings.column('purchase_price')) * quantity
+    if value == 'quantity':
+        return quantity.astype(np.float64, copy=False)
+    raise ValueError(f"Valor de agregación desconocido: {value}")
+
+
+def group_holdings(holdings: HoldingsTable, by: Union[str, Sequence[str]] = 'type',
+                   value: Union[str, np.ndarray] = 'market_value',
+                   factors: Optional[np.ndarray] = None) -> Dict[object, Dict[str, float]]:
+    """
+    Agrupa las tenencias por una o más dimensiones en una sola pasada vectorizada.
+    :param holdings: Tabla de tenencias a agrupar.
+    :param by: Dimensión o lista de dimensiones de GROUP_DIMENSIONS.
+    :param value: 'market_value', 'cost', 'unrealized_gain_loss', 'quantity' o un array por activo.
+    :param factors: Factor de conversión de moneda por activo; se aplica a los montos (no a
+                    'quantity') para no sumar valores en monedas distintas.
+    :return: Diccionario grupo -> {'count', 'sum', 'weight', 'min', 'max'}. Con una sola
+             dimensión la clave es el valor del grupo; con varias, una tupla.
+    """
+    dimensions = (by,) if isinstance(by, str) else tuple(by)
+    for dimension in dimensions:
+        if dimension not in GROUP_DIMENSIONS:
+            raise ValueError(f"Dimensión de agrupación desconocida: {dimension}")
+    if not dimensions:
+        raise ValueError("Se necesita al menos una dimensión de agrupación.")
+
+    values = _value_column(holdings, value)
+    if factors is not None and not (isinstance(value, str) and value == 'quantity'):
+        values = values * factors
+    if len(holdings) == 0:
+        return {}
+
+    # Combina los códigos de cada dimensión en una única clave entera
+    codes, sizes = [], []
+    for dimension in dimensions:
+        if dimension == 'type':
+            codes.append(holdings.column('type_code'))
+            sizes.append(_TYPE_CODE_COUNT)
+        else:
+            codes.append(holdings.column(CODED_COLUMNS[dimension]))
+            sizes.append(max(len(holdings.labels(dimension)), 1))
+    keys = np.ravel_multi_index(codes, sizes)
+
+    unique_keys, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+    sums = np.bincount(inverse, weights=values, minlength=len(unique_keys))
+    order = np.argsort(inverse, kind='stable')
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    minimums = np.minimum.reduceat(values[order], starts)
+    maximums = np.maximum.reduceat(values[order], starts)
+    total = sums.sum()
+
+    group_codes = np.unravel_index(unique_keys, sizes)
+    result = {}
+    for g in range(len(unique_keys)):
+        key = []
+        for dimension, dimension_codes in zip(dimensions, group_codes):
+            code = int(dimension_codes[g])
+            key.append(AssetType(code) if dimension == 'type' else holdings.labels(dimension)[code])
+        result[key[0] if len(key) == 1 else tuple(key)] = {
+            'count': int(counts[g]),
+            'sum': float(sums[g]),
+            'weight': float(sums[g] / total) if total else 0.0,
+            'min': float(minimums[g]),
+            'max': float(maximums[g]),
+        }
+    return result
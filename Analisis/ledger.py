@@ -0,0 +1,367 @@
+# -*- coding: utf-8 -*-
+#3.2 Motor de reproducción del libro de transacciones
+
+import bisect
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from Entidades.models import Transaction, TransactionType
+
+# Columnas del libro y su tipo de dato
+LEDGER_COLUMNS = (
+    ('asset_code', np.int32),
+    ('type_code', np.int8),
+    ('date', np.int64),  # microsegundos desde 1970-01-01
+    ('price', np.float64),
+    ('quantity', np.float64),
+    ('fees', np.float64),
+)
+
+_BUY = TransactionType.BUY.value
+_SELL = TransactionType.SELL.value
+_TRANSFER = TransactionType.TRANSFER.value
+
+_INITIAL_CAPACITY = 1024
+
+
+def to_timestamp(date: datetime) -> int:
+    """Convierte una fecha a microsegundos desde 1970-01-01."""
+    return int(np.datetime64(date, 'us').astype(np.int64))
+
+
+def quantity_deltas(types: np.ndarray, quantities: np.ndarray) -> np.ndarray:
+    """
+    Variación de la posición que produce cada transacción.
+    :param types: Valores de TransactionType.
+    :param quantities: Cantidades registradas.
+    :return: Cantidad con signo (compras y entradas positivas, ventas y salidas negativas).
+    """
+    kinds = [types == _BUY, types == _SELL, types == _TRANSFER]
+    return np.select(kinds, [quantities, -np.abs(quantities), quantities], default=0.0)
+
+
+def cash_flows(types: np.ndarray, prices: np.ndarray, quantities: np.ndarray, fees: np.ndarray) -> np.ndarray:
+    """
+    Efecto en efectivo de cada transacción, comisiones incluidas.
+    :return: Monto con signo (compras negativas; ventas y dividendos positivos).
+    """
+    amounts = prices * quantities
+    kinds = [types == _BUY, types == _SELL, types == _TRANSFER]
+    return np.select(kinds, [-amounts, np.abs(amounts), 0.0], default=amounts) - fees
+
+
+def external_flows(types: np.ndarray, prices: np.ndarray, quantities: np.ndarray, fees: np.ndarray) -> np.ndarray:
+    """
+    Flujos externos de cada transacción desde el punto de vista del inversor: como cash_flows,
+    pero las transferencias valen precio * cantidad (una entrada es un aporte en especie y una
+    salida, un retiro). Es la convención del TWR (valuation.flow_series) y del MWR.
+    :return: Monto con signo (aportes negativos; retiros, ventas y dividendos positivos).
+    """
+    flows = cash_flows(types, prices, quantities, fees)
+    return flows - np.where(types == _TRANSFER, prices * quantities, 0.0)
+
+
+@dataclass
+class LedgerState:
+    """Posiciones, costo y efectivo derivados del libro hasta una fila dada"""
+    row: int
+    quantity: np.ndarray
+    cost_basis: np.ndarray
+    cash: float
+
+    def copy(self) -> 'LedgerState':
+        return LedgerState(self.row, self.quantity.copy(), self.cost_basis.copy(), self.cash)
+
+    def resized(self, asset_count: int) -> 'LedgerState':
+        """Devuelve una copia con lugar para `asset_count` activos."""
+        quantity = np.zeros(asset_count)
+        cost_basis = np.zeros(asset_count)
+        quantity[:len(self.quantity)] = self.quantity
+        cost_basis[:len(self.cost_basis)] = self.cost_basis
+        return LedgerState(self.row, quantity, cost_basis, self.cash)
+
+
+class TransactionLedger:
+    """
+    Libro columnar de transacciones que deriva posiciones, costo promedio y efectivo.
+    Guarda checkpoints periódicos del estado para que agregar transacciones solo
+    reproduzca las filas posteriores al último checkpoint válido.
+
+    Convenciones de reproducción:
+    - BUY: suma cantidad, suma precio * cantidad + comisiones al costo, resta ese monto del efectivo.
+    - SELL: resta la cantidad, reduce el costo en forma proporcional (costo promedio) y suma
+      precio * cantidad - comisiones al efectivo.
+    - DIVIDEND: suma precio * cantidad - comisiones al efectivo sin tocar la posición.
+    - TRANSFER: cantidad con signo; las entradas suman al costo a precio de la transferencia y
+      las salidas lo reducen en forma proporcional. Solo las comisiones afectan el efectivo.
+    """
+
+    def __init__(self, checkpoint_interval: int = 65536):
+        if checkpoint_interval <= 0:
+            raise ValueError("El intervalo de checkpoints debe ser positivo.")
+        self.checkpoint_interval = checkpoint_interval
+        self._size = 0
+        self._columns: Dict[str, np.ndarray] = {
+            name: np.zeros(_INITIAL_CAPACITY, dtype=dtype) for name, dtype in LEDGER_COLUMNS
+        }
+        self.asset_ids: List[str] = []
+        self._asset_codes: Dict[str, int] = {}
+        self._checkpoints: List[LedgerState] = []
+        self._head: Optional[LedgerState] = None
+
+    def __len__(self) -> int:
+        return self._size
+
+    def column(self, name: str) -> np.ndarray:
+        """
+        Devuelve la porción activa de una columna (sin copiar).
+        :param name: Nombre de la columna.
+        :return: Vista de NumPy con una entrada por transacción.
+        """
+        return self._columns[name][:self._size]
+
+    def asset_code(self, asset_id: str) -> int:
+        """
+        Devuelve el código interno de un activo, registrándolo si es nuevo.
+        :param asset_id: ID del activo.
+        :return: Código entero del activo.
+        """
+        code = self._asset_codes.get(asset_id)
+        if code is None:
+            code = self._asset_codes[asset_id] = len(self.asset_ids)
+            self.asset_ids.append(asset_id)
+        return code
+
+    # ------------------------------------------------------------------
+    # Carga de transacciones
+    # ------------------------------------------------------------------
+    def _grow(self, minimum: int):
+        capacity = len(self._columns['date'])
+        if minimum <= capacity:
+            return
+        while capacity < minimum:
+            capacity *= 2
+        for name, values in self._columns.items():
+            grown = np.zeros(capacity, dtype=values.dtype)
+            grown[:self._size] = values[:self._size]
+            self._columns[name] = grown
+
+    def append(self, transaction: Transaction):
+        """
+        Agrega una transacción. Si su fecha es anterior a la última se inserta en orden
+        y se descartan los checkpoints posteriores.
+        :param transaction: Instancia de Transaction a agregar.
+        """
+        self.extend_arrays(
+            np.array([self.asset_code(transaction.asset_id)]),
+            np.array([transaction.type.value]),
+            np.array([to_timestamp(transaction.date)]),
+            np.array([transaction.price]),
+            np.array([transaction.quantity]),
+            np.array([transaction.fees]),
+        )
+
+    def extend(self, transactions: Iterable[Transaction]):
+        """
+        Agrega varias transacciones de una vez.
+        :param transactions: Transacciones a agregar.
+        """
+        transactions = list(transactions)
+        if not transactions:
+            return
+        self.extend_arrays(
+            np.array([self.asset_code(t.asset_id) for t in transactions]),
+            np.array([t.type.value for t in transactions]),
+            np.array([t.date for t in transactions], dtype='datetime64[us]'),
+            np.array([t.price for t in transactions]),
+            np.array([t.quantity for t in transactions]),
+            np.array([t.fees for t in transactions]),
+        )
+
+    def extend_arrays(self, asset_codes, type_codes, dates, prices, quantities, fees):
+        """
+        Agrega transacciones ya codificadas como columnas (carga masiva).
+        :param asset_codes: Códigos de activo (ver asset_code).
+        :param type_codes: Valores de TransactionType.
+        :param dates: Fechas en microsegundos desde 1970-01-01 (o datetime64).
+        :param prices: Precios.
+        :param quantities: Cantidades.
+        :param fees: Comisiones.
+        """
+        dates = np.asarray(dates)
+        if np.issubdtype(dates.dtype, np.datetime64):
+            dates = dates.astype('datetime64[us]').astype(np.int64)
+        count = len(dates)
+        if count == 0:
+            return
+        incoming = {
+            'asset_code': asset_codes, 'type_code': type_codes, 'date': dates,
+            'price': prices, 'quantity': quantities, 'fees': fees,
+        }
+        if np.any(np.asarray(asset_codes) >= len(self.asset_ids)):
+            raise ValueError("Código de activo no registrado en el libro.")
+
+        start = self._size
+        self._grow(start + count)
+        for name, values in incoming.items():
+            self._columns[name][start:start + count] = values
+        self._size += count
+
+        # Mantiene el libro ordenado por fecha (orden estable para fechas iguales)
+        date_column = self.column('date')
+        first_dirty = start
+        if (start and date_column[start] < date_column[start - 1]) or np.any(np.diff(dates) < 0):
+            order = np.argsort(date_column, kind='stable')
+            moved = np.nonzero(order != np.arange(self._size))[0]
+            if len(moved):
+                first_dirty = int(moved[0])
+                for name in self._columns:
+                    self._columns[name][:self._size] = self._columns[name][:self._size][order]
+        self._invalidate(first_dirty)
+
+    def _invalidate(self, row: int):
+        """Descarta los estados guardados que dependen de filas >= row."""
+        keep = bisect.bisect_right([c.row for c in self._checkpoints], row)
+        del self._checkpoints[keep:]
+        if self._head is not None and self._head.row > row:
+            self._head = None
+
+    # ------------------------------------------------------------------
+    # Reproducción
+    # ------------------------------------------------------------------
+    def state(self) -> LedgerState:
+        """
+        Devuelve el estado al final del libro, reproduciendo solo desde el último
+        checkpoint (o estado final anterior) que siga siendo válido.
+        :return: LedgerState con una entrada por código de activo.
+        """
+        asset_count = len(self.asset_ids)
+        if self._head is not None and self._head.row == self._size and len(self._head.quantity) == asset_count:
+            return self._head
+        start = self._head if self._head is not None else None
+        if start is None and self._checkpoints:
+            start = self._checkpoints[-1]
+        if start is None:
+            start = LedgerState(0, np.zeros(0), np.zeros(0), 0.0)
+        self._head = self._replay(start.resized(asset_count))
+        return self._head
+
+    def _replay(self, state: LedgerState) -> LedgerState:
+        """Aplica las filas posteriores a state.row, guardando checkpoints en el camino."""
+        interval = self.checkpoint_interval
+        row = state.row
+        while row < self._size:
+            stop = min(self._size, (row // interval + 1) * interval)
+            self._apply(state, row, stop)
+            row = state.row = stop
+            if stop % interval == 0 and (not self._checkpoints or self._checkpoints[-1].row < stop):
+                self._checkpoints.append(state.copy())
+        return state
+
+    def _apply(self, state: LedgerState, start: int, stop: int):
+        """Aplica las filas [start, stop) sobre el estado."""
+        types = self._columns['type_code'][start:stop]
+        prices = self._columns['price'][start:stop]
+        quantities = self._columns['quantity'][start:stop]
+        fees = self._columns['fees'][start:stop]
+        amounts = prices * quantities
+
+        # Variación de cantidad con signo y efecto en efectivo, vectorizados
+        delta = quantity_deltas(types, quantities)
+        state.cash += float(cash_flows(types, prices, quantities, fees).sum())
+
+        # El costo promedio depende del orden: se recorre solo lo que mueve cantidad
+        moving = np.nonzero(delta)[0]
+        added_cost = np.where(types == _BUY, np.abs(amounts) + fees, np.abs(amounts))
+        quantity = state.quantity
+        cost = state.cost_basis
+        codes = self._columns['asset_code'][start:stop][moving].tolist()
+        for code, change, added in zip(codes, delta[moving].tolist(), added_cost[moving].tolist()):
+            held = quantity[code]
+            if change > 0:
+                cost[code] += added
+            elif held > 0:
+                cost[code] *= max(0.0, 1.0 + change / held)
+            else:
+                cost[code] = 0.0
+            quantity[code] = held + change
+
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+    def position(self, asset_id: str) -> Dict[str, float]:
+        """
+        Devuelve la posición derivada de un activo.
+        :param asset_id: ID del activo.
+        :return: Diccionario con 'quantity', 'cost_basis' y 'average_cost'.
+        """
+        code = self._asset_codes.get(asset_id)
+        if code is None:
+            return {'quantity': 0.0, 'cost_basis': 0.0, 'average_cost': 0.0}
+        state = self.state()
+        quantity = float(state.quantity[code])
+        cost_basis = float(state.cost_basis[code])
+        return {
+            'quantity': quantity,
+            'cost_basis': cost_basis,
+            'average_cost': cost_basis / quantity if quantity else 0.0,
+        }
+
+    def positions(self) -> Dict[str, Dict[str, float]]:
+        """
+        Devuelve todas las posiciones abiertas derivadas del libro.
+        :return: Diccionario asset_id -> {'quantity', 'cost_basis', 'average_cost'}.
+        """
+        state = self.state()
+        result = {}
+        for code in np.nonzero(state.quantity)[0].tolist():
+            quantity = float(state.quantity[code])
+            cost_basis = float(state.cost_basis[code])
+            result[self.asset_ids[code]] = {
+                'quantity': quantity,
+                'cost_basis': cost_basis,
+                'average_cost': cost_basis / quantity,
+            }
+        return result
+
+    @property
+    def cash(self) -> float:
+        """Efectivo neto generado por el libro (compras negativas, ventas y dividendos positivos)."""
+        return self.state().cash
+
+
+def _benchmark(rows: int = 2_000_000, assets: int = 5_000):
+    """Mide la reproducción completa e incremental de un libro sintético."""
+    import time
+
+    rng = np.random.default_rng(0)
+    ledger = TransactionLedger()
+    for code in range(assets):
+        ledger.asset_code(f"asset-{code}")
+    types = rng.choice([_BUY, _BUY, _SELL, TransactionType.DIVIDEND.value], size=rows)
+    dates = np.sort(rng.integers(0, 20 * 365 * 86_400_000_000, size=rows))
+    ledger.extend_arrays(
+        rng.integers(0, assets, size=rows), types, dates,
+        rng.uniform(1, 500, size=rows), rng.uniform(1, 100, size=rows), rng.uniform(0, 5, size=rows),
+    )
+
+    started = time.perf_counter()
+    ledger.state()
+    full = time.perf_counter() - started
+
+    started = time.perf_counter()
+    ledger.append(Transaction(asset_id='asset-0', type=TransactionType.BUY,
+                              date=datetime(2100, 1, 1), price=10.0, quantity=1.0))
+    ledger.state()
+    incremental = time.perf_counter() - started
+
+    print(f"{rows:,} transacciones / {assets:,} activos")
+    print(f"  reproducción completa: {full:.2f} s")
+    print(f"  agregar + reproducir:  {incremental * 1000:.2f} ms")
+
+
+if __name__ == '__main__':
+    _benchmark()
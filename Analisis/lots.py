@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+#3.3 Contabilidad de lotes (FIFO / LIFO / costo promedio)
+
+from dataclasses import dataclass
+from enum import Enum, auto
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from Analisis.ledger import TransactionLedger
+from Entidades.models import TransactionType
+
+_BUY = TransactionType.BUY.value
+_SELL = TransactionType.SELL.value
+_DIVIDEND = TransactionType.DIVIDEND.value
+_TRANSFER = TransactionType.TRANSFER.value
+
+# Cantidades menores a esto se consideran lotes agotados
+_EPSILON = 1e-12
+
+
+class LotMethod(Enum):
+    """Métodos de imputación de ventas a lotes de compra"""
+    FIFO = auto()
+    LIFO = auto()
+    AVERAGE_COST = auto()
+
+
+def _years(timestamps: np.ndarray) -> np.ndarray:
+    """Año calendario de fechas en microsegundos desde 1970-01-01."""
+    return timestamps.astype('datetime64[us]').astype('datetime64[Y]').astype(np.int64) + 1970
+
+
+def _group_sum(keys: np.ndarray, values: np.ndarray) -> Dict[int, float]:
+    unique, inverse = np.unique(keys, return_inverse=True)
+    sums = np.bincount(inverse, weights=values, minlength=len(unique))
+    return dict(zip(unique.tolist(), sums.tolist()))
+
+
+@dataclass
+class LotReport:
+    """Resultado de la imputación de lotes: lotes abiertos, ventas imputadas y dividendos"""
+    method: LotMethod
+    asset_ids: List[str]
+    open_lots: Dict[str, np.ndarray]
+    realized: Dict[str, np.ndarray]
+    dividends: Dict[str, np.ndarray]
+
+    def by_asset(self) -> Dict[str, Dict[str, float]]:
+        """
+        Resume la ganancia realizada, no realizada y los dividendos por activo.
+        :return: Diccionario asset_id -> {'realized', 'unrealized', 'dividends', 'open_quantity', 'cost_basis'}.
+        """
+        columns = (
+            ('realized', self.realized['asset_code'], self.realized['gain']),
+            ('unrealized', self.open_lots['asset_code'], self.open_lots['unrealized']),
+            ('dividends', self.dividends['asset_code'], self.dividends['amount']),
+            ('open_quantity', self.open_lots['asset_code'], self.open_lots['quantity']),
+            ('cost_basis', self.open_lots['asset_code'], self.open_lots['quantity'] * self.open_lots['unit_cost']),
+        )
+        summary = {}
+        for name, codes, values in columns:
+            for code, total in _group_sum(codes, values).items():
+                entry = summary.setdefault(self.asset_ids[code], dict.fromkeys((name for name, _, _ in columns), 0.0))
+                entry[name] = total
+        return summary
+
+    def by_year(self) -> Dict[int, Dict[str, float]]:
+        """
+        Resume la ganancia realizada y los dividendos por año calendario.
+        :return: Diccionario año -> {'realized', 'proceeds', 'cost', 'dividends'}.
+        """
+        sell_years = _years(self.realized['sell_date'])
+        columns = (
+            ('realized', sell_years, self.realized['gain']),
+            ('proceeds', sell_years, self.realized['proceeds']),
+            ('cost', sell_years, self.realized['cost']),
+            ('dividends', _years(self.dividends['date']), self.dividends['amount']),
+        )
+        summary = {}
+        for name, years, values in columns:
+            for year, total in _group_sum(years, values).items():
+                summary.setdefault(year, dict.fromkeys((name for name, _, _ in columns), 0.0))[name] = total
+        return dict(sorted(summary.items()))
+
+
+class _LotQueue:
+    """Cola de lotes de un activo guardada en arrays, con punteros de inicio y fin."""
+
+    def __init__(self, capacity: int):
+        self.quantity = np.zeros(capacity)
+        self.unit_cost = np.zeros(capacity)
+        self.date = np.zeros(capacity, dtype=np.int64)
+        self.head = 0
+        self.tail = 0
+
+    def push(self, quantity: float, unit_cost: float, date: int):
+        self.quantity[self.tail] = quantity
+        self.unit_cost[self.tail] = unit_cost
+        self.date[self.tail] = date
+        self.tail += 1
+
+    def take(self, quantity: float, method: LotMethod):
+        """
+        Consume `quantity` unidades según el método.
+        :return: Tupla (índices de lote, cantidades tomadas).
+        """
+        open_quantity = self.quantity[self.head:self.tail]
+        available = open_quantity.sum()
+        if available <= _EPSILON:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        quantity = min(quantity, available)
+
+        if method is LotMethod.AVERAGE_COST:
+            taken = open_quantity * (quantity / available)
+            indices = np.arange(self.head, self.tail)
+        else:
+            ordered = open_quantity if method is LotMethod.FIFO else open_quantity[::-1]
+            cumulative = np.cumsum(ordered)
+            last = min(int(np.searchsorted(cumulative, quantity - _EPSILON)), len(ordered) - 1)
+            before = cumulative[:last + 1] - ordered[:last + 1]
+            taken = np.clip(quantity - before, 0.0, ordered[:last + 1])
+            if method is LotMethod.FIFO:
+                indices = np.arange(self.head, self.head + last + 1)
+            else:
+                indices = np.arange(self.tail - 1, self.tail - last - 2, -1)
+
+        self.quantity[indices] -= taken
+        self.quantity[indices[self.quantity[indices] <= _EPSILON]] = 0.0
+        while self.head < self.tail and self.quantity[self.head] == 0.0:
+            self.head += 1
+        while self.tail > self.head and self.quantity[self.tail - 1] == 0.0:
+            self.tail -= 1
+        return indices, taken
+
+
+def match_lots(ledger: TransactionLedger, method: LotMethod = LotMethod.FIFO,
+               current_prices: Optional[Dict[str, float]] = None) -> LotReport:
+    """
+    Imputa cada venta del libro a lotes de compra previos del mismo activo.
+    Las comisiones de compra se suman al costo del lote y las de venta se descuentan
+    del producido en proporción a la cantidad imputada a cada lote. Las transferencias
+    de entrada abren lotes al precio de la transferencia (más su comisión) y las de salida
+    consumen lotes sin generar ganancia realizada. Las ventas por encima de la tenencia
+    solo imputan la cantidad disponible (la comisión completa se reparte entre lo imputado).
+    Las comisiones que no se pueden imputar (transferencias de salida, ventas de cantidad
+    cero o sin tenencia) se registran como una fila realizada de cantidad cero con costo
+    igual a la comisión.
+    :param ledger: Libro de transacciones.
+    :param method: LotMethod a utilizar.
+    :param current_prices: Precio actual por asset_id para la ganancia no realizada.
+    :return: LotReport con los lotes abiertos, las imputaciones y los dividendos.
+    """
+    current_prices = current_prices or {}
+    codes = ledger.column('asset_code')
+    types = ledger.column('type_code')
+    dates = ledger.column('date')
+    prices = ledger.column('price')
+    quantities = ledger.column('quantity')
+    fees = ledger.column('fees')
+
+    # Dividendos: no dependen del orden, se resuelven vectorizados
+    is_dividend = types == _DIVIDEND
+    dividends = {
+        'asset_code': codes[is_dividend],
+        'date': dates[is_dividend],
+        'amount': prices[is_dividend] * quantities[is_dividend] - fees[is_dividend],
+    }
+
+    # Flujo de cada activo: filas contiguas por activo, en orden cronológico
+    moving = np.nonzero(~is_dividend)[0]
+    order = moving[np.argsort(codes[moving], kind='stable')]
+    sorted_codes = codes[order]
+    boundaries = np.flatnonzero(np.diff(sorted_codes)) + 1
+    starts = np.concatenate(([0], boundaries)) if len(order) else np.zeros(0, dtype=np.int64)
+    stops = np.concatenate((boundaries, [len(order)])) if len(order) else np.zeros(0, dtype=np.int64)
+
+    realized_parts: Dict[str, list] = {name: [] for name in
+                                       ('asset_code', 'buy_date', 'sell_date', 'quantity', 'cost', 'proceeds')}
+    open_parts: Dict[str, list] = {name: [] for name in ('asset_code', 'date', 'quantity', 'unit_cost')}
+
+    for start, stop in zip(starts.tolist(), stops.tolist()):
+        rows = order[start:stop]
+        code = int(sorted_codes[start])
+        row_types = types[rows].tolist()
+        row_quantities = quantities[rows].tolist()
+        row_prices = prices[rows].tolist()
+        row_fees = fees[rows].tolist()
+        row_dates = dates[rows].tolist()
+        queue = _LotQueue(len(rows))
+
+        fee_dates, fee_amounts = [], []
+        for kind, quantity, price, fee, date in zip(row_types, row_quantities, row_prices, row_fees, row_dates):
+            incoming = kind == _BUY or (kind == _TRANSFER and quantity > 0)
+            quantity = abs(quantity)
+            if incoming:
+                if quantity > _EPSILON:
+                    queue.push(quantity, price + fee / quantity, date)
+                elif fee:
+                    fee_dates.append(date)
+                    fee_amounts.append(fee)
+                continue
+            matched = 0.0
+            if quantity > _EPSILON:
+                indices, taken = queue.take(quantity, method)
+                matched = float(taken.sum()) if len(indices) else 0.0
+            if kind != _SELL or matched <= 0.0:
+                if fee:
+                    fee_dates.append(date)
+                    fee_amounts.append(fee)
+                continue
+            realized_parts['asset_code'].append(np.full(len(indices), code, dtype=np.int32))
+            realized_parts['buy_date'].append(queue.date[indices])
+            realized_parts['sell_date'].append(np.full(len(indices), date, dtype=np.int64))
+            realized_parts['quantity'].append(taken)
+            realized_parts['cost'].append(taken * queue.unit_cost[indices])
+            realized_parts['proceeds'].append(taken * (price - fee / matched))
+
+        if fee_amounts:
+            # Comisiones sin lote ni venta a la que imputarse: pérdida realizada sin cantidad
+            fee_dates = np.array(fee_dates, dtype=np.int64)
+            realized_parts['asset_code'].append(np.full(len(fee_dates), code, dtype=np.int32))
+            realized_parts['buy_date'].append(fee_dates)
+            realized_parts['sell_date'].append(fee_dates)
+            realized_parts['quantity'].append(np.zeros(len(fee_dates)))
+            realized_parts['cost'].append(np.array(fee_amounts))
+            realized_parts['proceeds'].append(np.zeros(len(fee_dates)))
+
+        remaining = slice(queue.head, queue.tail)
+        still_open = queue.quantity[remaining] > 0.0
+        open_parts['asset_code'].append(np.full(int(still_open.sum()), code, dtype=np.int32))
+        open_parts['date'].append(queue.date[remaining][still_open])
+        open_parts['quantity'].append(queue.quantity[remaining][still_open])
+        open_parts['unit_cost'].append(queue.unit_cost[remaining][still_open])
+
+    dtypes = {'asset_code': np.int32, 'buy_date': np.int64, 'sell_date': np.int64, 'date': np.int64}
+    realized = {name: np.concatenate(parts) if parts else np.zeros(0, dtype=dtypes.get(name, np.float64))
+                for name, parts in realized_parts.items()}
+    realized['gain'] = realized['proceeds'] - realized['cost']
+    open_lots = {name: np.concatenate(parts) if parts else np.zeros(0, dtype=dtypes.get(name, np.float64))
+                 for name, parts in open_parts.items()}
+
+    # Precio actual por código de activo (NaN si no se conoce)
+    price_by_code = np.array([current_prices.get(asset_id, np.nan) for asset_id in ledger.asset_ids])
+    lot_prices = price_by_code[open_lots['asset_code']] if len(price_by_code) else np.zeros(0)
+    open_lots['market_value'] = open_lots['quantity'] * lot_prices
+    open_lots['unrealized'] = np.nan_to_num(open_lots['market_value'] - open_lots['quantity'] * open_lots['unit_cost'])
+    return LotReport(method, list(ledger.asset_ids), open_lots, realized, dividends)
@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+#3.10 Rebalanceo a pesos objetivo
+
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+from Entidades.holdings import HoldingsTable
+from Entidades.models import PortfolioCategory, Transaction, TransactionType
+
+# Margen para que un múltiplo exacto del lote no se redondee hacia abajo
+_LOT_EPSILON = 1e-9
+
+
+@dataclass
+class Trade:
+    """Operación sugerida por el rebalanceo"""
+    asset_id: str
+    symbol: str
+    type: TransactionType
+    quantity: float
+    price: float
+    fees: float = 0.0
+
+    @property
+    def value(self) -> float:
+        return self.quantity * self.price
+
+    def to_transaction(self, date: Optional[datetime] = None) -> Transaction:
+        """
+        Convierte la operación en una transacción para registrarla en el portafolio.
+        :param date: Fecha de la transacción (por defecto, ahora).
+        :return: Transaction equivalente.
+        """
+        return Transaction(asset_id=self.asset_id, type=self.type, date=date or datetime.now(),
+                           price=self.price, quantity=self.quantity, fees=self.fees)
+
+
+@dataclass
+class RebalancePlan:
+    """Resultado del rebalanceo: operaciones, efectivo final y pesos antes y después"""
+    trades: List[Trade] = field(default_factory=list)
+    cash_before: float = 0.0
+    cash_after: float = 0.0
+    turnover: float = 0.0
+    fees: float = 0.0
+    weights_before: Dict[str, float] = field(default_factory=dict)
+    weights_after: Dict[str, float] = field(default_factory=dict)
+    targets: Dict[str, float] = field(default_factory=dict)
+
+
+def _round_to_lot(quantities: np.ndarray, lots: np.ndarray) -> np.ndarray:
+    """Redondea hacia cero al múltiplo de lote; lote 0 permite cantidades fraccionarias."""
+    rounded = np.floor(quantities / np.where(lots > 0, lots, 1.0) + _LOT_EPSILON) * lots
+    return np.where(lots > 0, rounded, quantities)
+
+
+def _lot_array(ids: Sequence[str], lot_sizes: Union[None, float, Dict[str, float]]) -> np.ndarray:
+    if lot_sizes is None:
+        return np.zeros(len(ids))
+    if isinstance(lot_sizes, dict):
+        return np.array([float(lot_sizes.get(asset_id, 0.0)) for asset_id in ids])
+    return np.full(len(ids), float(lot_sizes))
+
+
+def target_weights(holdings: HoldingsTable, targets: Dict[str, float],
+                   categories: Optional[Sequence[PortfolioCategory]] = None,
+                   factors: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Traduce los pesos objetivo a un peso por fila de la tabla de tenencias.
+    Con categorías, el peso de cada una se reparte entre sus activos en proporción a su
+    valor actual (así no se opera dentro de la categoría), o en partes iguales si la
+    categoría no tiene valor.
+    :param holdings: Tabla de tenencias.
+    :param targets: Peso objetivo por asset_id o, si se indican categorías, por nombre de categoría.
+    :param categories: PortfolioCategory que agrupan los activos.
+    :param factors: Factor de conversión a una moneda común por fila (por defecto, 1).
+    :return: Array con el peso de cada fila; NaN para los activos sin objetivo (no se operan).
+    """
+    weights = np.full(len(holdings), np.nan)
+    if any(weight < 0 for weight in targets.values()):
+        raise ValueError("Los pesos objetivo no pueden ser negativos.")
+    if categories is None:
+        for asset_id, weight in targets.items():
+            row = holdings.row_of(asset_id)
+            if row is None:
+                raise ValueError(f"El activo {asset_id} no está en el portafolio.")
+            weights[row] = weight
+        return weights
+
+    by_name = {category.name: category for category in categories}
+    values = holdings.market_values()
+    if factors is not None:
+        values = values * factors
+    for name, weight in targets.items():
+        category = by_name.get(name)
+        if category is None:
+            raise ValueError(f"La categoría {name} no existe.")
+        rows = [holdings.row_of(asset_id) for asset_id in category.assets]
+        rows = np.array([row for row in rows if row is not None], dtype=np.int64)
+        if not len(rows):
+            raise ValueError(f"La categoría {name} no tiene activos en el portafolio.")
+        if not np.isnan(weights[rows]).all():
+            raise ValueError(f"La categoría {name} comparte activos con otra categoría.")
+        category_values = values[rows]
+        total = category_values.sum()
+        shares = category_values / total if total > 0 else np.full(len(rows), 1.0 / len(rows))
+        weights[rows] = weight * shares
+    return weights
+
+
+def rebalance(holdings: HoldingsTable, targets: Dict[str, float],
+              categories: Optional[Sequence[PortfolioCategory]] = None, cash: float = 0.0,
+              lot_sizes: Union[None, float, Dict[str, float]] = None,
+              fee_rate: float = 0.0, fixed_fee: float = 0.0, tolerance: float = 0.0,
+              factors: Optional[np.ndarray] = None) -> RebalancePlan:
+    """
+    Calcula las operaciones para llevar la cartera a los pesos objetivo con la menor rotación:
+    cada activo opera solo la diferencia entre su valor actual y el objetivo. Los pesos son
+    sobre el total (tenencias más efectivo); lo que no se asigna queda en efectivo y los
+    activos sin objetivo no se operan. Las cantidades se redondean hacia cero al lote, las
+    ventas nunca superan la tenencia y, si el efectivo (más lo obtenido por ventas, neto de
+    comisiones) no alcanza, las compras se reducen en la misma proporción.
+    :param holdings: Tabla de tenencias.
+    :param targets: Peso objetivo por asset_id o por nombre de categoría.
+    :param categories: PortfolioCategory; si se indican, `targets` es por categoría.
+    :param cash: Efectivo disponible.
+    :param lot_sizes: Lote mínimo (escalar o por asset_id); 0 o None permite fracciones.
+    :param fee_rate: Comisión proporcional al monto operado.
+    :param fixed_fee: Comisión fija por operación.
+    :param tolerance: Desvío mínimo (como fracción del total) para operar un activo.
+    :param factors: Factor para convertir el precio de cada fila a la moneda del efectivo.
+                    Los pesos, el efectivo y las comisiones se calculan en esa moneda; el
+                    precio y la comisión de cada Trade quedan en la moneda del activo.
+    :return: RebalancePlan.
+    """
+    ids = holdings.text_column('id')
+    symbols = holdings.text_column('symbol')
+    quantities = holdings.column('quantity').astype(np.float64)
+    factors = np.ones(len(holdings)) if factors is None else np.asarray(factors, dtype=np.float64)
+    prices = holdings.column('current_price') * factors
+    values = quantities * prices
+    total = float(values.sum()) + cash
+    if total <= 0:
+        raise ValueError("La cartera no tiene valor para rebalancear.")
+
+    weights = target_weights(holdings, targets, categories, factors)
+    covered = ~np.isnan(weights)
+    untouched = float(values[~covered].sum()) / total
+    if np.nansum(weights) + untouched > 1.0 + 1e-9:
+        raise ValueError("Los pesos objetivo más los activos sin objetivo superan el 100 %.")
+    tradable = covered & (prices > 0)
+
+    difference = np.where(tradable, np.nan_to_num(weights) * total - values, 0.0)
+    difference[np.abs(difference) < tolerance * total] = 0.0
+    lots = _lot_array(ids, lot_sizes)
+    safe_prices = np.where(prices > 0, prices, 1.0)
+
+    sells = np.minimum(_round_to_lot(np.maximum(-difference, 0.0) / safe_prices, lots), quantities)
+    sells = np.maximum(sells, 0.0)
+    buys = _round_to_lot(np.maximum(difference, 0.0) / safe_prices, lots)
+
+    sell_fees = np.where(sells > 0, sells * prices * fee_rate + fixed_fee, 0.0)
+    available = cash + float((sells * prices - sell_fees).sum())
+    buy_costs = np.where(buys > 0, buys * prices * (1.0 + fee_rate) + fixed_fee, 0.0)
+    if buy_costs.sum() > available:
+        # Se achican todas las compras en la misma proporción y se vuelve a redondear al lote
+        variable = float((buys * prices * (1.0 + fee_rate)).sum())
+        budget = available - fixed_fee * int((buys > 0).sum())
+        scale = max(budget, 0.0) / variable if variable > 0 else 0.0
+        buys = _round_to_lot(buys * scale, lots)
+    buy_fees = np.where(buys > 0, buys * prices * fee_rate + fixed_fee, 0.0)
+
+    traded = buys - sells
+    fees = sell_fees + buy_fees
+    cash_after = cash - float((traded * prices).sum()) - float(fees.sum())
+    values_after = (quantities + traded) * prices
+    total_after = float(values_after.sum()) + cash_after
+
+    trades = []
+    for row in np.flatnonzero(traded).tolist():
+        kind = TransactionType.BUY if traded[row] > 0 else TransactionType.SELL
+        trades.append(Trade(ids[row], symbols[row], kind, float(abs(traded[row])),
+                            float(prices[row] / factors[row]), float(fees[row] / factors[row])))
+
+    covered_rows = np.flatnonzero(covered).tolist()
+    return RebalancePlan(
+        trades=trades,
+        cash_before=cash,
+        cash_after=cash_after,
+        turnover=float((np.abs(traded) * prices).sum()),
+        fees=float(fees.sum()),
+        weights_before={ids[row]: float(values[row] / total) for row in covered_rows},
+        weights_after={ids[row]: float(values_after[row] / total_after) if total_after > 0 else 0.0
+                       for row in covered_rows},
+        targets={ids[row]: float(weights[row]) for row in covered_rows},
+    )
+
+
+def _benchmark(assets: int = 5_000):
+    """Mide un rebalanceo por activo y por categoría sobre una cartera sintética."""
+    import time
+
+    from Entidades.models import Asset
+
+    rng = np.random.default_rng(0)
+    holdings = HoldingsTable()
+    for code in range(assets):
+        holdings.append(Asset(id=f"asset-{code}", symbol=f"S{code}", quantity=float(rng.integers(1, 500)),
+                              current_price=float(rng.uniform(1, 300))))
+    targets = dict(zip(holdings.text_column('id'), (rng.dirichlet(np.ones(assets)) * 0.98).tolist()))
+    categories = [PortfolioCategory(name=f"cat-{code}", assets=holdings.text_column('id')[code::20])
+                  for code in range(20)]
+    category_targets = {category.name: 0.05 for category in categories}
+
+    started = time.perf_counter()
+    plan = rebalance(holdings, targets, cash=10_000.0, lot_sizes=1.0, fee_rate=0.005, fixed_fee=1.0)
+    by_asset = time.perf_counter() - started
+
+    started = time.perf_counter()
+    rebalance(holdings, category_targets, categories, cash=10_000.0, lot_sizes=1.0, fee_rate=0.005)
+    by_category = time.perf_counter() - started
+
+    print(f"{assets:,} posiciones ({len(plan.trades):,} operaciones)")
+    print(f"  por activo:    {by_asset * 1000:.1f} ms")
+    print(f"  por categoría: {by_category * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    _benchmark()
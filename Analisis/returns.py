@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+#3.6 Rendimiento ponderado por tiempo (TWR) y por dinero (MWR / XIRR)
+
+import hashlib
+from collections import OrderedDict
+from datetime import date
+from typing import Dict, Hashable, Optional, Sequence, Tuple
+
+import numpy as np
+
+from Analisis.ledger import TransactionLedger, external_flows
+
+_DAYS_PER_YEAR = 365.0
+
+# Tasas candidatas para encontrar un intervalo con cambio de signo
+_BRACKET_GRID = np.array([-0.999999, -0.9999, -0.99, -0.9, -0.75, -0.5, -0.25, -0.1, 0.0, 0.05, 0.1, 0.25,
+                          0.5, 1.0, 2.0, 5.0, 10.0, 100.0, 1000.0])
+
+_CACHE_LIMIT = 100_000
+_xirr_cache: 'OrderedDict[bytes, float]' = OrderedDict()
+
+
+def flow_adjusted_growth(values: np.ndarray, flows: np.ndarray) -> np.ndarray:
+    """
+    Factor de crecimiento diario neto de flujos externos: (V_t - F_t) / V_{t-1}.
+    El primer día, y los días que parten de valor cero, tienen factor 1.
+    :param values: Serie de valores.
+    :param flows: Flujos externos de cada fecha (aportes positivos, retiros negativos).
+    :return: Array de factores (1 + rendimiento diario).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    flows = np.asarray(flows, dtype=np.float64)
+    growth = np.ones(len(values))
+    if len(values) > 1:
+        previous = values[:-1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = (values[1:] - flows[1:]) / previous
+        growth[1:] = np.where(previous > 0, ratio, 1.0)
+    return growth
+
+
+def time_weighted_return(values: np.ndarray, flows: Optional[np.ndarray] = None) -> float:
+    """
+    Rendimiento ponderado por tiempo de una serie de valuación.
+    :param values: Serie de valores (por ejemplo, diaria).
+    :param flows: Flujos externos de cada fecha (por defecto, ninguno).
+    :return: Rendimiento acumulado del período (0.1 = 10 %).
+    """
+    flows = np.zeros(len(values)) if flows is None else flows
+    return float(np.prod(flow_adjusted_growth(values, flows)) - 1.0)
+
+
+def _fingerprint(times: np.ndarray, amounts: np.ndarray) -> bytes:
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(np.ascontiguousarray(times, dtype=np.float64).tobytes())
+    digest.update(np.ascontiguousarray(amounts, dtype=np.float64).tobytes())
+    return digest.digest()
+
+
+def _npv(rates: np.ndarray, times: np.ndarray, amounts: np.ndarray):
+    """Valor presente y su derivada para cada fila con su tasa."""
+    # Cerca de -100 % los factores de descuento desbordan: esas filas quedan inf/NaN
+    with np.errstate(over='ignore', divide='ignore', invalid='ignore'):
+        log_base = np.log1p(rates)[:, None]
+        discount = np.exp(-times * log_base)
+        value = (amounts * discount).sum(axis=1)
+        derivative = (-times * amounts * discount).sum(axis=1) / (1.0 + rates)
+    return value, derivative
+
+
+def _solve(times: np.ndarray, amounts: np.ndarray, iterations: int = 50, tolerance: float = 1e-10) -> np.ndarray:
+    """Newton vectorizado con respaldo de bisección para las filas que no convergen."""
+    count = len(times)
+    rates = np.full(count, 0.1)
+    done = np.zeros(count, dtype=bool)
+    for _ in range(iterations):
+        active = np.nonzero(~done)[0]
+        if not len(active):
+            break
+        value, derivative = _npv(rates[active], times[active], amounts[active])
+        with np.errstate(over='ignore', divide='ignore', invalid='ignore'):
+            step = value / derivative
+        updated = rates[active] - step
+        valid = np.isfinite(updated) & (updated > -1.0)
+        rates[active[valid]] = updated[valid]
+        converged = valid & (np.abs(step) <= tolerance * np.maximum(1.0, np.abs(updated)))
+        done[active[converged]] = True
+        # Las filas que salen del dominio pasan directo a bisección
+        done[active[~valid]] = True
+        rates[active[~valid]] = np.nan
+
+    failed = np.nonzero(~done | np.isnan(rates))[0]
+    if len(failed):
+        rates[failed] = _bisect(times[failed], amounts[failed])
+    return rates
+
+
+def _bisect(times: np.ndarray, amounts: np.ndarray, iterations: int = 200) -> np.ndarray:
+    """Bisección vectorizada sobre el primer intervalo de _BRACKET_GRID con cambio de signo."""
+    count = len(times)
+    grid_values = np.stack([_npv(np.full(count, rate), times, amounts)[0] for rate in _BRACKET_GRID], axis=1)
+    sign_change = np.sign(grid_values[:, :-1]) * np.sign(grid_values[:, 1:]) <= 0
+    has_bracket = sign_change.any(axis=1)
+    first = sign_change.argmax(axis=1)
+    low = _BRACKET_GRID[first]
+    high = _BRACKET_GRID[first + 1]
+    low_value = grid_values[np.arange(count), first]
+    for _ in range(iterations):
+        middle = (low + high) / 2.0
+        middle_value = _npv(middle, times, amounts)[0]
+        same_side = np.sign(middle_value) == np.sign(low_value)
+        low = np.where(same_side, middle, low)
+        low_value = np.where(same_side, middle_value, low_value)
+        high = np.where(same_side, high, middle)
+    return np.where(has_bracket, (low + high) / 2.0, np.nan)
+
+
+def xirr_batch(flow_sets: Sequence[Tuple[np.ndarray, np.ndarray]]) -> np.ndarray:
+    """
+    Resuelve la TIR (XIRR) de muchos conjuntos de flujos en un solo lote.
+    Los resultados se memorizan por huella de los flujos, así que los conjuntos
+    repetidos o sin cambios no se vuelven a resolver.
+    :param flow_sets: Secuencia de tuplas (fechas datetime64, montos); aportes negativos,
+                      retiros y valor final positivos.
+    :return: Array con la tasa anual de cada conjunto (NaN si no tiene solución).
+    """
+    results = np.full(len(flow_sets), np.nan)
+    pending, keys, rows = [], [], []
+    for index, (dates, amounts) in enumerate(flow_sets):
+        days = np.asarray(dates, dtype='datetime64[D]').astype(np.int64)
+        amounts = np.asarray(amounts, dtype=np.float64)
+        if len(days) < 2 or not (amounts > 0).any() or not (amounts < 0).any():
+            continue
+        times = (days - days.min()) / _DAYS_PER_YEAR
+        key = _fingerprint(times, amounts)
+        cached = _xirr_cache.get(key)
+        if cached is not None:
+            _xirr_cache.move_to_end(key)
+            results[index] = cached
+            continue
+        pending.append(index)
+        keys.append(key)
+        rows.append((times, amounts))
+
+    if pending:
+        width = max(len(times) for times, _ in rows)
+        times = np.zeros((len(rows), width))
+        amounts = np.zeros((len(rows), width))
+        for row, (row_times, row_amounts) in enumerate(rows):
+            times[row, :len(row_times)] = row_times
+            amounts[row, :len(row_amounts)] = row_amounts
+        solved = _solve(times, amounts)
+        results[pending] = solved
+        for key, rate in zip(keys, solved.tolist()):
+            _xirr_cache[key] = rate
+        while len(_xirr_cache) > _CACHE_LIMIT:
+            _xirr_cache.popitem(last=False)
+    return results
+
+
+def xirr(dates: np.ndarray, amounts: np.ndarray) -> float:
+    """
+    TIR anual de un conjunto de flujos fechados.
+    :param dates: Fechas de los flujos.
+    :param amounts: Montos (aportes negativos, retiros y valor final positivos).
+    :return: Tasa anual (NaN si no tiene solución).
+    """
+    return float(xirr_batch([(dates, amounts)])[0])
+
+
+def money_weighted_returns(ledger: TransactionLedger, current_values: Dict[str, float],
+                           groups: Optional[Dict[str, Hashable]] = None,
+                           as_of: Optional[date] = None) -> Dict[Hashable, float]:
+    """
+    Rendimiento ponderado por dinero (XIRR) por activo o por grupo de activos.
+    Los flujos salen del libro de transacciones (las transferencias cuentan como aportes o
+    retiros a su precio, ver ledger.external_flows) y el valor actual de cada activo se
+    agrega como flujo positivo en la fecha de valuación.
+    :param ledger: Libro de transacciones.
+    :param current_values: Valor de mercado actual por asset_id.
+    :param groups: asset_id -> grupo (por ejemplo, categoría). Sin grupos, se calcula por activo.
+    :param as_of: Fecha de valuación (por defecto, hoy).
+    :return: Diccionario grupo (o asset_id) -> tasa anual.
+    """
+    as_of = np.datetime64(as_of or date.today(), 'D')
+    codes = ledger.column('asset_code')
+    days = ledger.column('date').astype('datetime64[us]').astype('datetime64[D]')
+    flows = external_flows(ledger.column('type_code'), ledger.column('price'),
+                           ledger.column('quantity'), ledger.column('fees'))
+
+    # Código de grupo de cada activo del libro
+    group_keys = [groups.get(asset_id) if groups is not None else asset_id for asset_id in ledger.asset_ids]
+    labels = list(dict.fromkeys(group_keys))
+    label_codes = {label: code for code, label in enumerate(labels)}
+    asset_groups = np.array([label_codes[key] for key in group_keys], dtype=np.int64)
+    terminal = np.bincount(asset_groups,
+                           weights=[current_values.get(asset_id, 0.0) for asset_id in ledger.asset_ids],
+                           minlength=len(labels)) if len(labels) else np.zeros(0)
+
+    row_groups = asset_groups[codes] if len(codes) else np.zeros(0, dtype=np.int64)
+    order = np.argsort(row_groups, kind='stable')
+    bounds = np.searchsorted(row_groups[order], np.arange(len(labels) + 1))
+    flow_sets = []
+    for code in range(len(labels)):
+        rows = order[bounds[code]:bounds[code + 1]]
+        flow_sets.append((np.append(days[rows], as_of), np.append(flows[rows], terminal[code])))
+    return dict(zip(labels, xirr_batch(flow_sets).tolist()))
@@ -0,0 +1,344 @@
+# -*- coding: utf-8 -*-
+#3.7 Métricas de riesgo móviles (volatilidad, Sharpe, Sortino, caída máxima, VaR)
+
+import warnings
+from statistics import NormalDist
+from typing import Dict, Optional
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# La serie de valuación es diaria calendario (incluye fines de semana)
+CALENDAR_DAYS = 365
+TRADING_DAYS = 252
+
+# Elementos por bloque al calcular cuantiles sobre ventanas (acota la memoria de las copias)
+_QUANTILE_CHUNK = 4_000_000
+
+
+def price_returns(prices: np.ndarray) -> np.ndarray:
+    """
+    Rendimientos simples de una serie o matriz fechas x activos de precios.
+    El primer día y los días sin precio previo quedan en NaN.
+    :param prices: Array 1D o 2D (fechas en el eje 0).
+    :return: Array de la misma forma con los rendimientos.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    returns = np.full(prices.shape, np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns[1:] = prices[1:] / prices[:-1] - 1.0
+    returns[~np.isfinite(returns)] = np.nan
+    return returns
+
+
+def rolling_sum(values: np.ndarray, window: int) -> np.ndarray:
+    """
+    Suma móvil sobre el eje 0 por diferencia de sumas acumuladas, en O(n).
+    Las primeras window - 1 posiciones quedan en NaN.
+    :param values: Array 1D o 2D (fechas en el eje 0), sin NaN.
+    :param window: Largo de la ventana.
+    :return: Array de la misma forma; cada fila es la suma de la ventana que termina en ella.
+    """
+    if window < 1:
+        raise ValueError("La ventana debe ser de al menos un período.")
+    values = np.asarray(values, dtype=np.float64)
+    result = np.full(values.shape, np.nan)
+    if len(values) < window:
+        return result
+    cumulative = np.cumsum(values, axis=0)
+    result[window - 1] = cumulative[window - 1]
+    result[window:] = cumulative[window:] - cumulative[:-window]
+    return result
+
+
+def rolling_max(values: np.ndarray, window: int) -> np.ndarray:
+    """
+    Máximo móvil sobre el eje 0 con el algoritmo de van Herk / Gil-Werman: máximos
+    acumulados hacia adelante y hacia atrás dentro de bloques de largo `window`, en O(n)
+    sin importar el largo de la ventana (equivale a una cola monotónica, pero vectorizado).
+    :param values: Array 1D o 2D (fechas en el eje 0).
+    :param window: Largo de la ventana.
+    :return: Array de la misma forma; las primeras window - 1 posiciones quedan en NaN.
+    """
+    if window < 1:
+        raise ValueError("La ventana debe ser de al menos un período.")
+    values = np.asarray(values, dtype=np.float64)
+    count = len(values)
+    result = np.full(values.shape, np.nan)
+    if count < window:
+        return result
+    blocks = -(-count // window)
+    padded = np.full((blocks * window,) + values.shape[1:], -np.inf)
+    padded[:count] = values
+    shaped = padded.reshape((blocks, window) + values.shape[1:])
+    forward = np.maximum.accumulate(shaped, axis=1).reshape(padded.shape)
+    backward = np.maximum.accumulate(shaped[:, ::-1], axis=1)[:, ::-1].reshape(padded.shape)
+    result[window - 1:] = np.maximum(backward[:count - window + 1], forward[window - 1:count])
+    return result
+
+
+def rolling_min(values: np.ndarray, window: int) -> np.ndarray:
+    """
+    Mínimo móvil sobre el eje 0 (ver rolling_max).
+    :param values: Array 1D o 2D (fechas en el eje 0).
+    :param window: Largo de la ventana.
+    :return: Array de la misma forma; las primeras window - 1 posiciones quedan en NaN.
+    """
+    return -rolling_max(-np.asarray(values, dtype=np.float64), window)
+
+
+def _rolling_moments(returns: np.ndarray, window: int):
+    """Cantidad de observaciones, media y desvío muestral de cada ventana (ignora NaN)."""
+    returns = np.asarray(returns, dtype=np.float64)
+    valid = np.isfinite(returns)
+    clean = np.where(valid, returns, 0.0)
+    count = rolling_sum(valid.astype(np.float64), window)
+    total = rolling_sum(clean, window)
+    squares = rolling_sum(clean * clean, window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = total / count
+        variance = (squares - total * mean) / (count - 1)
+    return count, mean, np.sqrt(np.maximum(variance, 0.0))
+
+
+def rolling_volatility(returns: np.ndarray, window: int, periods_per_year: int = TRADING_DAYS) -> np.ndarray:
+    """
+    Volatilidad anualizada móvil.
+    :param returns: Rendimientos por período (1D o 2D; los NaN se ignoran).
+    :param window: Largo de la ventana en períodos.
+    :param periods_per_year: Períodos por año para anualizar.
+    :return: Array de la misma forma con la volatilidad de cada ventana.
+    """
+    _, _, deviation = _rolling_moments(returns, window)
+    return deviation * np.sqrt(periods_per_year)
+
+
+def rolling_sharpe(returns: np.ndarray, window: int, risk_free: float = 0.0,
+                   periods_per_year: int = TRADING_DAYS) -> np.ndarray:
+    """
+    Ratio de Sharpe anualizado móvil.
+    :param returns: Rendimientos por período (1D o 2D; los NaN se ignoran).
+    :param window: Largo de la ventana en períodos.
+    :param risk_free: Tasa libre de riesgo anual.
+    :param periods_per_year: Períodos por año para anualizar.
+    :return: Array de la misma forma (NaN donde el desvío es cero).
+    """
+    _, mean, deviation = _rolling_moments(returns, window)
+    excess = mean - risk_free / periods_per_year
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe = excess / deviation * np.sqrt(periods_per_year)
+    return np.where(deviation > 0, sharpe, np.nan)
+
+
+def rolling_sortino(returns: np.ndarray, window: int, risk_free: float = 0.0,
+                    periods_per_year: int = TRADING_DAYS) -> np.ndarray:
+    """
+    Ratio de Sortino anualizado móvil: solo penaliza los rendimientos por debajo de la tasa libre de riesgo.
+    :param returns: Rendimientos por período (1D o 2D; los NaN se ignoran).
+    :param window: Largo de la ventana en períodos.
+    :param risk_free: Tasa libre de riesgo anual.
+    :param periods_per_year: Períodos por año para anualizar.
+    :return: Array de la misma forma (NaN si la ventana no tiene rendimientos negativos).
+    """
+    returns = np.asarray(returns, dtype=np.float64)
+    threshold = risk_free / periods_per_year
+    count, mean, _ = _rolling_moments(returns, window)
+    shortfall = np.minimum(np.where(np.isfinite(returns), returns, threshold) - threshold, 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        downside = np.sqrt(rolling_sum(shortfall * shortfall, window) / count)
+        sortino = (mean - threshold) / downside * np.sqrt(periods_per_year)
+    return np.where(downside > 0, sortino, np.nan)
+
+
+def drawdown(values: np.ndarray) -> np.ndarray:
+    """
+    Caída porcentual de cada fecha respecto del máximo histórico previo.
+    :param values: Serie de valores (1D o 2D, fechas en el eje 0).
+    :return: Array de la misma forma con valores <= 0.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    peaks = np.fmax.accumulate(values, axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result = values / peaks - 1.0
+    return np.where(peaks > 0, result, 0.0)
+
+
+def max_drawdown(values: np.ndarray):
+    """
+    Caída máxima desde un pico.
+    :param values: Serie de valores (1D o 2D, fechas en el eje 0).
+    :return: Caída máxima (<= 0); un array por columna si la serie es 2D.
+    """
+    falls = drawdown(values)
+    if not len(falls):
+        return 0.0
+    worst = np.nanmin(falls, axis=0)
+    return float(worst) if falls.ndim == 1 else worst
+
+
+def rolling_drawdown(values: np.ndarray, window: int) -> np.ndarray:
+    """
+    Caída de cada fecha respecto del máximo de la ventana que termina en ella.
+    :param values: Serie de valores (1D o 2D, fechas en el eje 0).
+    :param window: Largo de la ventana.
+    :return: Array de la misma forma (NaN en las primeras window - 1 posiciones).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    peaks = rolling_max(np.where(np.isfinite(values), values, -np.inf), window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(peaks > 0, values / peaks - 1.0, np.nan)
+
+
+def parametric_var(returns: np.ndarray, window: int, confidence: float = 0.95) -> np.ndarray:
+    """
+    Valor en riesgo paramétrico (normal) móvil de un período, como pérdida positiva.
+    :param returns: Rendimientos por período (1D o 2D; los NaN se ignoran).
+    :param window: Largo de la ventana.
+    :param confidence: Nivel de confianza (por ejemplo 0.95).
+    :return: Array de la misma forma con el VaR de cada ventana.
+    """
+    _, mean, deviation = _rolling_moments(returns, window)
+    return -(mean + NormalDist().inv_cdf(1.0 - confidence) * deviation)
+
+
+def rolling_historical_var(returns: np.ndarray, window: int, confidence: float = 0.95) -> np.ndarray:
+    """
+    Valor en riesgo histórico móvil de un período, como pérdida positiva: percentil de los
+    rendimientos de cada ventana. Las ventanas son vistas sobre la serie (sin copiarla) y los
+    percentiles se calculan por bloques de fechas para acotar la memoria.
+    :param returns: Rendimientos por período (1D o 2D; los NaN se ignoran).
+    :param window: Largo de la ventana.
+    :param confidence: Nivel de confianza (por ejemplo 0.95).
+    :return: Array de la misma forma (NaN en las primeras window - 1 posiciones).
+    """
+    if window < 1:
+        raise ValueError("La ventana debe ser de al menos un período.")
+    returns = np.asarray(returns, dtype=np.float64)
+    result = np.full(returns.shape, np.nan)
+    if len(returns) < window:
+        return result
+    windows = sliding_window_view(returns, window, axis=0)
+    step = max(1, _QUANTILE_CHUNK // (window * int(np.prod(returns.shape[1:], dtype=np.int64))))
+    with warnings.catch_warnings():
+        # Ventanas sin ningún rendimiento válido: quedan en NaN
+        warnings.simplefilter('ignore', RuntimeWarning)
+        for start in range(0, len(windows), step):
+            block = windows[start:start + step]
+            result[window - 1 + start:window - 1 + start + len(block)] = \
+                0.0 - np.nanquantile(block, 1.0 - confidence, axis=-1)
+    return result
+
+
+def historical_var(returns: np.ndarray, confidence: float = 0.95, window: Optional[int] = None):
+    """
+    Valor en riesgo histórico de un período, como pérdida positiva (para la serie móvil,
+    ver rolling_historical_var).
+    :param returns: Rendimientos por período (1D o 2D; los NaN se ignoran).
+    :param confidence: Nivel de confianza (por ejemplo 0.95).
+    :param window: Cantidad de períodos más recientes a considerar (por defecto, todos).
+    :return: VaR; un array por columna si la serie es 2D.
+    """
+    returns = np.asarray(returns, dtype=np.float64)
+    if window is not None:
+        returns = returns[-window:]
+    if not np.isfinite(returns).any():
+        return np.nan
+    loss = 0.0 - np.nanquantile(returns, 1.0 - confidence, axis=0)
+    return float(loss) if returns.ndim == 1 else loss
+
+
+def _last(values: np.ndarray):
+    """Último valor de una serie móvil (o de cada columna)."""
+    if not len(values):
+        return np.nan
+    return float(values[-1]) if values.ndim == 1 else values[-1]
+
+
+def risk_summary(returns: np.ndarray, values: Optional[np.ndarray] = None, window: int = TRADING_DAYS,
+                 risk_free: float = 0.0, confidence: float = 0.95,
+                 periods_per_year: int = TRADING_DAYS) -> Dict[str, object]:
+    """
+    Resume las métricas de riesgo de la última ventana.
+    :param returns: Rendimientos por período (1D para una serie, 2D para una columna por activo).
+    :param values: Serie de valores para la caída máxima (por defecto, se reconstruye de los rendimientos).
+    :param window: Largo de la ventana; si la serie es más corta, se usa la serie completa.
+    :param risk_free: Tasa libre de riesgo anual.
+    :param confidence: Nivel de confianza del VaR.
+    :param periods_per_year: Períodos por año para anualizar.
+    :return: Diccionario con 'volatility', 'sharpe', 'sortino', 'max_drawdown',
+             'historical_var' y 'parametric_var' (escalares o arrays por activo).
+    """
+    returns = np.asarray(returns, dtype=np.float64)
+    window = max(2, min(window, len(returns)))
+    if values is None:
+        values = np.cumprod(1.0 + np.nan_to_num(returns), axis=0)
+    return {
+        'volatility': _last(rolling_volatility(returns, window, periods_per_year)),
+        'sharpe': _last(rolling_sharpe(returns, window, risk_free, periods_per_year)),
+        'sortino': _last(rolling_sortino(returns, window, risk_free, periods_per_year)),
+        'max_drawdown': max_drawdown(np.asarray(values)[-window:]),
+        'historical_var': historical_var(returns, confidence, window),
+        'parametric_var': _last(parametric_var(returns, window, confidence)),
+    }
+
+
+def rolling_risk(returns: np.ndarray, values: Optional[np.ndarray] = None, window: int = TRADING_DAYS,
+                 risk_free: float = 0.0, confidence: float = 0.95,
+                 periods_per_year: int = TRADING_DAYS) -> Dict[str, np.ndarray]:
+    """
+    Series móviles de las mismas métricas que risk_summary, para graficarlas.
+    :param returns: Rendimientos por período (1D para una serie, 2D para una columna por activo).
+    :param values: Serie de valores para la caída (por defecto, se reconstruye de los rendimientos).
+    :param window: Largo de la ventana; si la serie es más corta, se usa la serie completa.
+    :param risk_free: Tasa libre de riesgo anual.
+    :param confidence: Nivel de confianza del VaR.
+    :param periods_per_year: Períodos por año para anualizar.
+    :return: Diccionario con 'volatility', 'sharpe', 'sortino', 'drawdown', 'historical_var'
+             y 'parametric_var', cada uno con la forma de returns.
+    """
+    returns = np.asarray(returns, dtype=np.float64)
+    window = max(2, min(window, len(returns)))
+    if values is None:
+        values = np.cumprod(1.0 + np.nan_to_num(returns), axis=0)
+    return {
+        'volatility': rolling_volatility(returns, window, periods_per_year),
+        'sharpe': rolling_sharpe(returns, window, risk_free, periods_per_year),
+        'sortino': rolling_sortino(returns, window, risk_free, periods_per_year),
+        'drawdown': rolling_drawdown(values, window),
+        'historical_var': rolling_historical_var(returns, window, confidence),
+        'parametric_var': parametric_var(returns, window, confidence),
+    }
+
+
+def _benchmark(years: int = 20, assets: int = 5_000, window: int = TRADING_DAYS, chunk: int = 500):
+    """Mide las métricas móviles sobre una matriz sintética de rendimientos diarios, por bloques de activos."""
+    import time
+
+    rng = np.random.default_rng(0)
+    days = years * TRADING_DAYS
+    elapsed = 0.0
+    for first in range(0, assets, chunk):
+        returns = rng.normal(0.0003, 0.02, size=(days, min(chunk, assets - first)))
+        values = np.cumprod(1.0 + returns, axis=0)
+        started = time.perf_counter()
+        rolling_volatility(returns, window)
+        rolling_sharpe(returns, window)
+        rolling_sortino(returns, window)
+        rolling_drawdown(values, window)
+        parametric_var(returns, window)
+        max_drawdown(values)
+        historical_var(returns, window=window)
+        elapsed += time.perf_counter() - started
+
+    series = rng.normal(0.0003, 0.02, size=days)
+    started = time.perf_counter()
+    rolling_historical_var(series, window)
+    var_elapsed = time.perf_counter() - started
+
+    print(f"{days:,} días / {assets:,} activos (ventana de {window})")
+    print(f"  métricas móviles: {elapsed:.2f} s")
+    print(f"  VaR histórico móvil de una serie: {var_elapsed * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    _benchmark()
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+#3.5 Agregados precalculados por período
+
+from typing import Dict, Optional
+
+import numpy as np
+
+from Analisis.returns import flow_adjusted_growth
+
+# Opciones del selector "Período de Análisis": etiqueta -> (granularidad, días incluidos hasta la última fecha)
+PERIODS = {
+    'Hoy': ('daily', 1),
+    'Última Semana': ('daily', 7),
+    'Último Mes': ('daily', 30),
+    'Últimos 6 Meses': ('weekly', 182),
+    'Último Año': ('monthly', 365),
+}
+
+GRANULARITIES = ('daily', 'weekly', 'monthly')
+
+
+def _period_keys(dates: np.ndarray, granularity: str) -> np.ndarray:
+    """Clave entera del período (día, semana ISO o mes) de cada fecha."""
+    days = dates.astype('datetime64[D]').astype(np.int64)
+    if granularity == 'daily':
+        return days
+    if granularity == 'weekly':
+        # 1970-01-01 fue jueves: se desplaza para que las semanas empiecen el lunes
+        return (days + 3) // 7
+    if granularity == 'monthly':
+        return dates.astype('datetime64[M]').astype(np.int64)
+    raise ValueError(f"Granularidad desconocida: {granularity}")
+
+
+class PeriodRollups:
+    """
+    Agregados diarios, semanales y mensuales de valor, flujos y rendimiento.
+    Se calculan una sola vez; cada consulta de período es una búsqueda binaria
+    sobre el índice de fechas ordenado y devuelve vistas de los arrays.
+    """
+
+    def __init__(self, dates: np.ndarray, values: np.ndarray, flows: Optional[np.ndarray] = None):
+        dates = np.asarray(dates, dtype='datetime64[D]')
+        values = np.asarray(values, dtype=np.float64)
+        flows = np.zeros(len(values)) if flows is None else np.asarray(flows, dtype=np.float64)
+        if not (len(dates) == len(values) == len(flows)):
+            raise ValueError("Fechas, valores y flujos deben tener el mismo largo.")
+
+        growth = flow_adjusted_growth(values, flows)
+
+        self.levels: Dict[str, Dict[str, np.ndarray]] = {}
+        for granularity in GRANULARITIES:
+            keys = _period_keys(dates, granularity)
+            if len(keys):
+                starts = np.concatenate(([0], np.flatnonzero(np.diff(keys)) + 1))
+                ends = np.concatenate((starts[1:], [len(keys)])) - 1
+            else:
+                starts = ends = np.zeros(0, dtype=np.int64)
+            self.levels[granularity] = {
+                'dates': dates[ends],
+                'value': values[ends],
+                'flows': np.add.reduceat(flows, starts) if len(starts) else np.zeros(0),
+                'return': np.multiply.reduceat(growth, starts) - 1.0 if len(starts) else np.zeros(0),
+            }
+
+    def slice(self, granularity: str, start, end=None) -> Dict[str, np.ndarray]:
+        """
+        Devuelve los agregados de una granularidad entre dos fechas (ambas incluidas).
+        :param granularity: 'daily', 'weekly' o 'monthly'.
+        :param start: Fecha inicial.
+        :param end: Fecha final (por defecto, la última disponible).
+        :return: Diccionario con 'dates', 'value', 'flows' y 'return' (vistas, sin copiar).
+        """
+        level = self.levels[granularity]
+        first = np.searchsorted(level['dates'], np.datetime64(start, 'D'), side='left')
+        last = len(level['dates']) if end is None else \
+            np.searchsorted(level['dates'], np.datetime64(end, 'D'), side='right')
+        return {name: values[first:last] for name, values in level.items()}
+
+    def period_start(self, label: str) -> np.datetime64:
+        """
+        Primera fecha de una opción del selector: los últimos N días de PERIODS contando la
+        última fecha disponible ('Hoy' es solo la última fecha).
+        :param label: Etiqueta de PERIODS.
+        :return: Fecha inicial (inclusive).
+        """
+        days = PERIODS[label][1]
+        daily_dates = self.levels['daily']['dates']
+        if not len(daily_dates):
+            return np.datetime64('1970-01-01', 'D')
+        return daily_dates[-1] - np.timedelta64(days - 1, 'D')
+
+    def period(self, label: str) -> Dict[str, np.ndarray]:
+        """
+        Devuelve los agregados de una opción del selector de período.
+        :param label: Etiqueta de PERIODS (por ejemplo 'Último Mes').
+        :return: Diccionario con 'dates', 'value', 'flows' y 'return'.
+        """
+        return self.slice(PERIODS[label][0], self.period_start(label))
+
+    def period_return(self, label: Optional[str] = None) -> float:
+        """
+        Rendimiento ponderado por tiempo de una opción del selector, con los mismos límites
+        que period (producto de los rendimientos diarios desde period_start).
+        :param label: Etiqueta de PERIODS; por defecto, todo el historial.
+        :return: Rendimiento acumulado (0.1 = 10 %).
+        """
+        daily = self.levels['daily'] if label is None else self.slice('daily', self.period_start(label))
+        return float(np.prod(1.0 + daily['return']) - 1.0)
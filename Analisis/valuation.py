@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+#3.4 Motor de valuación diaria
+
+from datetime import date
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from Analisis.ledger import TransactionLedger, external_flows, quantity_deltas
+
+
+def daily_dates(start, end) -> np.ndarray:
+    """
+    Genera el calendario diario entre dos fechas (ambas incluidas).
+    :param start: Fecha inicial (date, datetime o datetime64).
+    :param end: Fecha final (date, datetime o datetime64).
+    :return: Array datetime64[D].
+    """
+    start = np.datetime64(start, 'D')
+    end = np.datetime64(end, 'D')
+    return np.arange(start, end + np.timedelta64(1, 'D'), dtype='datetime64[D]')
+
+
+def ledger_calendar(ledger: TransactionLedger) -> np.ndarray:
+    """
+    Calendario diario desde la primera transacción del libro hasta hoy.
+    :param ledger: Libro de transacciones.
+    :return: Array datetime64[D] (vacío si el libro no tiene transacciones).
+    """
+    if not len(ledger):
+        return np.zeros(0, dtype='datetime64[D]')
+    first = ledger.column('date')[0].astype('datetime64[us]').astype('datetime64[D]')
+    return daily_dates(first, max(first, np.datetime64(date.today(), 'D')))
+
+
+def _day_index(ledger: TransactionLedger, dates: np.ndarray) -> np.ndarray:
+    """Fila de `dates` en la que impacta cada transacción del libro."""
+    transaction_days = ledger.column('date').astype('datetime64[us]').astype('datetime64[D]')
+    return np.searchsorted(dates, transaction_days, side='left')
+
+
+def holdings_matrix(ledger: TransactionLedger, dates: np.ndarray,
+                    quantities: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Construye la matriz fechas x activos de cantidades al cierre de cada día.
+    Las transacciones anteriores a la primera fecha se acumulan en la primera fila y las
+    posteriores a la última se ignoran.
+    :param ledger: Libro de transacciones (las columnas siguen los códigos de activo del libro).
+    :param dates: Calendario ordenado (datetime64[D]).
+    :param quantities: Cantidad de cada transacción (por defecto, la columna del libro); por
+                       ejemplo, ajustada por splits con CorporateActions.adjust_quantity_column.
+    :return: Matriz de forma (len(dates), cantidad de activos del libro).
+    """
+    asset_count = len(ledger.asset_ids)
+    days = _day_index(ledger, dates)
+    inside = days < len(dates)
+    if quantities is None:
+        quantities = ledger.column('quantity')
+    deltas = quantity_deltas(ledger.column('type_code'), quantities)
+    flat = days[inside] * asset_count + ledger.column('asset_code')[inside]
+    changes = np.bincount(flat, weights=deltas[inside], minlength=len(dates) * asset_count)
+    return np.cumsum(changes.reshape(len(dates), asset_count), axis=0)
+
+
+def fill_forward(prices: np.ndarray) -> np.ndarray:
+    """
+    Completa los NaN de una matriz fechas x activos con el último precio conocido.
+    Los NaN anteriores al primer precio de cada activo se mantienen.
+    :param prices: Matriz de precios con NaN donde no hay cotización.
+    :return: Nueva matriz completada.
+    """
+    rows = np.arange(prices.shape[0])[:, None]
+    last_valid = np.where(np.isnan(prices), 0, rows)
+    np.maximum.accumulate(last_valid, axis=0, out=last_valid)
+    return prices[last_valid, np.arange(prices.shape[1])]
+
+
+def transaction_price_matrix(ledger: TransactionLedger, dates: np.ndarray,
+                             current_prices: Optional[Dict[str, float]] = None,
+                             transaction_prices: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Arma una matriz de precios a partir de los precios de las transacciones (último del día)
+    y, si se indican, los precios actuales en la última fecha. Se completa hacia adelante.
+    :param ledger: Libro de transacciones.
+    :param dates: Calendario ordenado (datetime64[D]).
+    :param current_prices: Precio actual por asset_id.
+    :param transaction_prices: Precio de cada transacción (por defecto, la columna del libro);
+                               por ejemplo, ajustado con CorporateActions.adjust_price_column.
+    :return: Matriz fechas x activos.
+    """
+    if transaction_prices is None:
+        transaction_prices = ledger.column('price')
+    asset_count = len(ledger.asset_ids)
+    prices = np.full((len(dates), asset_count), np.nan)
+    days = _day_index(ledger, dates)
+    inside = np.nonzero(days < len(dates))[0]
+    flat = days[inside] * asset_count + ledger.column('asset_code')[inside]
+    # El libro está ordenado por fecha: se conserva la última transacción de cada celda
+    reversed_flat = flat[::-1]
+    cells, first = np.unique(reversed_flat, return_index=True)
+    prices.reshape(-1)[cells] = transaction_prices[inside][::-1][first]
+    if current_prices and len(dates):
+        latest = np.array([current_prices.get(asset_id, np.nan) for asset_id in ledger.asset_ids])
+        prices[-1] = np.where(np.isnan(latest), prices[-1], latest)
+    return fill_forward(prices)
+
+
+def flow_series(ledger: TransactionLedger, dates: np.ndarray) -> np.ndarray:
+    """
+    Flujos externos diarios hacia las tenencias valuadas: compras y transferencias de entrada
+    suman, ventas, dividendos y transferencias de salida restan. Las comisiones cuentan como
+    aporte (no generan valor), por lo que penalizan el rendimiento.
+    :param ledger: Libro de transacciones.
+    :param dates: Calendario ordenado (datetime64[D]).
+    :return: Array con el flujo neto de cada fecha.
+    """
+    flows = -external_flows(ledger.column('type_code'), ledger.column('price'), ledger.column('quantity'),
+                            ledger.column('fees'))
+    days = _day_index(ledger, dates)
+    inside = days < len(dates)
+    return np.bincount(days[inside], weights=flows[inside], minlength=len(dates))
+
+
+def value_series(holdings: np.ndarray, prices: np.ndarray) -> np.ndarray:
+    """
+    Valor del portafolio por fecha: producto elemento a elemento y suma por fila.
+    Los precios desconocidos (NaN) no aportan valor.
+    :param holdings: Matriz fechas x activos de cantidades.
+    :param prices: Matriz fechas x activos de precios.
+    :return: Array con un valor por fecha.
+    """
+    return np.einsum('ij,ij->i', holdings, np.nan_to_num(prices))
+
+
+def portfolio_valuation(ledger: TransactionLedger, dates: Optional[np.ndarray] = None,
+                        prices: Optional[np.ndarray] = None,
+                        current_prices: Optional[Dict[str, float]] = None,
+                        quantities: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Calcula la serie diaria de valor del portafolio.
+    :param ledger: Libro de transacciones.
+    :param dates: Calendario (por defecto, desde la primera transacción hasta hoy).
+    :param prices: Matriz fechas x activos (columnas en el orden de ledger.asset_ids). Si no se
+                   indica, se usan los precios de las transacciones y los precios actuales.
+    :param current_prices: Precio actual por asset_id (solo si no se indica `prices`).
+    :param quantities: Cantidad de cada transacción en las mismas unidades que `prices` (por
+                       defecto, la columna del libro; ver holdings_matrix).
+    :return: Tupla (fechas datetime64[D], valores).
+    """
+    if dates is None:
+        dates = ledger_calendar(ledger)
+    if prices is None:
+        prices = transaction_price_matrix(ledger, dates, current_prices)
+    elif prices.shape != (len(dates), len(ledger.asset_ids)):
+        raise ValueError("La matriz de precios debe tener forma (fechas, activos del libro).")
+    else:
+        prices = fill_forward(prices)
+    return dates, value_series(holdings_matrix(ledger, dates, quantities), prices)
@@ -12,6 +12,7 @@ class Composition(QWidget):
         super().__init__()
         self.model = DashboardModel()
         self.init_ui()
+        self.model.portfolio.subscribe(lambda asset_ids: self.update_dashboard())
 
     def init_ui(self):
         layout = QVBoxLayout()
@@ -46,7 +47,7 @@ class Composition(QWidget):
         period_label = QLabel("Período de Análisis:")
         self.period_selector = QComboBox()
         self.period_selector.addItems(["Hoy", "Última Semana", "Último Mes", "Últimos 6 Meses", "Último Año"])
-        self.period_selector.currentIndexChanged.connect(self.update_dashboard)
+        self.period_selector.currentIndexChanged.connect(self.plot_portfolio_performance)
         period_layout.addWidget(period_label)
         period_layout.addWidget(self.period_selector)
         layout.addLayout(period_layout)
@@ -93,7 +94,7 @@ class Composition(QWidget):
         ax.spines['right'].set_color('#ffffff')
         ax.spines['left'].set_color('#ffffff')
 
-        dates, performance = self.model.get_portfolio_performance()
+        dates, performance = self.model.get_portfolio_performance(self.period_selector.currentText())
 
         line, = ax.plot(dates, performance, color='#00ffcc', linewidth=3, marker='o', markersize=8)
         ax.set_title('Rendimiento del Portafolio', color='#ffffff', fontsize=16)
@@ -160,7 +161,7 @@ class Composition(QWidget):
         self.canvas_composition.draw()
 
     def update_dashboard(self):
-        """Actualizar gráficos según el período seleccionado."""
+        """Actualizar todos los gráficos; el selector de período solo redibuja el rendimiento."""
         self.plot_portfolio_performance()
         self.plot_asset_distribution()
         self.plot_asset_composition()
@@ -1,46 +1,58 @@
 # -*- coding: utf-8 -*-
-import json
-import os
-from Entidades.models import Asset, AssetType
-from dashboard.Portfolio import Portfolio
+from datetime import date
+from Datos.repository import shared_repository
+from Entidades.models import AssetType
+from dashboard.dashboardModel import CHART_COLORS, TYPE_LABELS
 
 class DashboardModel:
-    def __init__(self):
-        self.portfolio = Portfolio()
+    def __init__(self, portfolio=None):
         self.data_file = "portfolio_data.json"
-        self.load_saved_assets()
+        if portfolio is None:
+            # Vista compartida: el archivo se lee una sola vez por proceso
+            self.portfolio = self.load_saved_assets()
+        else:
+            self.portfolio = portfolio
 
     def load_saved_assets(self):
-        if os.path.exists(self.data_file):
-            with open(self.data_file, 'r') as file:
-                data = json.load(file)
-                for asset_data in data:
-                    asset_type = AssetType[asset_data['type']]
-                    asset = Asset(
-                        symbol=asset_data['symbol'],
-                        name=asset_data['name'],
-                        type=asset_type,
-                        quantity=asset_data['quantity'],
-                        current_price=asset_data['current_price']
-                    )
-                    self.portfolio.assets.append(asset)
+        return shared_repository(self.data_file).load()
 
-    def get_portfolio_performance(self):
-        # Ejemplo de datos de rendimiento
+    def get_portfolio_performance(self, period=None):
+        if self.portfolio.transactions:
+            rollups = self.portfolio.rollups()
+            series = rollups.period(period) if period else rollups.levels['daily']
+            return series['dates'].astype(object).tolist(), series['value'].round(2).tolist()
+        if len(self.portfolio.assets):
+            # Sin historial de transacciones solo se conoce el valor actual
+            return [date.today()], [self.portfolio.total_value]
+        # Ejemplo de datos de rendimiento (portafolio vacío)
         performance = [1000, 1050, 1100, 1080, 1150]
-        dates = ["Lun", "Mar", "Mi", "Jue", "Vie"]
+        dates = ["Lun", "Mar", "Mié", "Jue", "Vie"]
         return dates, performance
 
     def get_asset_distribution(self):
-        # Datos ficticios para prototipo
+        groups = self.portfolio.group_by('type')
+        if groups:
+            asset_types = [t for t in AssetType if t in groups]
+            labels = [TYPE_LABELS[t] for t in asset_types]
+            sizes = [round(groups[t]['weight'] * 100, 1) for t in asset_types]
+            colors = [CHART_COLORS[i % len(CHART_COLORS)] for i in range(len(labels))]
+            return labels, sizes, colors
+        # Datos ficticios para prototipo (portafolio vacío)
         labels = ['Acciones', 'Bonos', 'Efectivo', 'Criptomonedas']
         sizes = [40, 30, 20, 10]
         colors = ['#ff69b4', '#00ffcc', '#ff9800', '#4caf50']
         return labels, sizes, colors
 
     def get_asset_composition(self):
-        # Datos ficticios de composicin
-        categories = ['Dinero Lquido', 'Conservadores', 'Medios', 'Arriesgados', 'Ultra Arriesgados']
-        values = [10000, 30000, 20000, 25000, 15000]  # Valores en dlares
+        groups = self.portfolio.group_by('category')
+        if groups:
+            ordered = sorted(groups.items(), key=lambda item: item[1]['sum'], reverse=True)
+            categories = [category or 'Sin categoría' for category, _ in ordered]
+            values = [round(group['sum'], 2) for _, group in ordered]
+            colors = [CHART_COLORS[i % len(CHART_COLORS)] for i in range(len(categories))]
+            return categories, values, colors
+        # Datos ficticios de composición (portafolio vacío)
+        categories = ['Dinero Líquido', 'Conservadores', 'Medios', 'Arriesgados', 'Ultra Arriesgados']
+        values = [10000, 30000, 20000, 25000, 15000]  # Valores en dólares
         colors = ['#00ffcc', '#4caf50', '#ff9800', '#ff69b4', '#ff4444']
         return categories, values, colors
\ No newline at end of file
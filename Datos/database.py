@@ -1,15 +1,453 @@
+# -*- coding: utf-8 -*-
 #2.1 Configuración de Base de Datos
 
-'''
+import os
+import sqlite3
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from Analisis.ledger import TransactionLedger, to_timestamp
+from Entidades.models import Asset, AssetType, Transaction, TransactionType
+
+DEFAULT_DATABASE = "portfolio.db"
+
+# Cantidad de filas por executemany en las cargas masivas
+BATCH_SIZE = 50_000
+
+# Tipos de fuente de dinero (tablas de la pantalla Fuentes de dinero)
+MONEY_SOURCE_KINDS = ('net_worth', 'asset', 'liability')
+
+_TABLES = (
+    """
+    CREATE TABLE IF NOT EXISTS assets (
+        id TEXT PRIMARY KEY,
+        symbol TEXT NOT NULL,
+        name TEXT NOT NULL DEFAULT '',
+        type INTEGER NOT NULL,
+        category TEXT,
+        purchase_price REAL NOT NULL DEFAULT 0,
+        quantity REAL NOT NULL DEFAULT 0,
+        current_price REAL NOT NULL DEFAULT 0,
+        currency TEXT NOT NULL DEFAULT 'USD',
+        exchange TEXT,
+        country TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS transactions (
+        id TEXT PRIMARY KEY,
+        asset_id TEXT NOT NULL,
+        type INTEGER NOT NULL,
+        date INTEGER NOT NULL,          -- microsegundos desde 1970-01-01 (como el libro)
+        year INTEGER NOT NULL,
+        month INTEGER NOT NULL,
+        price REAL NOT NULL,
+        quantity REAL NOT NULL,
+        fees REAL NOT NULL DEFAULT 0,
+        notes TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS prices (
+        symbol TEXT NOT NULL,
+        date INTEGER NOT NULL,          -- días desde 1970-01-01
+        open REAL, high REAL, low REAL, close REAL, volume REAL,
+        PRIMARY KEY (symbol, date)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS money_sources (
+        id INTEGER PRIMARY KEY,
+        kind TEXT NOT NULL,
+        description TEXT NOT NULL,
+        value REAL NOT NULL,
+        date TEXT NOT NULL,             -- YYYY-MM-DD
+        year INTEGER NOT NULL,
+        month INTEGER NOT NULL
+    )
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS money_sources_year_month
+        ON money_sources (year, month, kind, value)
+    """,
+)
+
+# Índices de cobertura: las consultas por activo y por mes se resuelven sin leer la tabla.
+# En la carga inicial se crean después de insertar, que es más rápido que mantenerlos fila a fila.
+_TRANSACTION_INDEXES = {
+    'transactions_asset_date': """
+    CREATE INDEX IF NOT EXISTS transactions_asset_date
+        ON transactions (asset_id, date, type, price, quantity, fees)
+    """,
+    'transactions_year_month': """
+    CREATE INDEX IF NOT EXISTS transactions_year_month
+        ON transactions (year, month, type, price, quantity, fees)
+    """,
+    'transactions_date': """
+    CREATE INDEX IF NOT EXISTS transactions_date ON transactions (date)
+    """,
+}
+
+
+class _NoCommit:
+    """Contexto vacío para insertar dentro de una transacción ya abierta."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
 class DatabaseManager:
-    """Gestiona almacenamiento y consultas"""
-    methods:
-    - initialize_database
-    - create_tables
-    - backup_database
-    - restore_database
-    - optimize_queries
+    """
+    Gestiona almacenamiento y consultas sobre SQLite. La base trabaja en modo WAL (las
+    lecturas no bloquean a la escritura), las cargas masivas usan sentencias preparadas con
+    executemany en lotes dentro de una sola transacción, y las consultas frecuentes
+    (por activo y fecha, por año y mes) tienen índices de cobertura.
+    """
+
+    def __init__(self, path: str = DEFAULT_DATABASE):
+        """
+        :param path: Archivo de la base (':memory:' para una base temporal).
+        """
+        self.path = path
+        self.connection: Optional[sqlite3.Connection] = None
+
+    def __enter__(self) -> 'DatabaseManager':
+        self.initialize_database()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def initialize_database(self) -> sqlite3.Connection:
+        """
+        Abre la conexión, configura la base y crea las tablas si no existen.
+        :return: Conexión abierta.
+        """
+        if self.connection is None:
+            self.connection = sqlite3.connect(self.path)
+            self.connection.executescript(
+                """
+                PRAGMA journal_mode = WAL;
+                PRAGMA synchronous = NORMAL;
+                PRAGMA temp_store = MEMORY;
+                PRAGMA cache_size = -65536;
+                """
+            )
+            self.create_tables()
+        return self.connection
+
+    def close(self):
+        """Cierra la conexión (SQLite hace el checkpoint del WAL al cerrar)."""
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    @property
+    def _db(self) -> sqlite3.Connection:
+        return self.connection if self.connection is not None else self.initialize_database()
+
+    def create_tables(self):
+        """Crea las tablas e índices que falten."""
+        with self._db as connection:
+            for statement in _TABLES + tuple(_TRANSACTION_INDEXES.values()):
+                connection.execute(statement)
+
+    # ------------------------------------------------------------------
+    # Activos
+    # ------------------------------------------------------------------
+    def save_assets(self, assets: Iterable[Asset]) -> int:
+        """
+        Inserta o reemplaza activos.
+        :param assets: Activos (o vistas de HoldingsTable).
+        :return: Cantidad de filas escritas.
+        """
+        rows = [(asset.id, asset.symbol, asset.name, asset.type.value, asset.category, asset.purchase_price,
+                 asset.quantity, asset.current_price, asset.currency, asset.exchange, asset.country)
+                for asset in assets]
+        with self._db as connection:
+            connection.executemany("INSERT OR REPLACE INTO assets VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def load_assets(self) -> List[Asset]:
+        """
+        Lee todos los activos.
+        :return: Lista de Asset.
+        """
+        cursor = self._db.execute(
+            "SELECT id, symbol, name, type, category, purchase_price, quantity, current_price, currency, "
+            "exchange, country FROM assets"
+        )
+        return [Asset(id=row[0], symbol=row[1], name=row[2], type=AssetType(row[3]), category=row[4],
+                      purchase_price=row[5], quantity=row[6], current_price=row[7], currency=row[8],
+                      exchange=row[9], country=row[10])
+                for row in cursor]
+
+    def delete_assets(self, asset_ids: Sequence[str]):
+        """
+        Elimina activos por ID.
+        :param asset_ids: IDs a eliminar.
+        """
+        with self._db as connection:
+            connection.executemany("DELETE FROM assets WHERE id = ?", ((asset_id,) for asset_id in asset_ids))
+
+    # ------------------------------------------------------------------
+    # Transacciones
+    # ------------------------------------------------------------------
+    def insert_transactions(self, transactions: Iterable[Transaction], batch_size: int = BATCH_SIZE) -> int:
+        """
+        Inserta transacciones en lotes dentro de una sola transacción de la base.
+        :param transactions: Transacciones a insertar.
+        :param batch_size: Filas por executemany.
+        :return: Cantidad de transacciones insertadas.
+        """
+        def rows():
+            for t in transactions:
+                yield (t.id, t.asset_id, t.type.value, to_timestamp(t.date), t.date.year, t.date.month,
+                       t.price, t.quantity, t.fees, t.notes)
+        return self._insert_transactions("INSERT OR REPLACE INTO transactions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                         rows(), batch_size)
+
+    def insert_transaction_arrays(self, ids: Sequence[str], asset_ids: Sequence[str], type_codes, dates, prices,
+                                  quantities, fees, batch_size: int = BATCH_SIZE) -> int:
+        """
+        Inserta transacciones ya en columnas (por ejemplo, desde un TransactionLedger).
+        :param ids: IDs de las transacciones.
+        :param asset_ids: ID del activo de cada transacción.
+        :param type_codes: Valores de TransactionType.
+        :param dates: Fechas en microsegundos desde 1970-01-01 (o datetime64).
+        :param prices: Precios.
+        :param quantities: Cantidades.
+        :param fees: Comisiones.
+        :param batch_size: Filas por executemany.
+        :return: Cantidad de transacciones insertadas.
+        """
+        dates = np.asarray(dates)
+        if np.issubdtype(dates.dtype, np.datetime64):
+            dates = dates.astype('datetime64[us]').astype(np.int64)
+        months = dates.astype('datetime64[us]').astype('datetime64[M]').astype(np.int64)
+        rows = zip(ids, asset_ids, np.asarray(type_codes).tolist(), dates.tolist(), (months // 12 + 1970).tolist(),
+                   (months % 12 + 1).tolist(), np.asarray(prices, dtype=np.float64).tolist(),
+                   np.asarray(quantities, dtype=np.float64).tolist(), np.asarray(fees, dtype=np.float64).tolist())
+        return self._insert_transactions(
+            "INSERT OR REPLACE INTO transactions (id, asset_id, type, date, year, month, price, quantity, fees) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows, batch_size)
 
+    def _insert_transactions(self, statement: str, rows, batch_size: int) -> int:
+        """Inserta transacciones; si la tabla está vacía, crea los índices al final."""
+        connection = self._db
+        if connection.execute("SELECT 1 FROM transactions LIMIT 1").fetchone() is not None:
+            return self._insert_batches(statement, rows, batch_size)
+        with connection:
+            connection.execute("BEGIN")
+            for name in _TRANSACTION_INDEXES:
+                connection.execute(f"DROP INDEX IF EXISTS {name}")
+            count = self._insert_batches(statement, rows, batch_size, commit=False)
+            for index in _TRANSACTION_INDEXES.values():
+                connection.execute(index)
+        return count
+
+    def _insert_batches(self, statement: str, rows, batch_size: int, commit: bool = True) -> int:
+        count = 0
+        connection = self._db
+        with connection if commit else _NoCommit():
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) == batch_size:
+                    connection.executemany(statement, batch)
+                    count += len(batch)
+                    batch = []
+            if batch:
+                connection.executemany(statement, batch)
+                count += len(batch)
+        return count
+
+    def load_transactions(self, asset_id: Optional[str] = None, start: Optional[datetime] = None,
+                          end: Optional[datetime] = None) -> List[Transaction]:
+        """
+        Lee transacciones en orden de fecha, opcionalmente de un activo y un rango.
+        :param asset_id: ID del activo (opcional).
+        :param start: Fecha inicial incluida (opcional).
+        :param end: Fecha final excluida (opcional).
+        :return: Lista de Transaction.
+        """
+        where, params = self._filters(asset_id, start, end)
+        cursor = self._db.execute(
+            f"SELECT id, asset_id, type, date, price, quantity, fees, notes FROM transactions{where} ORDER BY date",
+            params)
+        epoch = datetime(1970, 1, 1)
+        return [Transaction(id=row[0], asset_id=row[1], type=TransactionType(row[2]),
+                            date=epoch + np.timedelta64(row[3], 'us').item(), price=row[4], quantity=row[5],
+                            fees=row[6], notes=row[7])
+                for row in cursor]
+
+    @staticmethod
+    def _filters(asset_id, start, end) -> Tuple[str, list]:
+        clauses, params = [], []
+        if asset_id is not None:
+            clauses.append("asset_id = ?")
+            params.append(asset_id)
+        if start is not None:
+            clauses.append("date >= ?")
+            params.append(to_timestamp(start))
+        if end is not None:
+            clauses.append("date < ?")
+            params.append(to_timestamp(end))
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def load_ledger(self, ledger: Optional[TransactionLedger] = None) -> TransactionLedger:
+        """
+        Carga todas las transacciones en un TransactionLedger con una sola carga por columnas.
+        :param ledger: Libro al que agregar (por defecto, uno nuevo).
+        :return: Libro con las transacciones.
+        """
+        ledger = ledger or TransactionLedger()
+        rows = self._db.execute(
+            "SELECT asset_id, type, date, price, quantity, fees FROM transactions ORDER BY date").fetchall()
+        if not rows:
+            return ledger
+        asset_ids, types, dates, prices, quantities, fees = zip(*rows)
+        codes = {asset_id: ledger.asset_code(asset_id) for asset_id in dict.fromkeys(asset_ids)}
+        ledger.extend_arrays(np.fromiter((codes[asset_id] for asset_id in asset_ids), np.int32, len(rows)),
+                             np.array(types, dtype=np.int8), np.array(dates, dtype=np.int64),
+                             np.array(prices), np.array(quantities), np.array(fees))
+        return ledger
+
+    def monthly_summary(self, year: int, month: int) -> Dict[TransactionType, Dict[str, float]]:
+        """
+        Totales de un mes por tipo de transacción (usa el índice por año y mes).
+        :param year: Año.
+        :param month: Mes (1-12).
+        :return: Diccionario TransactionType -> {'count', 'amount', 'fees'}.
+        """
+        cursor = self._db.execute(
+            "SELECT type, COUNT(*), SUM(price * quantity), SUM(fees) FROM transactions "
+            "WHERE year = ? AND month = ? GROUP BY type", (year, month))
+        return {TransactionType(row[0]): {'count': row[1], 'amount': row[2], 'fees': row[3]} for row in cursor}
+
+    def position(self, asset_id: str, as_of: Optional[datetime] = None) -> float:
+        """
+        Cantidad de un activo a una fecha (usa el índice por activo y fecha).
+        :param asset_id: ID del activo.
+        :param as_of: Fecha de corte incluida (por defecto, todas las transacciones).
+        :return: Cantidad en cartera.
+        """
+        sql = ("SELECT COALESCE(SUM(CASE type WHEN ? THEN quantity WHEN ? THEN -ABS(quantity) "
+               "WHEN ? THEN quantity ELSE 0 END), 0) FROM transactions WHERE asset_id = ?")
+        params = [TransactionType.BUY.value, TransactionType.SELL.value, TransactionType.TRANSFER.value, asset_id]
+        if as_of is not None:
+            sql += " AND date <= ?"
+            params.append(to_timestamp(as_of))
+        return float(self._db.execute(sql, params).fetchone()[0])
+
+    # ------------------------------------------------------------------
+    # Precios y fuentes de dinero
+    # ------------------------------------------------------------------
+    def insert_prices(self, symbol: str, dates, close, open=None, high=None, low=None, volume=None,
+                      batch_size: int = BATCH_SIZE) -> int:
+        """
+        Inserta o reemplaza precios diarios de un símbolo.
+        :param symbol: Símbolo del activo.
+        :param dates: Fechas.
+        :param close: Cierres.
+        :param open: Aperturas (opcional).
+        :param high: Máximos (opcional).
+        :param low: Mínimos (opcional).
+        :param volume: Volúmenes (opcional).
+        :param batch_size: Filas por executemany.
+        :return: Cantidad de filas escritas.
+        """
+        days = np.asarray(dates, dtype='datetime64[D]').astype(np.int64).tolist()
+        count = len(days)
+        columns = [np.asarray(values, dtype=np.float64).tolist() if values is not None else [None] * count
+                   for values in (open, high, low, close, volume)]
+        return self._insert_batches("INSERT OR REPLACE INTO prices VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                    zip([symbol] * count, days, *columns), batch_size)
+
+    def load_prices(self, symbol: str, start=None, end=None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Cierres de un símbolo entre dos fechas (ambas incluidas).
+        :param symbol: Símbolo del activo.
+        :param start: Fecha inicial (opcional).
+        :param end: Fecha final (opcional).
+        :return: Tupla (fechas datetime64[D], cierres).
+        """
+        low = np.datetime64(start, 'D').astype(np.int64) if start is not None else -2 ** 62
+        high = np.datetime64(end, 'D').astype(np.int64) if end is not None else 2 ** 62
+        rows = self._db.execute("SELECT date, close FROM prices WHERE symbol = ? AND date BETWEEN ? AND ? "
+                                "ORDER BY date", (symbol, int(low), int(high))).fetchall()
+        dates = np.array([row[0] for row in rows], dtype=np.int64).astype('datetime64[D]')
+        return dates, np.array([row[1] for row in rows], dtype=np.float64)
+
+    def add_money_sources(self, kind: str, entries: Iterable[Tuple[str, float, str]]) -> int:
+        """
+        Agrega entradas de fuentes de dinero.
+        :param kind: Uno de MONEY_SOURCE_KINDS.
+        :param entries: Tuplas (descripción, valor, fecha 'YYYY-MM-DD').
+        :return: Cantidad de entradas agregadas.
+        """
+        if kind not in MONEY_SOURCE_KINDS:
+            raise ValueError(f"Tipo de fuente de dinero desconocido: {kind}")
+        rows = []
+        for description, value, day in entries:
+            parsed = datetime.strptime(day, "%Y-%m-%d")
+            rows.append((kind, description, float(value), day, parsed.year, parsed.month))
+        return self._insert_batches("INSERT INTO money_sources (kind, description, value, date, year, month) "
+                                    "VALUES (?, ?, ?, ?, ?, ?)", rows, BATCH_SIZE)
+
+    def money_sources(self, year: int, month: int, kind: Optional[str] = None) -> List[Tuple[str, str, float, str]]:
+        """
+        Entradas de fuentes de dinero de un mes.
+        :param year: Año.
+        :param month: Mes (1-12).
+        :param kind: Limita a un tipo (opcional).
+        :return: Lista de tuplas (tipo, descripción, valor, fecha).
+        """
+        sql = "SELECT kind, description, value, date FROM money_sources WHERE year = ? AND month = ?"
+        params: list = [year, month]
+        if kind is not None:
+            sql += " AND kind = ?"
+            params.append(kind)
+        return self._db.execute(sql + " ORDER BY date, id", params).fetchall()
+
+    # ------------------------------------------------------------------
+    # Mantenimiento
+    # ------------------------------------------------------------------
+    def backup_database(self, destination: str):
+        """
+        Copia la base a otro archivo con la API de backup de SQLite (consistente aunque
+        haya escrituras en curso).
+        :param destination: Archivo de destino.
+        """
+        with sqlite3.connect(destination) as target:
+            self._db.backup(target)
+        target.close()
+
+    def restore_database(self, source: str):
+        """
+        Reemplaza el contenido de la base con el de una copia de seguridad.
+        :param source: Archivo de la copia.
+        """
+        if not os.path.exists(source):
+            raise ValueError(f"No existe la copia de seguridad {source}.")
+        with sqlite3.connect(source) as origin:
+            origin.backup(self._db)
+        origin.close()
+
+    def optimize_queries(self):
+        """Actualiza las estadísticas del planificador y compacta el WAL."""
+        connection = self._db
+        connection.execute("ANALYZE")
+        connection.execute("PRAGMA optimize")
+        connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+
+'''
 class DataMigrationService:
     """Maneja migración y transformación de datos"""
     methods:
@@ -17,4 +455,53 @@ class DataMigrationService:
     - export_to_formats
     - validate_data_integrity
 
-'''
\ No newline at end of file
+'''
+
+
+def _benchmark(transactions: int = 1_000_000, assets: int = 2_000, path: Optional[str] = None):
+    """Mide la carga y las consultas de un libro de un millón de transacciones."""
+    import shutil
+    import tempfile
+    import time
+
+    folder = tempfile.mkdtemp(prefix='portfolio-db-')
+    path = path or os.path.join(folder, 'bench.db')
+    rng = np.random.default_rng(0)
+    asset_ids = [f"A{code}" for code in range(assets)]
+    dates = (np.datetime64('2010-01-01', 'us') +
+             np.sort(rng.integers(0, 14 * 365 * 86_400, transactions)) * np.int64(1_000_000))
+    try:
+        with DatabaseManager(path) as database:
+            started = time.perf_counter()
+            database.insert_transaction_arrays(
+                [f"T{row}" for row in range(transactions)],
+                [asset_ids[code] for code in rng.integers(0, assets, transactions).tolist()],
+                rng.choice([TransactionType.BUY.value, TransactionType.SELL.value], transactions),
+                dates, rng.uniform(1, 500, transactions), rng.uniform(1, 100, transactions),
+                np.zeros(transactions))
+            inserted = time.perf_counter() - started
+            database.optimize_queries()
+
+            started = time.perf_counter()
+            ledger = database.load_ledger()
+            loaded = time.perf_counter() - started
+
+            started = time.perf_counter()
+            summary = database.monthly_summary(2020, 6)
+            monthly = time.perf_counter() - started
+
+            started = time.perf_counter()
+            history = database.load_transactions('A42', datetime(2015, 1, 1), datetime(2016, 1, 1))
+            by_asset = time.perf_counter() - started
+
+            print(f"{transactions:,} transacciones, {assets:,} activos")
+            print(f"  inserción en lotes:        {inserted:.2f} s")
+            print(f"  carga al libro:            {loaded:.2f} s ({len(ledger):,} filas)")
+            print(f"  resumen mensual:           {monthly * 1000:.1f} ms ({sum(v['count'] for v in summary.values()):,} filas)")
+            print(f"  historial de un activo:    {by_asset * 1000:.1f} ms ({len(history)} filas)")
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    _benchmark()
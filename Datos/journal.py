@@ -0,0 +1,545 @@
+# -*- coding: utf-8 -*-
+#2.5 Diario de cambios (solo agregar) con compactación en segundo plano
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from Datos.loader import asset_from_record, asset_to_record
+from Datos.snapshot import Signature, load_snapshot, read_header, write_snapshot
+from Entidades.holdings import HoldingsTable
+from Entidades.models import Asset, AssetType, Transaction, TransactionType
+
+# Tamaño del diario a partir del cual se compacta en el snapshot
+COMPACT_BYTES = 4 * 1024 * 1024
+# Segundos entre reintentos automáticos de una compactación que falló
+COMPACT_RETRY_SECONDS = 60.0
+
+_ACTIVE = 'journal.jsonl'
+_SEALED = 'journal.sealed.jsonl'
+_SNAPSHOT = 'snapshot.bin'
+
+OPERATIONS = ('add_asset', 'update_asset', 'remove_asset', 'add_transaction', 'update_prices', 'import_file')
+
+# Operación registrada: (secuencia, operación, datos)
+Entry = Tuple[int, str, Dict]
+# Última importación del archivo JSON: (firma del archivo, IDs de los activos importados)
+Source = Tuple[Signature, List[str]]
+
+
+def transaction_to_record(transaction: Transaction) -> Dict:
+    """Convierte una Transaction a un diccionario serializable."""
+    return {
+        'id': transaction.id,
+        'asset_id': transaction.asset_id,
+        'type': transaction.type.name,
+        'date': transaction.date.isoformat(),
+        'price': transaction.price,
+        'quantity': transaction.quantity,
+        'fees': transaction.fees,
+        'notes': transaction.notes,
+    }
+
+
+def transaction_from_record(record: Dict) -> Transaction:
+    """Construye una Transaction a partir de transaction_to_record."""
+    return Transaction(id=record['id'], asset_id=record['asset_id'], type=TransactionType[record['type']],
+                       date=datetime.fromisoformat(record['date']), price=record['price'],
+                       quantity=record['quantity'], fees=record.get('fees', 0.0), notes=record.get('notes'))
+
+
+def apply_entries(target, entries: Iterable[Entry], after: int = 0) -> int:
+    """
+    Aplica operaciones del diario a un portafolio (o a un objeto con `holdings`, `add_asset`,
+    `remove_asset` y `add_transactions`). Las transacciones se agregan juntas al final.
+    :param target: Portfolio destino.
+    :param entries: Operaciones en orden de secuencia.
+    :param after: Las operaciones con secuencia menor o igual ya están incluidas y se ignoran.
+    :return: Última secuencia aplicada (after si no había ninguna nueva).
+    """
+    holdings = target.holdings
+    transactions: List[Transaction] = []
+    sequence = after
+    for sequence_number, operation, data in entries:
+        if sequence_number <= sequence:
+            continue
+        if operation == 'add_asset':
+            if holdings.row_of(data['id']) is None:
+                target.add_asset(asset_from_record(data))
+        elif operation == 'update_asset':
+            row = holdings.row_of(data['id'])
+            if row is not None:
+                view = holdings.view(row)
+                for name, value in data.items():
+                    if name != 'id':
+                        setattr(view, name, AssetType[value] if name == 'type' else value)
+        elif operation == 'remove_asset':
+            if holdings.row_of(data['id']) is not None:
+                target.remove_asset(data['id'])
+        elif operation == 'add_transaction':
+            transactions.append(transaction_from_record(data))
+        elif operation == 'update_prices':
+            rows, prices = [], []
+            for symbol, price in data['prices'].items():
+                symbol_rows = holdings.rows_of_symbol(symbol)
+                rows.extend(symbol_rows)
+                prices.extend([price] * len(symbol_rows))
+            holdings.set_prices(rows, prices)
+        elif operation == 'import_file':
+            # Solo registra el origen de los activos (ver PortfolioJournal.source)
+            pass
+        else:
+            raise ValueError(f"Operación desconocida en el diario: {operation}")
+        sequence = sequence_number
+    if transactions:
+        target.add_transactions(transactions)
+    return sequence
+
+
+class _Book:
+    """Tenencias y transacciones sin libro ni análisis, para compactar el diario."""
+
+    def __init__(self):
+        self.holdings = HoldingsTable()
+        self.transactions: List[Transaction] = []
+
+    def add_asset(self, asset: Asset):
+        self.holdings.append(asset)
+
+    def remove_asset(self, asset_id: str):
+        self.holdings.remove_row(self.holdings.row_of(asset_id))
+
+    def add_transactions(self, transactions: List[Transaction]):
+        self.transactions.extend(transactions)
+
+
+def _read_lines(path: str) -> Iterable[Entry]:
+    """Lee un diario; una última línea incompleta (escritura interrumpida) se descarta."""
+    if not os.path.exists(path):
+        return
+    with open(path, 'r', encoding='utf-8') as file:
+        lines = file.readlines()
+    for number, line in enumerate(lines):
+        try:
+            entry = json.loads(line)
+        except json.JSONDecodeError:
+            if number == len(lines) - 1:
+                return
+            raise ValueError(f"{path}: línea {number + 1} dañada.")
+        yield entry['seq'], entry['op'], entry['data']
+
+
+def _header_source(header: Optional[Dict]) -> Optional[Source]:
+    """Origen registrado en el encabezado de un snapshot."""
+    if header is None or header.get('source') is None or header.get('source_ids') is None:
+        return None
+    return tuple(header['source']), header['source_ids']
+
+
+def _latest_source(entries: Iterable[Entry], source: Optional[Source], after: int = 0) -> Optional[Source]:
+    """Origen de la última operación import_file posterior a `after` (o `source` si no hay)."""
+    for sequence, operation, data in entries:
+        if operation == 'import_file' and sequence > after:
+            source = tuple(data['source']), data['ids']
+    return source
+
+
+def _truncate_torn_tail(path: str):
+    """Quita una última línea incompleta para que las siguientes no queden pegadas a ella."""
+    if not os.path.exists(path):
+        return
+    with open(path, 'rb+') as file:
+        data = file.read()
+        if data and not data.endswith(b'\n'):
+            file.truncate(data.rfind(b'\n') + 1)
+
+
+class PortfolioJournal:
+    """
+    Persistencia del portafolio como diario de cambios: cada modificación agrega una línea
+    JSON (costo O(1), sin reescribir el portafolio). Un hilo escritor junta las líneas
+    pendientes y las confirma con un único fsync (group commit). Cuando el diario supera
+    COMPACT_BYTES se sella y un hilo en segundo plano lo integra al snapshot binario
+    (Datos.snapshot); al iniciar se carga el snapshot y se aplican los diarios sellado y activo.
+    Un error de disco en cualquiera de los dos hilos se guarda en `error` y falla solo las
+    operaciones afectadas; si la compactación falla, el diario sellado se conserva y se
+    reintenta más tarde (o al volver a abrir el diario).
+    """
+
+    def __init__(self, directory: str, compact_bytes: int = COMPACT_BYTES):
+        """
+        :param directory: Carpeta del diario y el snapshot (se crea si no existe).
+        :param compact_bytes: Tamaño del diario que dispara la compactación.
+        """
+        self.directory = directory
+        self.compact_bytes = compact_bytes
+        os.makedirs(directory, exist_ok=True)
+        self.stats = {'appends': 0, 'commits': 0, 'compactions': 0, 'errors': 0}
+        self.error: Optional[Exception] = None
+        header = self._read_snapshot_header()
+        self._snapshot_sequence = header['sequence'] if header is not None else 0
+        self._tail: Optional[List[Entry]] = self._read_tail()
+        self._sequence = max([self._snapshot_sequence] + [sequence for sequence, _, _ in self._tail])
+        self._source = _latest_source(self._tail, _header_source(header), self._snapshot_sequence)
+        self._pending: List[Tuple[str, Future]] = []
+        self._condition = threading.Condition()
+        self._closed = False
+        self._compact_requested: Optional[threading.Event] = None
+        self._compaction_error: Optional[Exception] = None
+        self._compaction_failed_at: Optional[float] = None
+        _truncate_torn_tail(self._path(_ACTIVE))
+        self._file = open(self._path(_ACTIVE), 'a', encoding='utf-8')
+        self._compactor: Optional[threading.Thread] = None
+        self._writer = threading.Thread(target=self._write_loop, name='journal-writer', daemon=True)
+        self._writer.start()
+        if os.path.exists(self._path(_SEALED)):
+            # La compactación anterior no terminó
+            self._start_compaction()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def __enter__(self) -> 'PortfolioJournal':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ------------------------------------------------------------------
+    # Lectura
+    # ------------------------------------------------------------------
+    def has_data(self) -> bool:
+        """Indica si hay snapshot o cambios registrados."""
+        return self._sequence > 0
+
+    def source(self) -> Optional[Source]:
+        """
+        Última importación del archivo JSON registrada (ver record_import).
+        :return: (firma del archivo, IDs de los activos importados), o None si no hay.
+        """
+        return self._source
+
+    def _read_snapshot_header(self) -> Optional[Dict]:
+        path = self._path(_SNAPSHOT)
+        header = read_header(path)
+        if header is None and os.path.exists(path):
+            self._set_aside()
+        return header
+
+    def _set_aside(self):
+        """
+        Aparta un diario cuyo snapshot no se puede leer (dañado o de otra versión): sin él las
+        operaciones posteriores no alcanzan para reconstruir el portafolio, así que el diario
+        queda vacío y el repositorio vuelve a importar el archivo JSON. Los archivos apartados
+        se conservan con la extensión .unreadable.
+        """
+        for name in (_SNAPSHOT, _SEALED, _ACTIVE):
+            path = self._path(name)
+            if os.path.exists(path):
+                os.replace(path, path + '.unreadable')
+        self._record_error(ValueError(f"{self._path(_SNAPSHOT)}: snapshot ilegible; se apartó el diario."))
+
+    def _read_tail(self) -> List[Entry]:
+        """Operaciones de los diarios sellado y activo, en orden."""
+        return [entry for name in (_SEALED, _ACTIVE) for entry in _read_lines(self._path(name))]
+
+    def replay(self, portfolio) -> int:
+        """
+        Carga en un portafolio el estado del diario: el snapshot binario (columnas copiadas de
+        una vez) más las operaciones posteriores de los diarios.
+        :param portfolio: Portfolio destino (tenencias vacías).
+        :return: Cantidad de activos cargados.
+        """
+        self.sync()
+        if self._compactor is not None:
+            self._compactor.join()
+        tail, self._tail = self._tail, None
+        if tail is None or self.stats['appends']:
+            tail = self._read_tail()
+        header = load_snapshot(self._path(_SNAPSHOT), portfolio)
+        if header is None and os.path.exists(self._path(_SNAPSHOT)):
+            raise ValueError(f"{self._path(_SNAPSHOT)}: no se pudo leer el snapshot.")
+        apply_entries(portfolio, tail, header['sequence'] if header is not None else 0)
+        return len(portfolio.holdings)
+
+    # ------------------------------------------------------------------
+    # Escritura
+    # ------------------------------------------------------------------
+    def append(self, operation: str, data: Dict, wait: bool = True) -> int:
+        """
+        Registra una operación.
+        :param operation: Una de OPERATIONS.
+        :param data: Datos serializables de la operación.
+        :param wait: Si se espera a que la línea esté en disco (fsync).
+        :return: Número de secuencia asignado.
+        """
+        if operation not in OPERATIONS:
+            raise ValueError(f"Operación desconocida: {operation}")
+        future: Future = Future()
+        with self._condition:
+            if self._closed:
+                raise ValueError("El diario está cerrado.")
+            if not self._writer.is_alive():
+                raise ValueError("El hilo escritor del diario terminó.") from self.error
+            self._sequence += 1
+            sequence = self._sequence
+            line = json.dumps({'seq': sequence, 'op': operation, 'data': data}, separators=(',', ':'))
+            self._pending.append((line + '\n', future))
+            self.stats['appends'] += 1
+            self._condition.notify()
+        if wait:
+            future.result()
+        return sequence
+
+    def add_asset(self, asset: Asset, wait: bool = True) -> int:
+        """Registra el alta de un activo."""
+        return self.append('add_asset', asset_to_record(asset), wait)
+
+    def update_asset(self, asset_id: str, fields: Dict, wait: bool = True) -> int:
+        """Registra la modificación de campos de un activo (en el formato de asset_to_record)."""
+        return self.append('update_asset', {**fields, 'id': asset_id}, wait)
+
+    def remove_asset(self, asset_id: str, wait: bool = True) -> int:
+        """Registra la baja de un activo."""
+        return self.append('remove_asset', {'id': asset_id}, wait)
+
+    def add_transaction(self, transaction: Transaction, wait: bool = True) -> int:
+        """Registra una transacción."""
+        return self.append('add_transaction', transaction_to_record(transaction), wait)
+
+    def update_prices(self, symbol_to_price: Dict[str, float], wait: bool = True) -> int:
+        """Registra una actualización masiva de precios por símbolo."""
+        return self.append('update_prices', {'prices': symbol_to_price}, wait)
+
+    def record_import(self, signature: Signature, asset_ids: List[str], wait: bool = True) -> int:
+        """
+        Registra que los activos `asset_ids` se importaron del archivo JSON con esa firma, para
+        reemplazarlos si el archivo cambia.
+        :param signature: Firma del archivo (ver Datos.snapshot.file_signature).
+        :param asset_ids: IDs de los activos importados.
+        :param wait: Si se espera a que la línea esté en disco (fsync).
+        :return: Número de secuencia asignado.
+        """
+        sequence = self.append('import_file', {'source': list(signature), 'ids': list(asset_ids)}, wait)
+        self._source = tuple(signature), list(asset_ids)
+        return sequence
+
+    def sync(self):
+        """Espera a que todo lo registrado hasta ahora esté en disco."""
+        with self._condition:
+            futures = [future for _, future in self._pending]
+        for future in futures:
+            future.result()
+
+    def _write_loop(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed and self._compact_requested is None:
+                    self._condition.wait()
+                if not self._pending and self._closed:
+                    return
+                batch, self._pending = self._pending, []
+                requested, self._compact_requested = self._compact_requested, None
+            try:
+                if batch:
+                    self._commit(batch)
+                self._maybe_rotate(requested is not None)
+            except Exception as error:
+                # El hilo escritor no puede terminar: quienes esperan sus líneas quedarían bloqueados
+                self._record_error(error)
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+            finally:
+                if requested is not None:
+                    requested.set()
+
+    def _record_error(self, error: Exception):
+        self.error = error
+        self.stats['errors'] += 1
+
+    def _commit(self, batch: List[Tuple[str, Future]]):
+        """Escribe un lote de líneas con un único fsync (solo desde el hilo escritor)."""
+        if self._file.closed:
+            # Una escritura o rotación anterior falló: se reabre sin la línea incompleta
+            _truncate_torn_tail(self._path(_ACTIVE))
+            self._file = open(self._path(_ACTIVE), 'a', encoding='utf-8')
+        try:
+            self._file.write(''.join(line for line, _ in batch))
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        except OSError:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+            raise
+        self.stats['commits'] += 1
+        for _, future in batch:
+            future.set_result(None)
+
+    # ------------------------------------------------------------------
+    # Compactación
+    # ------------------------------------------------------------------
+    def _compacting(self) -> bool:
+        return self._compactor is not None and self._compactor.is_alive()
+
+    def _maybe_rotate(self, requested: bool):
+        """Sella el diario si superó el tamaño o se pidió compactar (solo desde el hilo escritor)."""
+        if self._file.closed or self._compacting():
+            return
+        size = self._file.tell()
+        if not size or not (requested or size >= self.compact_bytes):
+            return
+        if os.path.exists(self._path(_SEALED)):
+            # Una compactación anterior falló: se reintenta antes de sellar otro diario
+            if requested or time.monotonic() - (self._compaction_failed_at or 0.0) >= COMPACT_RETRY_SECONDS:
+                self._start_compaction()
+            return
+        self._rotate()
+
+    def _rotate(self):
+        """Sella el diario activo y lanza la compactación (solo desde el hilo escritor)."""
+        self._file.close()
+        try:
+            os.replace(self._path(_ACTIVE), self._path(_SEALED))
+        finally:
+            self._file = open(self._path(_ACTIVE), 'a', encoding='utf-8')
+        self._start_compaction()
+
+    def _start_compaction(self):
+        self._compaction_error = None
+        self._compactor = threading.Thread(target=self._compact, name='journal-compactor', daemon=True)
+        self._compactor.start()
+
+    def _compact(self):
+        """Integra el diario sellado al snapshot y lo elimina; si falla, el diario sellado se conserva."""
+        try:
+            book = _Book()
+            header = load_snapshot(self._path(_SNAPSHOT), book)
+            if header is None and os.path.exists(self._path(_SNAPSHOT)):
+                # Reescribirlo sin su contenido perdería datos: se conserva el diario sellado
+                raise ValueError(f"{self._path(_SNAPSHOT)}: no se pudo leer el snapshot.")
+            after = header['sequence'] if header else 0
+            entries = list(_read_lines(self._path(_SEALED)))
+            sequence = apply_entries(book, entries, after)
+            source = _latest_source(entries, _header_source(header), after)
+            write_snapshot(self._path(_SNAPSHOT), book.holdings, book.transactions, sequence=sequence,
+                           source=source[0] if source else None, source_ids=source[1] if source else None)
+            os.remove(self._path(_SEALED))
+        except Exception as error:
+            self._compaction_error = error
+            self._compaction_failed_at = time.monotonic()
+            self._record_error(error)
+            return
+        self.stats['compactions'] += 1
+
+    def compact(self):
+        """
+        Integra al snapshot todo lo registrado hasta ahora y espera a que termine.
+        Si quedó un diario sellado de una compactación fallida, primero se reintenta esa.
+        :raises Exception: El error de la compactación, si falla (el diario sellado se conserva).
+        """
+        for _ in range(2):
+            if self._compactor is not None:
+                self._compactor.join()
+            retrying = os.path.exists(self._path(_SEALED))
+            done = threading.Event()
+            with self._condition:
+                if self._closed:
+                    raise ValueError("El diario está cerrado.")
+                self._compact_requested = done
+                self._condition.notify()
+            done.wait()
+            if self._compactor is not None:
+                self._compactor.join()
+            if self._compaction_error is not None:
+                raise self._compaction_error
+            if not retrying:
+                return
+
+    def close(self):
+        """Confirma lo pendiente, espera la compactación en curso y cierra el diario."""
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify()
+        self._writer.join()
+        if self._compactor is not None:
+            self._compactor.join()
+        self._file.close()
+
+
+def _benchmark(assets: int = 100_000, edits: int = 2_000):
+    """Compara guardar una edición en el diario contra reescribir todo el archivo JSON."""
+    import shutil
+    import tempfile
+    import time
+
+    from Entidades.models import AssetType
+
+    folder = tempfile.mkdtemp(prefix='journal-')
+    book = [Asset(symbol=f"SYM{code}", name=f"Activo {code}", type=AssetType.STOCK, quantity=1.0,
+                  current_price=10.0) for code in range(assets)]
+    try:
+        records = [asset_to_record(asset) for asset in book]
+        started = time.perf_counter()
+        with open(os.path.join(folder, 'portfolio_data.json'), 'w') as file:
+            json.dump(records, file)
+            file.flush()
+            os.fsync(file.fileno())
+        rewrite = time.perf_counter() - started
+
+        with PortfolioJournal(os.path.join(folder, 'journal'), compact_bytes=1 << 40) as journal:
+            started = time.perf_counter()
+            for asset in book:
+                journal.add_asset(asset, wait=False)
+            journal.sync()
+            bulk = time.perf_counter() - started
+
+            started = time.perf_counter()
+            for code in range(edits):
+                journal.update_asset(book[code].id, {'quantity': 2.0})
+            single = (time.perf_counter() - started) / edits
+
+            # Varios hilos editando a la vez comparten los fsync
+            def edit(offset):
+                for code in range(offset, edits, 8):
+                    journal.update_asset(book[code].id, {'quantity': 3.0})
+            commits = journal.stats['commits']
+            started = time.perf_counter()
+            threads = [threading.Thread(target=edit, args=(offset,)) for offset in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            grouped = time.perf_counter() - started
+            grouped_commits = journal.stats['commits'] - commits
+
+            started = time.perf_counter()
+            journal.compact()
+            compacted = time.perf_counter() - started
+
+        started = time.perf_counter()
+        from dashboard.Portfolio import Portfolio
+        with PortfolioJournal(os.path.join(folder, 'journal')) as journal:
+            loaded = journal.replay(Portfolio())
+        replayed = time.perf_counter() - started
+
+        print(f"{assets:,} activos")
+        print(f"  reescribir portfolio_data.json: {rewrite * 1000:.1f} ms por guardado")
+        print(f"  diario, una edición con fsync:  {single * 1000:.2f} ms")
+        print(f"  diario, {edits:,} ediciones en 8 hilos: {grouped:.2f} s con {grouped_commits:,} fsync")
+        print(f"  alta inicial de {assets:,} activos: {bulk:.2f} s; compactación: {compacted:.2f} s")
+        print(f"  arranque (snapshot + diario): {replayed:.2f} s ({loaded:,} activos)")
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    _benchmark()
@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+#2.3 Carga incremental de portfolio_data.json
+
+import json
+import os
+from typing import Callable, Dict, Iterator, List, Optional
+
+from Entidades.models import Asset, AssetType
+
+DEFAULT_DATA_FILE = "portfolio_data.json"
+
+# Bytes leídos por vez y activos por lote
+CHUNK_SIZE = 64 * 1024
+BATCH_SIZE = 500
+
+# Función de progreso: (bytes leídos, bytes totales)
+Progress = Callable[[int, int], None]
+
+_WHITESPACE = ' \t\r\n'
+_NUMBER_CHARACTERS = '0123456789.eE+-'
+
+
+def iter_records(path: str, chunk_size: int = CHUNK_SIZE, progress: Optional[Progress] = None) -> Iterator[dict]:
+    """
+    Recorre los elementos de un archivo JSON cuyo contenido es una lista, de a uno y sin
+    leer el archivo completo: el buffer solo guarda el elemento en curso y el último bloque leído.
+    :param path: Ruta del archivo.
+    :param chunk_size: Caracteres leídos por vez.
+    :param progress: Función opcional (bytes leídos, bytes totales), llamada con cada bloque.
+    :return: Iterador de elementos (diccionarios).
+    """
+    decoder = json.JSONDecoder()
+    total = os.path.getsize(path)
+    with open(path, 'r', encoding='utf-8-sig') as file:
+        buffer = ''
+        position = 0
+        started = finished = eof = False
+        # Después de '[' o de ',' se espera un elemento; después de un elemento, ',' o ']'
+        after_value = after_comma = False
+
+        def fill() -> bool:
+            nonlocal buffer, position, eof
+            chunk = file.read(chunk_size)
+            if not chunk:
+                eof = True
+                return False
+            buffer = buffer[position:] + chunk
+            position = 0
+            if progress is not None:
+                progress(min(file.buffer.tell(), total), total)
+            return True
+
+        while True:
+            # Saltea espacios y separadores
+            while position < len(buffer) and buffer[position] in _WHITESPACE:
+                position += 1
+            if position == len(buffer):
+                if eof or not fill():
+                    break
+                continue
+            character = buffer[position]
+            if not started:
+                if character != '[':
+                    raise ValueError(f"{path}: se esperaba una lista JSON.")
+                started = True
+                position += 1
+                continue
+            if finished:
+                raise ValueError(f"{path}: contenido inesperado después de la lista.")
+            if character == ']':
+                if after_comma:
+                    raise ValueError(f"{path}: falta un elemento antes de ']'.")
+                finished = True
+                position += 1
+                continue
+            if character == ',':
+                if not after_value:
+                    raise ValueError(f"{path}: ',' sin elemento previo.")
+                after_value, after_comma = False, True
+                position += 1
+                continue
+            if after_value:
+                raise ValueError(f"{path}: falta ',' entre elementos.")
+            try:
+                record, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # El elemento sigue en el próximo bloque
+                if eof or not fill():
+                    raise ValueError(f"{path}: JSON incompleto o inválido.")
+                continue
+            if (not eof and isinstance(record, (int, float)) and not isinstance(record, bool)
+                    and (end == len(buffer) or buffer[end] in _NUMBER_CHARACTERS)):
+                # Un número al final del buffer puede estar cortado
+                if fill():
+                    continue
+            position = end
+            after_value, after_comma = True, False
+            yield record
+        if started and not finished:
+            raise ValueError(f"{path}: la lista no está cerrada.")
+        if progress is not None:
+            progress(total, total)
+
+
+def asset_from_record(record: Dict) -> Asset:
+    """
+    Construye un Asset a partir de un elemento de portfolio_data.json.
+    :param record: Diccionario con 'symbol', 'name', 'type' (nombre de AssetType), 'quantity'
+                   y 'current_price'; los demás campos de Asset son opcionales.
+    :return: Asset.
+    """
+    fields = {
+        'symbol': record['symbol'],
+        'name': record['name'],
+        'type': AssetType[record['type']],
+        'quantity': record['quantity'],
+        'current_price': record['current_price'],
+    }
+    for name in ('id', 'category', 'purchase_price', 'currency', 'exchange', 'country'):
+        if record.get(name) is not None:
+            fields[name] = record[name]
+    return Asset(**fields)
+
+
+def asset_to_record(asset: Asset) -> Dict:
+    """
+    Convierte un Asset (o una vista de HoldingsTable) al formato de portfolio_data.json.
+    :param asset: Activo.
+    :return: Diccionario serializable (inverso de asset_from_record).
+    """
+    return {
+        'id': asset.id,
+        'symbol': asset.symbol,
+        'name': asset.name,
+        'type': asset.type.name,
+        'category': asset.category,
+        'purchase_price': asset.purchase_price,
+        'quantity': asset.quantity,
+        'current_price': asset.current_price,
+        'currency': asset.currency,
+        'exchange': asset.exchange,
+        'country': asset.country,
+    }
+
+
+def iter_asset_batches(path: str = DEFAULT_DATA_FILE, batch_size: int = BATCH_SIZE,
+                       progress: Optional[Progress] = None) -> Iterator[List[Asset]]:
+    """
+    Lee los activos de portfolio_data.json en lotes, para poder mostrar los primeros
+    antes de terminar de leer el archivo.
+    :param path: Ruta del archivo (si no existe no se produce ningún lote).
+    :param batch_size: Activos por lote.
+    :param progress: Función opcional (bytes leídos, bytes totales).
+    :return: Iterador de listas de Asset.
+    """
+    if not os.path.exists(path):
+        return
+    batch: List[Asset] = []
+    for record in iter_records(path, progress=progress):
+        batch.append(asset_from_record(record))
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def load_assets(target, path: str = DEFAULT_DATA_FILE, batch_size: int = BATCH_SIZE,
+                progress: Optional[Progress] = None) -> int:
+    """
+    Carga todos los activos del archivo en un portafolio o tabla de tenencias.
+    :param target: Portfolio (se usa add_asset) o cualquier objeto con append (por ejemplo HoldingsTable).
+    :param path: Ruta del archivo.
+    :param batch_size: Activos por lote.
+    :param progress: Función opcional (bytes leídos, bytes totales).
+    :return: Cantidad de activos cargados.
+    """
+    add = getattr(target, 'add_asset', None) or target.append
+    count = 0
+    for batch in iter_asset_batches(path, batch_size, progress):
+        for asset in batch:
+            add(asset)
+        count += len(batch)
+    return count
+
+
+def _benchmark(assets: int = 200_000):
+    """Compara la carga incremental con json.load sobre un archivo sintético."""
+    import tempfile
+    import time
+    import tracemalloc
+
+    from Entidades.holdings import HoldingsTable
+
+    types = [asset_type.name for asset_type in AssetType]
+    handle, path = tempfile.mkstemp(suffix='.json')
+    with os.fdopen(handle, 'w') as file:
+        json.dump([{'symbol': f"SYM{code}", 'name': f"Activo {code}", 'type': types[code % len(types)],
+                    'quantity': code % 100 + 1.5, 'current_price': 10.0 + code % 7} for code in range(assets)], file)
+    try:
+        started = time.perf_counter()
+        first = None
+        for batch in iter_asset_batches(path):
+            if first is None:
+                first = time.perf_counter() - started
+        streamed = time.perf_counter() - started
+
+        started = time.perf_counter()
+        with open(path) as file:
+            eager = [asset_from_record(record) for record in json.load(file)]
+        eager_time = time.perf_counter() - started
+
+        # Memoria del análisis del archivo (sin contar los Asset, que se conservan igual en ambos casos)
+        tracemalloc.start()
+        for _ in iter_records(path):
+            pass
+        _, streamed_peak = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        with open(path) as file:
+            json.load(file)
+        _, eager_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        table = HoldingsTable()
+        started = time.perf_counter()
+        load_assets(table, path)
+        into_table = time.perf_counter() - started
+
+        print(f"{assets:,} activos ({os.path.getsize(path) / 1e6:.1f} MB)")
+        print(f"  incremental: primer lote {first * 1000:.1f} ms, total {streamed:.2f} s, pico {streamed_peak / 1e6:.1f} MB")
+        print(f"  json.load:   total {eager_time:.2f} s, pico {eager_peak / 1e6:.1f} MB ({len(eager):,})")
+        print(f"  carga en HoldingsTable: {into_table:.2f} s")
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    _benchmark()
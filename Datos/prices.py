@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+#2.2 Almacén de precios históricos (archivos binarios mapeados en memoria)
+
+import mmap
+import os
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Registro de ancho fijo: fecha (días desde 1970-01-01), OHLC y volumen
+PRICE_DTYPE = np.dtype([
+    ('date', '<i4'),
+    ('open', '<f8'),
+    ('high', '<f8'),
+    ('low', '<f8'),
+    ('close', '<f8'),
+    ('volume', '<f8'),
+])
+PRICE_FIELDS = PRICE_DTYPE.names[1:]
+
+# Encabezado: identificador de formato y tamaño de registro
+_MAGIC = b'PTPRICE1'
+_HEADER = np.dtype([('magic', 'S8'), ('record_size', '<i4'), ('reserved', '<i4')])
+_EXTENSION = '.bin'
+
+
+def _days(dates) -> np.ndarray:
+    """Convierte fechas (date, datetime64 o texto ISO) a días desde 1970-01-01."""
+    return np.asarray(dates, dtype='datetime64[D]').astype(np.int64)
+
+
+class PriceStore:
+    """
+    Historial de precios con un archivo por símbolo. Cada archivo es un encabezado seguido
+    de registros de ancho fijo ordenados por fecha, y solo admite agregar al final.
+    La lectura mapea el archivo en memoria y devuelve vistas de NumPy sobre el mapeo, sin
+    copiar ni interpretar el contenido; los mapeos se conservan hasta que el símbolo cambia.
+    """
+
+    def __init__(self, root: str):
+        """
+        :param root: Carpeta de los archivos (se crea al guardar el primer precio).
+        """
+        self.root = root
+        self.version = 0
+        self._maps: Dict[str, Tuple[mmap.mmap, np.ndarray]] = {}
+
+    def __enter__(self) -> 'PriceStore':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def path(self, symbol: str) -> str:
+        """
+        Ruta del archivo de un símbolo (los caracteres no válidos en nombres de archivo se reemplazan).
+        :param symbol: Símbolo del activo.
+        :return: Ruta del archivo.
+        """
+        if not symbol:
+            raise ValueError("El símbolo no puede estar vacío.")
+        return os.path.join(self.root, re.sub(r'[^A-Za-z0-9._-]', '_', symbol) + _EXTENSION)
+
+    def symbols(self) -> List[str]:
+        """
+        Símbolos con historial guardado (según el nombre de archivo).
+        :return: Lista ordenada de símbolos.
+        """
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name[:-len(_EXTENSION)] for name in os.listdir(self.root) if name.endswith(_EXTENSION))
+
+    def _release(self, symbol: str):
+        entry = self._maps.pop(symbol, None)
+        if entry is not None:
+            mapping, _ = entry
+            try:
+                mapping.close()
+            except BufferError:
+                # Hay vistas vivas sobre el mapeo: se libera cuando dejen de usarse
+                pass
+
+    def close(self):
+        """Libera todos los mapeos abiertos."""
+        for symbol in list(self._maps):
+            self._release(symbol)
+
+    def history(self, symbol: str, start=None, end=None) -> np.ndarray:
+        """
+        Devuelve el historial de un símbolo entre dos fechas (ambas incluidas) como vista
+        sobre el archivo mapeado. Las columnas se acceden por nombre (por ejemplo ['close']).
+        :param symbol: Símbolo del activo.
+        :param start: Fecha inicial (opcional).
+        :param end: Fecha final (opcional).
+        :return: Array estructurado con PRICE_DTYPE (vacío si no hay historial).
+        """
+        records = self._records(symbol)
+        first = 0 if start is None else np.searchsorted(records['date'], _days(start), side='left')
+        last = len(records) if end is None else np.searchsorted(records['date'], _days(end), side='right')
+        return records[first:last]
+
+    def _records(self, symbol: str) -> np.ndarray:
+        entry = self._maps.get(symbol)
+        if entry is not None:
+            return entry[1]
+        path = self.path(symbol)
+        if not os.path.exists(path):
+            return np.zeros(0, dtype=PRICE_DTYPE)
+        with open(path, 'rb') as file:
+            mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        header = np.frombuffer(mapping, dtype=_HEADER, count=1)[0]
+        if header['magic'] != _MAGIC or header['record_size'] != PRICE_DTYPE.itemsize:
+            mapping.close()
+            raise ValueError(f"El archivo {path} no tiene el formato de precios esperado.")
+        count = (len(mapping) - _HEADER.itemsize) // PRICE_DTYPE.itemsize
+        records = np.frombuffer(mapping, dtype=PRICE_DTYPE, count=count, offset=_HEADER.itemsize)
+        self._maps[symbol] = (mapping, records)
+        return records
+
+    def last_date(self, symbol: str) -> Optional[np.datetime64]:
+        """
+        Última fecha guardada de un símbolo.
+        :param symbol: Símbolo del activo.
+        :return: Fecha datetime64[D] o None si no hay historial.
+        """
+        records = self._records(symbol)
+        return np.datetime64(int(records['date'][-1]), 'D') if len(records) else None
+
+    def append(self, symbol: str, dates: Sequence, open: Sequence[float], high: Sequence[float],
+               low: Sequence[float], close: Sequence[float], volume: Optional[Sequence[float]] = None) -> int:
+        """
+        Agrega registros al final del archivo de un símbolo. Las fechas deben ser
+        estrictamente crecientes y posteriores a la última guardada.
+        :param symbol: Símbolo del activo.
+        :param dates: Fechas de los registros.
+        :param open: Precios de apertura.
+        :param high: Máximos.
+        :param low: Mínimos.
+        :param close: Precios de cierre.
+        :param volume: Volúmenes (por defecto, cero).
+        :return: Cantidad de registros del símbolo después de agregar.
+        """
+        days = _days(dates).reshape(-1)
+        records = np.zeros(len(days), dtype=PRICE_DTYPE)
+        records['date'] = days
+        for name, values in zip(PRICE_FIELDS, (open, high, low, close, volume)):
+            if values is not None:
+                records[name] = values
+        return self.append_records(symbol, records)
+
+    def append_records(self, symbol: str, records: np.ndarray) -> int:
+        """
+        Agrega registros ya armados con PRICE_DTYPE (ver append).
+        :param symbol: Símbolo del activo.
+        :param records: Array estructurado con PRICE_DTYPE.
+        :return: Cantidad de registros del símbolo después de agregar.
+        """
+        records = np.asarray(records, dtype=PRICE_DTYPE)
+        if not len(records):
+            return len(self._records(symbol))
+        if (np.diff(records['date']) <= 0).any():
+            raise ValueError("Las fechas deben ser estrictamente crecientes.")
+        last = self.last_date(symbol)
+        if last is not None and records['date'][0] <= last.astype(np.int64):
+            raise ValueError(f"El historial de {symbol} ya llega hasta {last}; solo se puede agregar al final.")
+
+        path = self.path(symbol)
+        self._release(symbol)
+        os.makedirs(self.root, exist_ok=True)
+        with open(path, 'ab') as file:
+            if file.tell() == 0:
+                header = np.zeros(1, dtype=_HEADER)
+                header['magic'] = _MAGIC
+                header['record_size'] = PRICE_DTYPE.itemsize
+                file.write(header.tobytes())
+            file.write(records.tobytes())
+        self.version += 1
+        return len(self._records(symbol))
+
+    def closes(self, symbols: Sequence[Optional[str]], dates: np.ndarray) -> np.ndarray:
+        """
+        Matriz fechas x símbolos con el último cierre conocido a cada fecha.
+        :param symbols: Símbolos (None o sin historial deja la columna en NaN).
+        :param dates: Calendario ordenado (datetime64[D]).
+        :return: Matriz de precios de cierre (NaN antes del primer registro).
+        """
+        days = _days(dates)
+        result = np.full((len(days), len(symbols)), np.nan)
+        for column, symbol in enumerate(symbols):
+            if not symbol:
+                continue
+            records = self._records(symbol)
+            if not len(records):
+                continue
+            position = np.searchsorted(records['date'], days, side='right') - 1
+            known = position >= 0
+            result[known, column] = records['close'][position[known]]
+        return result
+
+
+def _benchmark(symbols: int = 500, years: int = 20, root: Optional[str] = None):
+    """Mide la escritura y la lectura por mapeo de un historial diario sintético."""
+    import shutil
+    import tempfile
+    import time
+
+    root = root or tempfile.mkdtemp(prefix='prices-')
+    rng = np.random.default_rng(0)
+    dates = np.arange(np.datetime64('2000-01-01'), np.datetime64('2000-01-01') + years * 365)
+    try:
+        store = PriceStore(root)
+        started = time.perf_counter()
+        for code in range(symbols):
+            close = 100 * np.cumprod(1 + rng.normal(0, 0.01, len(dates)))
+            store.append(f"S{code}", dates, close, close * 1.01, close * 0.99, close, rng.uniform(0, 1e6, len(dates)))
+        written = time.perf_counter() - started
+        store.close()
+
+        started = time.perf_counter()
+        matrix = store.closes([f"S{code}" for code in range(symbols)], dates[-365:])
+        read = time.perf_counter() - started
+        store.close()
+
+        print(f"{symbols:,} símbolos x {len(dates):,} días")
+        print(f"  escritura:            {written:.2f} s")
+        print(f"  último año (matriz):  {read * 1000:.1f} ms  {matrix.shape}")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    _benchmark()
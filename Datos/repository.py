@@ -0,0 +1,363 @@
+# -*- coding: utf-8 -*-
+#2.4 Repositorio único del portafolio por proceso
+
+import atexit
+import dataclasses
+import os
+import threading
+from typing import Callable, Dict, Iterator, List, Optional
+
+from Datos.journal import PortfolioJournal
+from Datos.loader import DEFAULT_DATA_FILE, Progress, asset_to_record, iter_asset_batches
+from Datos.prices import PriceStore
+from Datos.snapshot import Signature, file_signature, load_snapshot, write_snapshot
+from Entidades.holdings import ReadOnlyAssetView, ReadOnlyHoldings
+from Entidades.models import Asset, Transaction
+from dashboard.Portfolio import Portfolio
+
+DEFAULT_PRICE_HISTORY = "price_history"
+DEFAULT_JOURNAL = "portfolio_journal"
+
+# Métodos de Portfolio que modifican datos y no se exponen en las vistas de solo lectura
+_MUTATORS = frozenset({'add_asset', 'remove_asset', 'remove_assets', 'add_transaction', 'add_transactions',
+                       'update_prices'})
+# Campos de Asset que se pueden modificar con PortfolioRepository.update_asset
+_EDITABLE_FIELDS = frozenset(field.name for field in dataclasses.fields(Asset)) - {'id'}
+# Partes mutables del Portfolio que la vista no expone (las transacciones se escriben por el diario)
+_HIDDEN = frozenset({'ledger'})
+# Consultas de Portfolio que devuelven activos enlazados a la tabla
+_ASSET_LOOKUPS = frozenset({'find_asset', 'find_asset_by_symbol'})
+
+Listener = Callable[[List[str]], None]
+
+
+class PortfolioView:
+    """
+    Vista de solo lectura de un Portfolio compartido: expone las consultas y los análisis,
+    pero no los métodos que modifican activos, transacciones o precios.
+    Suscribirse a la vista es suscribirse al repositorio (recargas y cambios de precios).
+    """
+
+    __slots__ = ('_portfolio', '_repository', '_holdings', '_transactions')
+
+    def __init__(self, portfolio: Portfolio, repository: 'PortfolioRepository'):
+        object.__setattr__(self, '_portfolio', portfolio)
+        object.__setattr__(self, '_repository', repository)
+        object.__setattr__(self, '_holdings', ReadOnlyHoldings(portfolio.holdings))
+        object.__setattr__(self, '_transactions', (None, ()))
+
+    def __getattr__(self, name: str):
+        if name in _MUTATORS or name in _HIDDEN or name.startswith('_'):
+            raise TypeError(f"El portafolio compartido es de solo lectura ({name} no está disponible).")
+        if name in ('holdings', 'assets'):
+            return self._holdings
+        if name == 'transactions':
+            return self._transaction_tuple()
+        if name in _ASSET_LOOKUPS:
+            lookup = getattr(self._portfolio, name)
+
+            def find(key: str) -> Optional[Asset]:
+                asset = lookup(key)
+                return None if asset is None else ReadOnlyAssetView(asset)
+            return find
+        return getattr(self._portfolio, name)
+
+    def __setattr__(self, name: str, value):
+        raise TypeError("El portafolio compartido es de solo lectura.")
+
+    def _transaction_tuple(self) -> tuple:
+        """Copia inmutable de las transacciones, rehecha solo cuando cambian."""
+        version, transactions = self._transactions
+        current = self._portfolio._transaction_version
+        if version != current:
+            transactions = tuple(self._portfolio.transactions)
+            object.__setattr__(self, '_transactions', (current, transactions))
+        return transactions
+
+    def subscribe(self, callback: Listener) -> Callable[[], None]:
+        """
+        Registra una función que se llama con los IDs afectados cuando el repositorio recarga
+        el archivo o cambian precios.
+        :param callback: Función que recibe la lista de IDs.
+        :return: Función sin argumentos que cancela la suscripción.
+        """
+        return self._repository.subscribe(callback)
+
+
+class PortfolioRepository:
+    """
+    Dueño del Portfolio cargado desde portfolio_data.json. Lo carga una sola vez, entrega
+    vistas de solo lectura compartidas y vuelve a leer el archivo solo si cambió su fecha de
+    modificación o su tamaño. Las vistas se suscriben para enterarse de los cambios en lugar
+    de recargar por su cuenta.
+    Con un diario (PortfolioJournal) las modificaciones pasan por el repositorio y se guardan
+    como una línea cada una; el portafolio se reconstruye desde el diario. El archivo JSON se
+    importa al diario junto con su firma: si después cambia, sus activos se reemplazan por los
+    del archivo nuevo (los agregados desde la aplicación y las transacciones se conservan).
+    Sin diario, después de importar el JSON se guarda un snapshot binario (Datos.snapshot) con
+    la firma del archivo; mientras la firma coincida, el arranque carga el snapshot.
+    """
+
+    def __init__(self, path: str = DEFAULT_DATA_FILE, price_store_root: Optional[str] = DEFAULT_PRICE_HISTORY,
+                 journal_dir: Optional[str] = None, snapshot_path: Optional[str] = None):
+        """
+        :param path: Archivo de activos.
+        :param price_store_root: Carpeta del historial de precios (None para no usarlo).
+        :param journal_dir: Carpeta del diario de cambios (None para no guardar los cambios).
+        :param snapshot_path: Snapshot binario del archivo (por defecto, el archivo con extensión
+                              .snapshot); solo se usa sin diario.
+        """
+        self.path = path
+        self.snapshot_path = snapshot_path or os.path.splitext(path)[0] + '.snapshot'
+        price_store = PriceStore(price_store_root) if price_store_root else None
+        self.portfolio = Portfolio(price_store=price_store)
+        self.journal: Optional[PortfolioJournal] = PortfolioJournal(journal_dir) if journal_dir else None
+        self.loading = False
+        self._loaded = False
+        self._replayed = False
+        self._signature: Optional[Signature] = None
+        self._file_ids: List[str] = []
+        self._listeners: List[Listener] = []
+        self._view = PortfolioView(self.portfolio, self)
+        self.portfolio.subscribe(self._notify)
+
+    def view(self) -> PortfolioView:
+        """
+        Vista de solo lectura compartida del portafolio.
+        :return: PortfolioView.
+        """
+        return self._view
+
+    def _journaled(self) -> bool:
+        return self.journal is not None and self.journal.has_data()
+
+    def is_stale(self) -> bool:
+        """Indica si el archivo cambió (o nunca se cargó) desde la última carga."""
+        if self.loading:
+            return False
+        if not self._loaded:
+            return True
+        signature = file_signature(self.path)
+        if signature is None and self._journaled():
+            # Sin archivo, el diario tiene el portafolio completo
+            return False
+        return signature != self._signature
+
+    def subscribe(self, callback: Listener) -> Callable[[], None]:
+        """
+        Registra una función que se llama con los IDs afectados por cada recarga o
+        actualización de precios.
+        :param callback: Función que recibe la lista de IDs.
+        :return: Función sin argumentos que cancela la suscripción.
+        """
+        self._listeners.append(callback)
+
+        def unsubscribe():
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+        return unsubscribe
+
+    def _notify(self, asset_ids: List[str]):
+        for callback in list(self._listeners):
+            callback(asset_ids)
+
+    def load_batches(self, progress: Optional[Progress] = None) -> Iterator[List[Asset]]:
+        """
+        Recarga el archivo de a lotes si cambió, para que la interfaz pueda avanzar entre lotes.
+        Los suscriptores se notifican después del primer lote y al terminar.
+        :param progress: Función opcional (bytes leídos, bytes totales).
+        :return: Iterador de lotes ya agregados al portafolio (vacío si no hacía falta recargar).
+        """
+        if not self.is_stale():
+            return iter(())
+        self.loading = True
+        self._loaded = True
+        self._signature = file_signature(self.path)
+        return self._load(progress)
+
+    def _remove_file_assets(self) -> List[str]:
+        """Quita los activos que vinieron del archivo (registrando las bajas en el diario)."""
+        removed = [asset_id for asset_id in self._file_ids if self.portfolio.holdings.row_of(asset_id) is not None]
+        self.portfolio.remove_assets(removed)
+        if self.journal is not None:
+            for asset_id in removed:
+                self.journal.remove_asset(asset_id, wait=False)
+        self._file_ids = []
+        return removed
+
+    def _batches(self, progress: Optional[Progress]) -> Iterator[List[Asset]]:
+        """Agrega los activos al portafolio y produce cada lote agregado."""
+        holdings = self.portfolio.holdings
+        if self._journaled() and not self._replayed:
+            self._replayed = True
+            self.journal.replay(self.portfolio)
+            source = self.journal.source()
+            if source is None and self._signature is not None:
+                # Diario sin importación registrada: se toma el archivo actual como importado
+                self.journal.record_import(self._signature, list(holdings.text_column('id')))
+                source = self.journal.source()
+            self._file_ids = list(source[1]) if source is not None else []
+            yield list(holdings)
+            if self._signature is None or source[0] == self._signature:
+                return
+            # El archivo cambió desde que se importó: se reemplazan sus activos
+            removed = self._remove_file_assets()
+            if removed:
+                self._notify(removed)
+        if self.journal is None and self._signature is not None and not len(holdings) and \
+                load_snapshot(self.snapshot_path, self.portfolio, self._signature) is not None:
+            self._file_ids = list(holdings.text_column('id'))
+            yield list(holdings)
+            return
+        for batch in iter_asset_batches(self.path, progress=progress):
+            for asset in batch:
+                self.portfolio.add_asset(asset)
+            if self.journal is not None:
+                for asset in batch:
+                    self.journal.add_asset(asset, wait=False)
+            self._file_ids.extend(asset.id for asset in batch)
+            yield batch
+        if self.journal is not None:
+            self._replayed = True
+            if self._signature is not None:
+                self.journal.record_import(self._signature, self._file_ids)
+            self.journal.sync()
+        elif self._signature is not None and len(holdings) == len(self._file_ids) and not self.portfolio.transactions:
+            # El próximo arranque carga las columnas del snapshot en lugar de analizar el JSON
+            write_snapshot(self.snapshot_path, holdings, source=self._signature)
+
+    def _load(self, progress: Optional[Progress]) -> Iterator[List[Asset]]:
+        try:
+            pending = self._remove_file_assets()
+            first = True
+            for batch in self._batches(progress):
+                pending = pending + [asset.id for asset in batch]
+                if first:
+                    first = False
+                    self._notify(pending)
+                    pending = []
+                yield batch
+        finally:
+            self.loading = False
+        if pending or first:
+            self._notify(pending)
+
+    def load(self, progress: Optional[Progress] = None) -> PortfolioView:
+        """
+        Carga (o recarga, si el archivo cambió) todos los activos.
+        :param progress: Función opcional (bytes leídos, bytes totales).
+        :return: Vista compartida del portafolio.
+        """
+        for _ in self.load_batches(progress):
+            pass
+        return self._view
+
+    def refresh(self) -> bool:
+        """
+        Recarga el archivo si cambió su fecha de modificación o su tamaño.
+        :return: True si se recargó.
+        """
+        if not self.is_stale():
+            return False
+        self.load()
+        return True
+
+    # ------------------------------------------------------------------
+    # Modificaciones (se guardan en el diario, si hay)
+    # ------------------------------------------------------------------
+    def add_asset(self, asset: Asset) -> Asset:
+        """
+        Agrega un activo y registra el alta en el diario.
+        :param asset: Activo nuevo.
+        :return: Vista del activo almacenado.
+        """
+        stored = self.portfolio.add_asset(asset)
+        if self.journal is not None:
+            self.journal.add_asset(asset)
+        self._notify([asset.id])
+        return stored
+
+    def update_asset(self, asset_id: str, **fields) -> Asset:
+        """
+        Modifica campos de un activo y registra el cambio en el diario. Si algún valor no es
+        válido no se modifica ningún campo.
+        :param asset_id: ID del activo.
+        :param fields: Campos de Asset y sus nuevos valores (el ID no se puede cambiar).
+        :return: Vista del activo modificado.
+        """
+        stored = self.portfolio.find_asset(asset_id)
+        if stored is None:
+            raise ValueError(f"No se encontró un activo con el ID {asset_id} para modificar.")
+        unknown = [name for name in fields if name not in _EDITABLE_FIELDS]
+        if unknown:
+            raise ValueError(f"Campos de activo no modificables: {unknown}")
+        previous = {name: getattr(stored, name) for name in fields}
+        try:
+            for name, value in fields.items():
+                setattr(stored, name, value)
+        except (TypeError, ValueError):
+            for name, value in previous.items():
+                setattr(stored, name, value)
+            raise
+        if self.journal is not None:
+            record = asset_to_record(stored)
+            self.journal.update_asset(asset_id, {name: record[name] for name in fields})
+        self._notify([asset_id])
+        return stored
+
+    def remove_asset(self, asset_id: str):
+        """
+        Elimina un activo y registra la baja en el diario.
+        :param asset_id: ID del activo.
+        """
+        self.portfolio.remove_asset(asset_id)
+        if self.journal is not None:
+            self.journal.remove_asset(asset_id)
+        self._notify([asset_id])
+
+    def add_transaction(self, transaction: Transaction):
+        """
+        Agrega una transacción y la registra en el diario.
+        :param transaction: Transacción nueva.
+        """
+        self.portfolio.add_transaction(transaction)
+        if self.journal is not None:
+            self.journal.add_transaction(transaction)
+        self._notify([transaction.asset_id])
+
+    def update_prices(self, symbol_to_price: Dict[str, float]) -> List[str]:
+        """
+        Actualiza precios por símbolo (Portfolio.update_prices) y registra los nuevos precios.
+        :param symbol_to_price: Diccionario símbolo -> nuevo precio.
+        :return: IDs de los activos cuyo precio cambió.
+        """
+        changed = self.portfolio.update_prices(symbol_to_price)
+        if changed and self.journal is not None:
+            self.journal.update_prices(dict(symbol_to_price))
+        return changed
+
+    def close(self):
+        """Confirma los cambios pendientes y cierra el diario."""
+        if self.journal is not None:
+            self.journal.close()
+
+
+_repositories: Dict[str, PortfolioRepository] = {}
+_repositories_lock = threading.Lock()
+
+
+def shared_repository(path: str = DEFAULT_DATA_FILE, journal_dir: Optional[str] = DEFAULT_JOURNAL) -> PortfolioRepository:
+    """
+    Repositorio único del proceso para un archivo de activos.
+    :param path: Archivo de activos.
+    :param journal_dir: Carpeta del diario de cambios (solo se usa al crear el repositorio).
+    :return: PortfolioRepository (se crea sin cargar la primera vez).
+    """
+    key = os.path.abspath(path)
+    with _repositories_lock:
+        repository = _repositories.get(key)
+        if repository is None:
+            repository = _repositories[key] = PortfolioRepository(path, journal_dir=journal_dir)
+            # Confirma lo pendiente del diario y espera la compactación al cerrar la aplicación
+            atexit.register(repository.close)
+        return repository
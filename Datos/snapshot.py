@@ -0,0 +1,381 @@
+# -*- coding: utf-8 -*-
+#2.6 Snapshot binario versionado del portafolio
+
+import json
+import os
+import struct
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from Entidades.holdings import CODED_COLUMNS, NUMERIC_COLUMNS, TEXT_COLUMNS, HoldingsTable
+from Entidades.models import Transaction, TransactionType
+
+MAGIC = b'PTSNAP\r\n'
+SNAPSHOT_VERSION = 1
+
+# Encabezado fijo: MAGIC, versión y largo del encabezado JSON
+_PREFIX = struct.Struct('<8sII')
+# Las secciones empiezan en múltiplos de este valor para poder usarlas como arrays mapeados
+_ALIGNMENT = 64
+# Separador de las columnas de texto (no puede aparecer dentro de los valores)
+_SEPARATOR = '\x00'
+
+# Columnas de tenencias que se guardan (la marca de precio cambiado no se persiste)
+_HOLDINGS_COLUMNS = tuple((name, dtype) for name, dtype in NUMERIC_COLUMNS if name != 'dirty')
+
+# Columnas numéricas de transacciones
+_TRANSACTION_COLUMNS = (
+    ('asset', np.int32),        # Índice en la lista de IDs de activo de la sección 'transactions.asset_ids'
+    ('type_code', np.int8),
+    ('date', np.int64),         # microsegundos desde 1970-01-01
+    ('price', np.float64),
+    ('quantity', np.float64),
+    ('fees', np.float64),
+    ('has_notes', np.bool_),
+)
+
+# Claves obligatorias del encabezado JSON
+_HEADER_KEYS = ('sequence', 'source', 'assets', 'transactions', 'labels', 'sections', 'data_length')
+
+# Firma de un archivo fuente: (fecha de modificación en ns, tamaño)
+Signature = Tuple[int, int]
+
+
+def file_signature(path: str) -> Optional[Signature]:
+    """
+    Firma de un archivo para detectar si cambió desde que se generó un snapshot.
+    :param path: Ruta del archivo.
+    :return: (st_mtime_ns, st_size) o None si no existe.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _encode_text(values: Sequence[Optional[str]]) -> bytes:
+    text = _SEPARATOR.join('' if value is None else value for value in values)
+    if text.count(_SEPARATOR) != max(len(values) - 1, 0):
+        raise ValueError("Los textos no pueden contener el carácter nulo.")
+    return text.encode('utf-8')
+
+
+def _decode_text(data, count: int) -> List[str]:
+    if count == 0:
+        return []
+    values = bytes(data).decode('utf-8').split(_SEPARATOR)
+    if len(values) != count:
+        raise ValueError("Columna de texto dañada en el snapshot.")
+    return values
+
+
+class SnapshotFile:
+    """
+    Snapshot abierto con las secciones mapeadas en memoria: las columnas numéricas se
+    devuelven como arrays de NumPy sobre el archivo, sin copiar ni interpretar registros.
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: Ruta del snapshot.
+        """
+        self.path = path
+        self.header = read_header(path)
+        if self.header is None:
+            raise ValueError(f"{path}: no es un snapshot compatible (versión {SNAPSHOT_VERSION}).")
+        self._data = np.memmap(path, dtype=np.uint8, mode='r')
+        self._sections: Dict[str, dict] = {section['name']: section for section in self.header['sections']}
+
+    @property
+    def sequence(self) -> int:
+        """Último número de secuencia del diario incluido (0 si no proviene de un diario)."""
+        return self.header['sequence']
+
+    @property
+    def source(self) -> Optional[Signature]:
+        """Firma del archivo JSON del que se generó (None si no proviene de uno)."""
+        source = self.header['source']
+        return tuple(source) if source is not None else None
+
+    @property
+    def source_ids(self) -> Optional[List[str]]:
+        """IDs de los activos importados del archivo JSON de origen (None si no se registraron)."""
+        return self.header.get('source_ids')
+
+    def _bytes(self, name: str) -> np.ndarray:
+        section = self._sections[name]
+        start = self.header['data_offset'] + section['offset']
+        return self._data[start:start + section['length']]
+
+    def array(self, name: str) -> np.ndarray:
+        """
+        Columna numérica mapeada (solo lectura).
+        :param name: Nombre de la sección (por ejemplo 'holdings.quantity').
+        :return: Array de NumPy sobre el archivo.
+        """
+        return self._bytes(name).view(np.dtype(self._sections[name]['dtype']))
+
+    def strings(self, name: str) -> List[str]:
+        """
+        Columna de texto decodificada.
+        :param name: Nombre de la sección.
+        :return: Lista de cadenas.
+        """
+        return _decode_text(self._bytes(name), self._sections[name]['count'])
+
+    def load_holdings(self, holdings: HoldingsTable):
+        """
+        Carga las tenencias en una tabla vacía con HoldingsTable.load_columns.
+        :param holdings: Tabla destino.
+        """
+        holdings.load_columns({name: self.array(f'holdings.{name}') for name, _ in _HOLDINGS_COLUMNS},
+                              {name: self.strings(f'holdings.{name}') for name in TEXT_COLUMNS},
+                              self.header['labels'])
+
+    def transactions(self) -> List[Transaction]:
+        """
+        Reconstruye las transacciones a partir de sus columnas.
+        :return: Lista de Transaction.
+        """
+        count = self.header['transactions']
+        if count == 0:
+            return []
+        asset_ids = self.strings('transactions.asset_ids')
+        assets = [asset_ids[code] for code in self.array('transactions.asset').tolist()]
+        types = {transaction_type.value: transaction_type for transaction_type in TransactionType}
+        kinds = [types[code] for code in self.array('transactions.type_code').tolist()]
+        dates = self.array('transactions.date').astype('datetime64[us]').tolist()
+        notes = self.strings('transactions.notes')
+        has_notes = self.array('transactions.has_notes').tolist()
+        return [Transaction(id=transaction_id, asset_id=asset_id, type=kind, date=date, price=price,
+                            quantity=quantity, fees=fees, notes=note if present else None)
+                for transaction_id, asset_id, kind, date, price, quantity, fees, note, present in zip(
+                    self.strings('transactions.id'), assets, kinds, dates,
+                    self.array('transactions.price').tolist(), self.array('transactions.quantity').tolist(),
+                    self.array('transactions.fees').tolist(), notes, has_notes)]
+
+    def load(self, target):
+        """
+        Carga tenencias y transacciones en un portafolio (o en un objeto con `holdings` y
+        `add_transactions`) cuyas tenencias estén vacías. Todas las secciones se leen y validan
+        antes de modificar el destino, así un snapshot dañado no deja una carga a medias.
+        :param target: Portfolio destino.
+        """
+        transactions = self.transactions()
+        self.load_holdings(target.holdings)
+        if transactions:
+            target.add_transactions(transactions)
+
+    def close(self):
+        """Libera el mapeo del archivo."""
+        mapping = getattr(self._data, '_mmap', None)
+        self._data = None
+        if mapping is not None:
+            try:
+                mapping.close()
+            except BufferError:
+                # Quedan arrays del usuario sobre el archivo; se libera cuando se descarten
+                pass
+
+    def __enter__(self) -> 'SnapshotFile':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_header(path: str) -> Optional[Dict]:
+    """
+    Lee solo el encabezado de un snapshot (sin tocar las secciones).
+    :param path: Ruta del snapshot.
+    :return: Encabezado, o None si el archivo no existe, es de otro formato o versión, o está
+             dañado o incompleto.
+    """
+    try:
+        with open(path, 'rb') as file:
+            prefix = file.read(_PREFIX.size)
+            if len(prefix) < _PREFIX.size:
+                return None
+            magic, version, length = _PREFIX.unpack(prefix)
+            if magic != MAGIC or version != SNAPSHOT_VERSION:
+                return None
+            header = json.loads(file.read(length).decode('utf-8'))
+        if not isinstance(header, dict) or not all(key in header for key in _HEADER_KEYS):
+            return None
+        header['data_offset'] = _aligned(_PREFIX.size + length)
+        if header['data_offset'] + header['data_length'] > os.path.getsize(path):
+            # Escritura incompleta
+            return None
+    except (OSError, ValueError, TypeError):
+        # ValueError incluye JSON y UTF-8 inválidos
+        return None
+    return header
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // _ALIGNMENT) * _ALIGNMENT
+
+
+def write_snapshot(path: str, holdings: HoldingsTable, transactions: Sequence[Transaction] = (),
+                   sequence: int = 0, source: Optional[Signature] = None,
+                   source_ids: Optional[Sequence[str]] = None) -> int:
+    """
+    Guarda tenencias y transacciones como columnas binarias. Se escribe en un archivo
+    temporal que reemplaza al anterior al terminar, así un corte nunca deja un snapshot a medias.
+    :param path: Ruta del snapshot.
+    :param holdings: Tabla de tenencias.
+    :param transactions: Transacciones.
+    :param sequence: Último número de secuencia del diario incluido.
+    :param source: Firma del archivo JSON de origen (ver file_signature).
+    :param source_ids: IDs de los activos que vinieron de ese archivo (para reemplazarlos si cambia).
+    :return: Tamaño del archivo en bytes.
+    """
+    sections: List[Tuple[str, dict, bytes]] = []
+
+    def add(name: str, values, dtype=None, count: Optional[int] = None):
+        if dtype is None:
+            sections.append((name, {'dtype': 'u1', 'count': count}, values))
+        else:
+            array = np.ascontiguousarray(values, dtype=dtype)
+            sections.append((name, {'dtype': array.dtype.str}, array.tobytes()))
+
+    size = len(holdings)
+    for name, dtype in _HOLDINGS_COLUMNS:
+        add(f'holdings.{name}', holdings.column(name), dtype)
+    for name in TEXT_COLUMNS:
+        add(f'holdings.{name}', _encode_text(holdings.text_column(name)), count=size)
+
+    transactions = list(transactions)
+    asset_codes: Dict[str, int] = {}
+    columns = {name: [] for name, _ in _TRANSACTION_COLUMNS}
+    for transaction in transactions:
+        columns['asset'].append(asset_codes.setdefault(transaction.asset_id, len(asset_codes)))
+        columns['type_code'].append(transaction.type.value)
+        columns['price'].append(transaction.price)
+        columns['quantity'].append(transaction.quantity)
+        columns['fees'].append(transaction.fees)
+        columns['has_notes'].append(transaction.notes is not None)
+    columns['date'] = np.array([transaction.date for transaction in transactions],
+                               dtype='datetime64[us]').astype(np.int64)
+    for name, dtype in _TRANSACTION_COLUMNS:
+        add(f'transactions.{name}', columns[name], dtype)
+    add('transactions.id', _encode_text([transaction.id for transaction in transactions]), count=len(transactions))
+    add('transactions.asset_ids', _encode_text(list(asset_codes)), count=len(asset_codes))
+    add('transactions.notes', _encode_text([transaction.notes for transaction in transactions]),
+        count=len(transactions))
+
+    entries, offset = [], 0
+    for name, entry, data in sections:
+        offset = _aligned(offset)
+        entries.append({'name': name, 'offset': offset, 'length': len(data), **entry})
+        offset += len(data)
+    header = json.dumps({
+        'sequence': sequence,
+        'source': list(source) if source is not None else None,
+        'source_ids': list(source_ids) if source_ids is not None else None,
+        'assets': size,
+        'transactions': len(transactions),
+        'labels': {field: holdings.labels(field) for field in CODED_COLUMNS},
+        'sections': entries,
+        'data_length': offset,
+    }, separators=(',', ':')).encode('utf-8')
+    data_offset = _aligned(_PREFIX.size + len(header))
+
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as file:
+        file.write(_PREFIX.pack(MAGIC, SNAPSHOT_VERSION, len(header)))
+        file.write(header)
+        for entry, (_, _, data) in zip(entries, sections):
+            file.seek(data_offset + entry['offset'])
+            file.write(data)
+        file.truncate(data_offset + offset)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary, path)
+    return data_offset + offset
+
+
+def load_snapshot(path: str, target, source: Optional[Signature] = None) -> Optional[Dict]:
+    """
+    Carga un snapshot si existe, es de esta versión, no está dañado y no está desactualizado.
+    :param path: Ruta del snapshot.
+    :param target: Portfolio destino (tenencias vacías).
+    :param source: Firma esperada del archivo JSON de origen (None para no comprobarla).
+    :return: Encabezado del snapshot cargado, o None (sin modificar el destino) si hay que
+             reconstruir el portafolio desde el JSON o el diario.
+    """
+    header = read_header(path)
+    if header is None or (source is not None and tuple(header['source'] or ()) != tuple(source)):
+        return None
+    try:
+        with SnapshotFile(path) as snapshot:
+            snapshot.load(target)
+            return snapshot.header
+    except (OSError, ValueError, KeyError, IndexError, TypeError):
+        return None
+
+
+def _benchmark(assets: int = 100_000, transactions: int = 100_000):
+    """Compara el arranque desde el snapshot binario contra la importación de portfolio_data.json."""
+    import shutil
+    import tempfile
+    import time
+
+    from Datos.loader import load_assets
+    from Entidades.models import AssetType
+    from dashboard.Portfolio import Portfolio
+
+    folder = tempfile.mkdtemp(prefix='snapshot-')
+    json_path = os.path.join(folder, 'portfolio_data.json')
+    snapshot_path = os.path.join(folder, 'portfolio.snapshot')
+    types = [asset_type.name for asset_type in AssetType]
+    currencies = ['USD', 'ARS', 'EUR']
+    try:
+        with open(json_path, 'w') as file:
+            json.dump([{'symbol': f"SYM{code}", 'name': f"Activo {code}", 'type': types[code % len(types)],
+                        'quantity': code % 100 + 1.5, 'current_price': 10.0 + code % 7,
+                        'currency': currencies[code % 3]} for code in range(assets)], file)
+
+        started = time.perf_counter()
+        imported = Portfolio()
+        load_assets(imported, json_path)
+        from_json = time.perf_counter() - started
+
+        ids = imported.holdings.text_column('id')
+        imported.add_transactions(
+            Transaction(asset_id=ids[code % assets], date=datetime(2020, 1, 1 + code % 28), price=10.0,
+                        quantity=1.0) for code in range(transactions))
+        started = time.perf_counter()
+        written = write_snapshot(snapshot_path, imported.holdings, imported.transactions,
+                                 source=file_signature(json_path))
+        saved = time.perf_counter() - started
+
+        started = time.perf_counter()
+        header_only = read_header(snapshot_path)
+        with SnapshotFile(snapshot_path) as snapshot:
+            holdings_only = Portfolio()
+            snapshot.load_holdings(holdings_only.holdings)
+        holdings_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        restored = Portfolio()
+        load_snapshot(snapshot_path, restored, file_signature(json_path))
+        full = time.perf_counter() - started
+
+        assert header_only is not None and len(restored.holdings) == assets
+        assert restored.holdings.totals('currency') == imported.holdings.totals('currency')
+        assert not restored.holdings.check_consistency()
+        print(f"{assets:,} activos ({os.path.getsize(json_path) / 1e6:.1f} MB de JSON, "
+              f"{written / 1e6:.1f} MB de snapshot con {transactions:,} transacciones)")
+        print(f"  importación JSON (solo activos):  {from_json:.2f} s")
+        print(f"  snapshot, solo activos:           {holdings_time * 1000:.1f} ms")
+        print(f"  snapshot, activos + transacciones: {full:.2f} s (escritura {saved:.2f} s)")
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    _benchmark()
@@ -0,0 +1,618 @@
+# -*- coding: utf-8 -*-
+#1.2 Tabla columnar de tenencias
+
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from Entidades.models import Asset, AssetType
+
+# Columnas numéricas contiguas y su tipo de dato
+NUMERIC_COLUMNS = (
+    ('quantity', np.float64),
+    ('purchase_price', np.float64),
+    ('current_price', np.float64),
+    ('type_code', np.int8),
+    ('currency_code', np.int32),
+    ('category_code', np.int32),
+    ('exchange_code', np.int32),
+    ('country_code', np.int32),
+    ('dirty', np.bool_),        # Precio cambiado desde la última vez que se limpió
+)
+
+# Columnas de texto que se guardan como listas paralelas
+TEXT_COLUMNS = ('id', 'symbol', 'name')
+
+# Campos de texto repetitivos que se guardan codificados (campo -> columna de códigos)
+CODED_COLUMNS = {
+    'currency': 'currency_code',
+    'category': 'category_code',
+    'exchange': 'exchange_code',
+    'country': 'country_code',
+}
+
+# Dimensiones con totales incrementales
+AGGREGATE_DIMENSIONS = ('type', 'category', 'currency', 'exchange')
+
+# Campos cuyo cambio modifica los totales incrementales
+_AGGREGATED_FIELDS = frozenset(AGGREGATE_DIMENSIONS + ('quantity', 'purchase_price', 'current_price'))
+
+_INITIAL_CAPACITY = 64
+
+
+class AssetView(Asset):
+    """
+    Vista compatible con Asset sobre una fila de HoldingsTable.
+    Lee y escribe directamente en las columnas de la tabla.
+    """
+
+    def __init__(self, table: 'HoldingsTable', row: int):
+        self._table = table
+        self._row = row
+        self._values: Optional[dict] = None
+
+    def _get(self, column: str):
+        if self._table is None:
+            return self._values[column]
+        return self._table.get_value(self._row, column)
+
+    def _set(self, column: str, value):
+        if self._table is None:
+            self._values[column] = value
+        else:
+            self._table.set_value(self._row, column, value)
+
+    def _detach(self):
+        """Copia los valores actuales y desvincula la vista de la tabla."""
+        self._values = {name: self._get(name) for name in _ASSET_FIELDS}
+        self._table = None
+
+    id = property(lambda self: self._get('id'), lambda self, v: self._set('id', v))
+    symbol = property(lambda self: self._get('symbol'), lambda self, v: self._set('symbol', v))
+    name = property(lambda self: self._get('name'), lambda self, v: self._set('name', v))
+    type = property(lambda self: self._get('type'), lambda self, v: self._set('type', v))
+    category = property(lambda self: self._get('category'), lambda self, v: self._set('category', v))
+    purchase_price = property(lambda self: self._get('purchase_price'), lambda self, v: self._set('purchase_price', v))
+    quantity = property(lambda self: self._get('quantity'), lambda self, v: self._set('quantity', v))
+    current_price = property(lambda self: self._get('current_price'), lambda self, v: self._set('current_price', v))
+    currency = property(lambda self: self._get('currency'), lambda self, v: self._set('currency', v))
+    exchange = property(lambda self: self._get('exchange'), lambda self, v: self._set('exchange', v))
+    country = property(lambda self: self._get('country'), lambda self, v: self._set('country', v))
+
+
+_ASSET_FIELDS = (
+    'id', 'symbol', 'name', 'type', 'category', 'purchase_price',
+    'quantity', 'current_price', 'currency', 'exchange', 'country',
+)
+
+
+class HoldingsTable:
+    """
+    Almacena las tenencias del portafolio en columnas contiguas de NumPy.
+    Se comporta como una secuencia de AssetView. Mantiene índices hash por
+    ID y por símbolo; las bajas mueven la última fila al hueco, por lo que
+    el orden de las filas no se conserva.
+    Los totales por dimensión se actualizan en O(1) en cada cambio y
+    `version` aumenta con cada modificación.
+    """
+
+    def __init__(self, assets: Iterable[Asset] = ()):
+        self._size = 0
+        self._columns: Dict[str, np.ndarray] = {
+            name: np.zeros(_INITIAL_CAPACITY, dtype=dtype) for name, dtype in NUMERIC_COLUMNS
+        }
+        self._text: Dict[str, list] = {name: [] for name in TEXT_COLUMNS}
+        self._views: List[Optional[AssetView]] = []
+        self._labels: Dict[str, list] = {name: [] for name in CODED_COLUMNS}
+        self._label_codes: Dict[str, dict] = {name: {} for name in CODED_COLUMNS}
+        self._id_rows: Dict[str, int] = {}
+        self._symbol_ids: Dict[str, Dict[str, None]] = {}
+        self.version = 0
+        self._value_total = 0.0
+        self._cost_total = 0.0
+        self._totals: Dict[str, Dict[object, list]] = {name: {} for name in AGGREGATE_DIMENSIONS}
+        for asset in assets:
+            self.append(asset)
+
+    # ------------------------------------------------------------------
+    # Secuencia de activos
+    # ------------------------------------------------------------------
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[AssetView]:
+        for row in range(self._size):
+            yield self.view(row)
+
+    def __getitem__(self, row: int) -> AssetView:
+        if row < 0:
+            row += self._size
+        if not 0 <= row < self._size:
+            raise IndexError("Índice de activo fuera de rango.")
+        return self.view(row)
+
+    def view(self, row: int) -> AssetView:
+        """
+        Devuelve la vista (cacheada) de una fila.
+        :param row: Número de fila.
+        :return: AssetView enlazada a la fila.
+        """
+        view = self._views[row]
+        if view is None:
+            view = self._views[row] = AssetView(self, row)
+        return view
+
+    # ------------------------------------------------------------------
+    # Columnas
+    # ------------------------------------------------------------------
+    def column(self, name: str) -> np.ndarray:
+        """
+        Devuelve la porción activa de una columna numérica (sin copiar).
+        :param name: Nombre de la columna.
+        :return: Vista de NumPy con una entrada por activo.
+        """
+        return self._columns[name][:self._size]
+
+    def text_column(self, name: str) -> list:
+        """
+        Devuelve una columna de texto.
+        :param name: Nombre de la columna.
+        :return: Lista con una entrada por activo.
+        """
+        return self._text[name]
+
+    def code_of(self, field: str, label) -> int:
+        """
+        Devuelve el código interno de un valor de un campo codificado, registrándolo si es nuevo.
+        :param field: Campo codificado ('currency', 'category', 'exchange' o 'country').
+        :param label: Valor del campo (por ejemplo 'USD'); puede ser None.
+        :return: Código entero del valor.
+        """
+        codes = self._label_codes[field]
+        code = codes.get(label)
+        if code is None:
+            labels = self._labels[field]
+            code = codes[label] = len(labels)
+            labels.append(label)
+        return code
+
+    def labels(self, field: str) -> list:
+        """
+        Devuelve los valores registrados de un campo codificado, indexados por código.
+        :param field: Campo codificado ('currency', 'category', 'exchange' o 'country').
+        :return: Lista código -> valor.
+        """
+        return self._labels[field]
+
+    def load_columns(self, columns: Dict[str, np.ndarray], text: Dict[str, list], labels: Dict[str, list]):
+        """
+        Carga masiva en una tabla vacía a partir de columnas ya codificadas (por ejemplo, las
+        de un snapshot binario): copia cada columna de una vez y calcula los totales con
+        operaciones vectorizadas en lugar de agregar fila por fila.
+        :param columns: Columna numérica -> valores (las que falten quedan en cero).
+        :param text: Columna de texto (TEXT_COLUMNS) -> lista de valores.
+        :param labels: Campo codificado (CODED_COLUMNS) -> lista código -> valor.
+        """
+        if self._size:
+            raise ValueError("La carga por columnas requiere una tabla vacía.")
+        size = len(text['id'])
+        if any(len(text[name]) != size for name in TEXT_COLUMNS) or \
+                any(len(values) != size for values in columns.values()):
+            raise ValueError("Todas las columnas deben tener la misma longitud.")
+        id_rows = dict(zip(text['id'], range(size)))
+        if len(id_rows) != size:
+            raise ValueError("Hay IDs de activo repetidos.")
+        types = columns.get('type_code')
+        if types is not None and not np.isin(types, [asset_type.value for asset_type in AssetType]).all():
+            raise ValueError("Códigos de tipo de activo desconocidos.")
+        for field, code_column in CODED_COLUMNS.items():
+            codes = columns.get(code_column)
+            if codes is not None and size and not 0 <= int(codes.min()) <= int(codes.max()) < len(labels[field]):
+                raise ValueError(f"Códigos de {field} fuera de rango.")
+
+        self._grow(size)
+        for name, dtype in NUMERIC_COLUMNS:
+            if name in columns:
+                self._columns[name][:size] = columns[name]
+        self._columns['dirty'][:size] = False
+        self._text = {name: list(text[name]) for name in TEXT_COLUMNS}
+        self._views = [None] * size
+        for field in CODED_COLUMNS:
+            self._labels[field] = list(labels[field])
+            self._label_codes[field] = {label: code for code, label in enumerate(self._labels[field])}
+        self._id_rows = id_rows
+        for asset_id, symbol in zip(self._text['id'], self._text['symbol']):
+            self._symbol_ids.setdefault(symbol, {})[asset_id] = None
+        self._size = size
+
+        values = self.market_values()
+        self._value_total = float(values.sum())
+        self._cost_total = float(np.dot(self.column('quantity'), self.column('purchase_price')))
+        for dimension, totals in self._totals.items():
+            code_column = 'type_code' if dimension == 'type' else CODED_COLUMNS[dimension]
+            used, inverse = np.unique(self.column(code_column), return_inverse=True)
+            counts = np.bincount(inverse, minlength=len(used))
+            sums = np.bincount(inverse, weights=values, minlength=len(used))
+            for code, count, total in zip(used.tolist(), counts.tolist(), sums.tolist()):
+                key = AssetType(code) if dimension == 'type' else self._labels[dimension][code]
+                totals[key] = [count, total]
+        self.version += 1
+
+    def _grow(self, minimum: int):
+        capacity = len(self._columns['quantity'])
+        if minimum <= capacity:
+            return
+        while capacity < minimum:
+            capacity *= 2
+        for name, values in self._columns.items():
+            grown = np.zeros(capacity, dtype=values.dtype)
+            grown[:self._size] = values[:self._size]
+            self._columns[name] = grown
+
+    # ------------------------------------------------------------------
+    # Altas, bajas y modificaciones
+    # ------------------------------------------------------------------
+    def append(self, asset: Asset) -> AssetView:
+        """
+        Copia un activo a una nueva fila de la tabla.
+        :param asset: Instancia de Asset a almacenar.
+        :return: AssetView de la nueva fila.
+        """
+        if asset.id in self._id_rows:
+            raise ValueError(f"Ya existe un activo con el ID {asset.id}.")
+        row = self._size
+        self._grow(row + 1)
+        columns = self._columns
+        columns['quantity'][row] = asset.quantity
+        columns['purchase_price'][row] = asset.purchase_price
+        columns['current_price'][row] = asset.current_price
+        columns['type_code'][row] = asset.type.value
+        columns['dirty'][row] = False
+        for name, code_column in CODED_COLUMNS.items():
+            columns[code_column][row] = self.code_of(name, getattr(asset, name))
+        for name in TEXT_COLUMNS:
+            self._text[name].append(getattr(asset, name))
+        self._views.append(None)
+        self._id_rows[asset.id] = row
+        self._symbol_ids.setdefault(asset.symbol, {})[asset.id] = None
+        self._size += 1
+        self._account(row, 1)
+        self.version += 1
+        return self.view(row)
+
+    def remove_row(self, row: int):
+        """
+        Elimina una fila en O(1) moviendo la última fila a su lugar.
+        :param row: Número de fila a eliminar.
+        """
+        view = self._views[row]
+        if view is not None:
+            view._detach()
+        self._account(row, -1)
+        self.version += 1
+        asset_id = self._text['id'][row]
+        symbol = self._text['symbol'][row]
+        del self._id_rows[asset_id]
+        symbol_ids = self._symbol_ids[symbol]
+        del symbol_ids[asset_id]
+        if not symbol_ids:
+            del self._symbol_ids[symbol]
+
+        last = self._size - 1
+        if row != last:
+            for values in self._columns.values():
+                values[row] = values[last]
+            for values in self._text.values():
+                values[row] = values[last]
+            moved = self._views[row] = self._views[last]
+            if moved is not None:
+                moved._row = row
+            self._id_rows[self._text['id'][row]] = row
+        for values in self._text.values():
+            values.pop()
+        self._views.pop()
+        self._size = last
+        if last == 0:
+            # Descarta el error de redondeo acumulado
+            self._value_total = self._cost_total = 0.0
+
+    def row_of(self, asset_id: str) -> Optional[int]:
+        """
+        Busca la fila de un activo por su ID.
+        :param asset_id: ID del activo.
+        :return: Número de fila o None si no existe.
+        """
+        return self._id_rows.get(asset_id)
+
+    def rows_of_symbol(self, symbol: str) -> List[int]:
+        """
+        Busca las filas de los activos con un símbolo, en orden de alta.
+        :param symbol: Símbolo del activo.
+        :return: Lista de números de fila (vacía si no hay ninguno).
+        """
+        return [self._id_rows[asset_id] for asset_id in self._symbol_ids.get(symbol, ())]
+
+    def get_value(self, row: int, field: str):
+        """Lee un campo de Asset desde las columnas."""
+        if field in self._text:
+            return self._text[field][row]
+        if field == 'type':
+            return AssetType(int(self._columns['type_code'][row]))
+        if field in CODED_COLUMNS:
+            return self._labels[field][self._columns[CODED_COLUMNS[field]][row]]
+        return float(self._columns[field][row])
+
+    def set_value(self, row: int, field: str, value):
+        """
+        Escribe un campo de Asset en las columnas. El valor se convierte antes de descontar
+        la fila de los totales, así un valor inválido no los deja inconsistentes.
+        """
+        if field in self._text:
+            column, stored = None, value
+        elif field == 'type':
+            column, stored = 'type_code', AssetType(value).value
+        elif field in CODED_COLUMNS:
+            column, stored = CODED_COLUMNS[field], self.code_of(field, value)
+        elif field in self._columns and self._columns[field].dtype == np.float64:
+            column, stored = field, float(value)
+        else:
+            raise ValueError(f"Campo de activo desconocido: {field}")
+        if field == 'id' or field == 'symbol':
+            self._reindex(row, field, value)
+        aggregated = field in _AGGREGATED_FIELDS
+        if aggregated:
+            self._account(row, -1)
+        if column is None:
+            self._text[field][row] = stored
+        else:
+            self._columns[column][row] = stored
+            if field == 'current_price':
+                self._columns['dirty'][row] = True
+        if aggregated:
+            self._account(row, 1)
+        self.version += 1
+
+    def set_prices(self, rows: np.ndarray, prices: np.ndarray) -> np.ndarray:
+        """
+        Actualiza el precio actual de varias filas de una vez y marca como sucias las que
+        cambiaron. Los totales incrementales se ajustan con la diferencia de valor agregada
+        por clave de cada dimensión y `version` aumenta una sola vez.
+        :param rows: Números de fila (sin repetidos).
+        :param prices: Nuevo precio de cada fila.
+        :return: Filas cuyo precio cambió.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        prices = np.asarray(prices, dtype=np.float64)
+        if rows.shape != prices.shape:
+            raise ValueError("Se espera un precio por fila.")
+        if len(rows) and (rows.min() < 0 or rows.max() >= self._size):
+            raise IndexError("Índice de activo fuera de rango.")
+        current = self._columns['current_price']
+        changed = current[rows] != prices
+        rows, prices = rows[changed], prices[changed]
+        if not len(rows):
+            return rows
+
+        delta = self._columns['quantity'][rows] * (prices - current[rows])
+        current[rows] = prices
+        self._value_total += float(delta.sum())
+        for dimension, totals in self._totals.items():
+            code_column = 'type_code' if dimension == 'type' else CODED_COLUMNS[dimension]
+            codes = self._columns[code_column][rows]
+            used, inverse = np.unique(codes, return_inverse=True)
+            sums = np.bincount(inverse, weights=delta, minlength=len(used))
+            for code, total in zip(used.tolist(), sums.tolist()):
+                key = AssetType(code) if dimension == 'type' else self._labels[dimension][code]
+                totals[key][1] += total
+        self._columns['dirty'][rows] = True
+        self.version += 1
+        return rows
+
+    def dirty_rows(self) -> np.ndarray:
+        """
+        Filas cuyo precio cambió desde la última llamada a clear_dirty.
+        :return: Números de fila.
+        """
+        return np.flatnonzero(self.column('dirty'))
+
+    def clear_dirty(self, rows: Optional[np.ndarray] = None):
+        """
+        Limpia la marca de precio cambiado (no modifica `version`).
+        :param rows: Filas a limpiar (por defecto, todas).
+        """
+        if rows is None:
+            self.column('dirty')[:] = False
+        else:
+            self._columns['dirty'][np.asarray(rows, dtype=np.int64)] = False
+
+    def _reindex(self, row: int, field: str, value: str):
+        asset_id = self._text['id'][row]
+        symbol = self._text['symbol'][row]
+        if field == 'id':
+            if value == asset_id:
+                return
+            if value in self._id_rows:
+                raise ValueError(f"Ya existe un activo con el ID {value}.")
+            del self._id_rows[asset_id]
+            self._id_rows[value] = row
+            symbol_ids = self._symbol_ids[symbol]
+            del symbol_ids[asset_id]
+            symbol_ids[value] = None
+        else:
+            symbol_ids = self._symbol_ids[symbol]
+            del symbol_ids[asset_id]
+            if not symbol_ids:
+                del self._symbol_ids[symbol]
+            self._symbol_ids.setdefault(value, {})[asset_id] = None
+
+    # ------------------------------------------------------------------
+    # Totales incrementales
+    # ------------------------------------------------------------------
+    def _account(self, row: int, sign: int):
+        """Suma (sign=1) o resta (sign=-1) la contribución de una fila a los totales."""
+        quantity = self._columns['quantity'][row]
+        value = sign * float(quantity * self._columns['current_price'][row])
+        self._value_total += value
+        self._cost_total += sign * float(quantity * self._columns['purchase_price'][row])
+        for dimension, totals in self._totals.items():
+            key = self.get_value(row, dimension)
+            entry = totals.get(key)
+            if entry is None:
+                entry = totals[key] = [0, 0.0]
+            entry[0] += sign
+            entry[1] += value
+            if entry[0] == 0:
+                del totals[key]
+
+    def total_value(self) -> float:
+        """Suma del valor de mercado de todas las filas (O(1))."""
+        return self._value_total
+
+    def unrealized_gain_loss(self) -> float:
+        """Suma de la ganancia/pérdida no realizada de todas las filas (O(1))."""
+        return self._value_total - self._cost_total
+
+    def totals(self, dimension: str) -> Dict[object, Dict[str, float]]:
+        """
+        Devuelve los totales incrementales de una dimensión.
+        :param dimension: Una de AGGREGATE_DIMENSIONS ('type', 'category', 'currency', 'exchange').
+        :return: Diccionario clave -> {'count', 'total_value'}.
+        """
+        return {key: {'count': count, 'total_value': value}
+                for key, (count, value) in self._totals[dimension].items()}
+
+    def recompute_totals(self) -> Dict[str, object]:
+        """
+        Recalcula desde cero todos los totales que se mantienen de forma incremental.
+        :return: Diccionario con 'total_value', 'total_cost' y un diccionario por dimensión.
+        """
+        quantity = self.column('quantity')
+        values = self.market_values()
+        result = {
+            'total_value': float(values.sum()),
+            'total_cost': float(np.dot(quantity, self.column('purchase_price'))),
+        }
+        for dimension in AGGREGATE_DIMENSIONS:
+            totals = {}
+            for row in range(self._size):
+                entry = totals.setdefault(self.get_value(row, dimension), {'count': 0, 'total_value': 0.0})
+                entry['count'] += 1
+                entry['total_value'] += float(values[row])
+            result[dimension] = totals
+        return result
+
+    def check_consistency(self, tolerance: float = 1e-6) -> List[str]:
+        """
+        Compara los totales incrementales contra un recálculo completo.
+        :param tolerance: Tolerancia relativa para las sumas de punto flotante.
+        :return: Lista de diferencias encontradas (vacía si todo coincide).
+        """
+        def close(a: float, b: float) -> bool:
+            return abs(a - b) <= tolerance * max(1.0, abs(a), abs(b))
+
+        expected = self.recompute_totals()
+        problems = []
+        if not close(self._value_total, expected['total_value']):
+            problems.append(f"total_value: {self._value_total} != {expected['total_value']}")
+        if not close(self._cost_total, expected['total_cost']):
+            problems.append(f"total_cost: {self._cost_total} != {expected['total_cost']}")
+        for dimension in AGGREGATE_DIMENSIONS:
+            actual = self.totals(dimension)
+            for key in set(actual) | set(expected[dimension]):
+                got = actual.get(key, {'count': 0, 'total_value': 0.0})
+                want = expected[dimension].get(key, {'count': 0, 'total_value': 0.0})
+                if got['count'] != want['count'] or not close(got['total_value'], want['total_value']):
+                    problems.append(f"{dimension}[{key!r}]: {got} != {want}")
+        return problems
+
+    # ------------------------------------------------------------------
+    # Reducciones vectorizadas
+    # ------------------------------------------------------------------
+    def market_values(self) -> np.ndarray:
+        """Valor de mercado de cada fila (cantidad * precio actual)."""
+        return self.column('quantity') * self.column('current_price')
+
+
+class ReadOnlyAssetView(AssetView):
+    """
+    Vista de solo lectura de un activo: lee siempre la fila actual de la vista original
+    y rechaza cualquier modificación.
+    """
+
+    def __init__(self, view: AssetView):
+        self._view = view
+
+    def _get(self, column: str):
+        return self._view._get(column)
+
+    def _set(self, column: str, value):
+        raise TypeError(f"El activo es de solo lectura ({column} no se puede modificar).")
+
+
+# Métodos de HoldingsTable que modifican la tabla y no se exponen en ReadOnlyHoldings
+_TABLE_MUTATORS = frozenset({'append', 'remove_row', 'set_value', 'set_prices', 'load_columns',
+                             'clear_dirty', 'code_of'})
+
+
+class ReadOnlyHoldings:
+    """
+    Envoltorio de solo lectura de una HoldingsTable: expone las consultas, devuelve columnas
+    de NumPy no escribibles, columnas de texto como tuplas y activos como ReadOnlyAssetView.
+    """
+
+    __slots__ = ('_table',)
+
+    def __init__(self, table: HoldingsTable):
+        object.__setattr__(self, '_table', table)
+
+    def __getattr__(self, name: str):
+        if name in _TABLE_MUTATORS or name.startswith('_'):
+            raise TypeError(f"La tabla de tenencias es de solo lectura ({name} no está disponible).")
+        return getattr(self._table, name)
+
+    def __setattr__(self, name: str, value):
+        raise TypeError("La tabla de tenencias es de solo lectura.")
+
+    def __len__(self) -> int:
+        return len(self._table)
+
+    def __iter__(self) -> Iterator[ReadOnlyAssetView]:
+        for row in range(len(self._table)):
+            yield self.view(row)
+
+    def __getitem__(self, row: int) -> ReadOnlyAssetView:
+        return ReadOnlyAssetView(self._table[row])
+
+    def view(self, row: int) -> ReadOnlyAssetView:
+        """
+        Devuelve una vista de solo lectura de una fila.
+        :param row: Número de fila.
+        :return: ReadOnlyAssetView de la fila.
+        """
+        return ReadOnlyAssetView(self._table.view(row))
+
+    def column(self, name: str) -> np.ndarray:
+        """
+        Devuelve la porción activa de una columna numérica, sin copiar y sin permiso de escritura.
+        :param name: Nombre de la columna.
+        :return: Vista de NumPy no escribible.
+        """
+        values = self._table.column(name).view()
+        values.flags.writeable = False
+        return values
+
+    def text_column(self, name: str) -> tuple:
+        """
+        Devuelve una copia de una columna de texto.
+        :param name: Nombre de la columna.
+        :return: Tupla con una entrada por activo.
+        """
+        return tuple(self._table.text_column(name))
+
+    def labels(self, field: str) -> tuple:
+        """
+        Devuelve una copia de los valores registrados de un campo codificado.
+        :param field: Campo codificado ('currency', 'category', 'exchange' o 'country').
+        :return: Tupla código -> valor.
+        """
+        return tuple(self._table.labels(field))
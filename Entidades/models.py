@@ -5,7 +5,7 @@ import uuid
 from dataclasses import dataclass, field
 from datetime import datetime
 from enum import Enum, auto
-from typing import List, Optional
+from typing import Dict, Iterable, List, Optional
 
 class AssetType(Enum):
     """Tipos de activos financieros"""
@@ -71,14 +71,73 @@ class Portfolio:
     name: str = 'Mi Portafolio'
     assets: List[Asset] = field(default_factory=list)
     transactions: List[Transaction] = field(default_factory=list)
-    
+    _positions: Dict[str, int] = field(default_factory=dict, init=False, repr=False, compare=False)
+    _symbols: Dict[str, Dict[str, None]] = field(default_factory=dict, init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self._reindex()
+
+    def _index(self, asset: Asset, position: int):
+        self._positions[asset.id] = position
+        self._symbols.setdefault(asset.symbol, {})[asset.id] = None
+
+    def _reindex(self):
+        """Reconstruye los índices desde la lista (por si se modificó sin pasar por los métodos)."""
+        self._positions.clear()
+        self._symbols.clear()
+        for position, asset in enumerate(self.assets):
+            self._index(asset, position)
+
+    def _position(self, asset_id: str) -> Optional[int]:
+        """Posición de un activo; si el índice no coincide con la lista, se reconstruye."""
+        position = self._positions.get(asset_id)
+        if position is None or len(self._positions) != len(self.assets) or \
+                position >= len(self.assets) or self.assets[position].id != asset_id:
+            self._reindex()
+            position = self._positions.get(asset_id)
+        return position
+
     def add_asset(self, asset: Asset):
         """Añade un nuevo activo al portafolio"""
+        self._index(asset, len(self.assets))
         self.assets.append(asset)
     
     def remove_asset(self, asset_id: str):
-        """Elimina un activo del portafolio"""
-        self.assets = [a for a in self.assets if a.id != asset_id]
+        """Elimina un activo del portafolio (el último activo ocupa su lugar)"""
+        position = self._position(asset_id)
+        if position is None:
+            return
+        del self._positions[asset_id]
+        removed = self.assets[position]
+        symbol_ids = self._symbols[removed.symbol]
+        del symbol_ids[asset_id]
+        if not symbol_ids:
+            del self._symbols[removed.symbol]
+        last = self.assets.pop()
+        if last is not removed:
+            self.assets[position] = last
+            self._positions[last.id] = position
+
+    def remove_assets(self, asset_ids: Iterable[str]):
+        """Elimina varios activos del portafolio"""
+        for asset_id in asset_ids:
+            self.remove_asset(asset_id)
+
+    def find_asset(self, asset_id: str) -> Optional[Asset]:
+        """Busca un activo por su ID"""
+        position = self._position(asset_id)
+        return None if position is None else self.assets[position]
+
+    def find_asset_by_symbol(self, symbol: str) -> Optional[Asset]:
+        """Busca el primer activo añadido con un símbolo"""
+        for attempt in range(2):
+            symbol_ids = self._symbols.get(symbol)
+            asset = self.find_asset(next(iter(symbol_ids))) if symbol_ids else None
+            if asset is not None and asset.symbol == symbol:
+                return asset
+            if attempt == 0:
+                self._reindex()
+        return None
     
     @property
     def total_value(self) -> float:
@@ -3,11 +3,38 @@ from PyQt5.QtWidgets import (
     QDialog, QFormLayout, QLineEdit, QDialogButtonBox, QMessageBox, QScrollArea, QComboBox, QSpacerItem, QSizePolicy
 )
 from PyQt5.QtGui import QColor, QFont
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QThread, pyqtSignal
 from datetime import datetime
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas, NavigationToolbar2QT as NavigationToolbar
 import random
+from Analisis.montecarlo import simulate
+
+# Proyección del ahorro mensual sobre el portafolio
+PROJECTION_YEARS = 10
+PROJECTION_PATHS = 10_000
+
+
+class ProjectionWorker(QThread):
+    """
+    Corre la simulación Monte Carlo fuera del hilo de la interfaz. Recibe solo los datos ya
+    calculados (Portfolio.projection_inputs), nunca el portafolio compartido.
+    """
+    projected = pyqtSignal(int, object)
+
+    def __init__(self, inputs, monthly_savings, request, parent=None):
+        super().__init__(parent)
+        self.inputs = inputs
+        self.monthly_savings = monthly_savings
+        self.request = request
+
+    def run(self):
+        try:
+            result = simulate(horizon=PROJECTION_YEARS * 12, paths=PROJECTION_PATHS,
+                              contribution=max(self.monthly_savings, 0.0), **self.inputs)
+        except ValueError:
+            result = None
+        self.projected.emit(self.request, result)
 
 
 class MoneySources(QWidget):
@@ -54,8 +81,12 @@ class MoneySources(QWidget):
         self.assets_total_label.setText(f"${self.calculate_total(self.assets_table):,.2f}")
         self.liabilities_total_label.setText(f"${self.calculate_total(self.liabilities_table):,.2f}")
         self.net_worth_total_label.setText(f"${self.calculate_total(self.net_worth_table):,.2f}")
-    def __init__(self):
+    def __init__(self, portfolio=None):
         super().__init__()
+        self.portfolio = portfolio
+        self._projection_request = 0
+        self._projection_workers = []
+        self._metrics_text = ""
         self.current_month = datetime.now().month
         self.current_year = datetime.now().year
         self.init_ui()
@@ -249,9 +280,40 @@ class MoneySources(QWidget):
         total_assets = self.calculate_total(self.assets_table)
         total_liabilities = self.calculate_total(self.liabilities_table)
         net_benefit = total_assets - total_liabilities
-        self.metrics_label.setText(
-            f"En {self.get_month_name(selected_month)} {selected_year}, he tenido un beneficio de ${net_benefit:,.2f} disponibles para ahorrar."
-        )
+        self._metrics_text = f"En {self.get_month_name(selected_month)} {selected_year}, he tenido un beneficio de ${net_benefit:,.2f} disponibles para ahorrar."
+        self.metrics_label.setText(self._metrics_text)
+        self.project_savings(net_benefit)
+
+    def project_savings(self, monthly_savings):
+        """Lanza en segundo plano la proyección aportando el ahorro mensual (si hay historial)."""
+        self._projection_request += 1
+        if self.portfolio is None or not self.portfolio.transactions:
+            return
+        try:
+            # Se lee el portafolio en este hilo; el de fondo solo simula
+            inputs = self.portfolio.projection_inputs()
+        except ValueError:
+            self.show_projection(self._projection_request, None)
+            return
+        self.metrics_label.setText(self._metrics_text + "\nCalculando proyección...")
+        worker = ProjectionWorker(inputs, monthly_savings, self._projection_request, self)
+        worker.projected.connect(self.show_projection)
+        worker.finished.connect(lambda: self._projection_workers.remove(worker))
+        self._projection_workers.append(worker)
+        worker.start()
+
+    def show_projection(self, request, projection):
+        """Muestra el resultado de la proyección si sigue siendo la última pedida."""
+        if request != self._projection_request:
+            return
+        text = self._metrics_text
+        if projection is not None:
+            text += (
+                f"\nAhorrando ese monto cada mes, en {PROJECTION_YEARS} años el portafolio valdría "
+                f"${projection.percentile(50)[-1]:,.2f} (entre ${projection.percentile(5)[-1]:,.2f} "
+                f"y ${projection.percentile(95)[-1]:,.2f} en el 90% de los escenarios)."
+            )
+        self.metrics_label.setText(text)
 
     def plot_evolution_chart(self):
         """Genera un gráfico de la evolución de activos y pasivos totales por mes/año."""
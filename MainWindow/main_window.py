@@ -11,7 +11,7 @@ from PyQt5.QtWidgets import (
     QLabel,
     QStackedWidget
 )
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QTimer
 
 # Asegurarse de que el directorio raíz esté en sys.path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -20,6 +20,9 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 from dashboard.dashboardForm import Dashboard
 from Composicion.compositionForm import Composition
 from FuentesDeDinero.FuentesDeDineroForm import MoneySources
+from Mercado.cache import shared_cache
+
+CACHE_STATS_INTERVAL_MS = 5000
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -65,6 +68,16 @@ class MainWindow(QMainWindow):
             button.clicked.connect(handler)
             nav_menu.addWidget(button)
 
+        # Contadores del caché de cotizaciones compartido
+        self.cache_label = QLabel()
+        self.cache_label.setWordWrap(True)
+        self.cache_label.setStyleSheet("font-size: 11px; color: #aaaaaa; margin-top: 20px;")
+        nav_menu.addWidget(self.cache_label)
+        self.update_cache_stats()
+        self.cache_timer = QTimer(self)
+        self.cache_timer.timeout.connect(self.update_cache_stats)
+        self.cache_timer.start(CACHE_STATS_INTERVAL_MS)
+
         main_layout.addLayout(nav_menu)
 
         # Crear un QStackedWidget para cambiar entre diferentes pantallas
@@ -73,7 +86,7 @@ class MainWindow(QMainWindow):
         # Agregar Dashboard, Composición y Fuentes de dinero al stacked widget
         self.dashboard = Dashboard()
         self.composition = Composition()
-        self.money_sources = MoneySources()
+        self.money_sources = MoneySources(self.dashboard.portfolio)
         self.stacked_widget.addWidget(self.dashboard)  # Index 0
         self.stacked_widget.addWidget(self.composition)  # Index 1
         self.stacked_widget.addWidget(self.money_sources)  # Index 2
@@ -102,6 +115,10 @@ class MainWindow(QMainWindow):
     def show_settings(self):
         print("Mostrar configuración")
 
+    def update_cache_stats(self):
+        # Actualizar los contadores del caché de cotizaciones
+        self.cache_label.setText(shared_cache().summary())
+
 
 def main():
     app = QApplication(sys.argv)
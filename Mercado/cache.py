@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+#4.3 Caché de cotizaciones compartido por todas las vistas
+
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from Entidades.models import AssetType
+
+# Vigencia por tipo de activo, en segundos
+DEFAULT_TTLS: Dict[AssetType, float] = {
+    AssetType.CRYPTO: 15.0,
+    AssetType.STOCK: 60.0,
+    AssetType.CEDEAR: 60.0,
+    AssetType.COMMODITY: 300.0,
+    AssetType.FUND: 3600.0,
+    AssetType.BOND: 3600.0,
+}
+DEFAULT_TTL = 60.0
+DEFAULT_MAX_BYTES = 8 * 1024 * 1024
+
+# Costo aproximado de una entrada además de su clave: tupla, float y nodo del OrderedDict
+_ENTRY_OVERHEAD = sys.getsizeof((0.0, 0.0, 0)) + sys.getsizeof(0.0) + 100
+
+Key = Tuple[str, str]
+
+
+class QuoteCache:
+    """
+    Caché de precios por (símbolo, fuente) con vigencia según el tipo de activo,
+    desalojo LRU al superar un tope de memoria y deduplicación de pedidos concurrentes:
+    si varios hilos piden a la vez un mismo precio vencido, solo uno lo busca y el resto
+    espera ese resultado. Es seguro entre hilos.
+    """
+
+    def __init__(self, ttls: Optional[Dict[AssetType, float]] = None, default_ttl: float = DEFAULT_TTL,
+                 max_bytes: int = DEFAULT_MAX_BYTES, clock: Callable[[], float] = time.monotonic):
+        """
+        :param ttls: Vigencia en segundos por tipo de activo (se combina con DEFAULT_TTLS).
+        :param default_ttl: Vigencia para tipos sin valor propio.
+        :param max_bytes: Tope aproximado de memoria de las entradas.
+        :param clock: Reloj en segundos (inyectable para pruebas).
+        """
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.default_ttl = default_ttl
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.bytes = 0
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'coalesced': 0}
+        self._entries: 'OrderedDict[Key, Tuple[float, float, int]]' = OrderedDict()
+        self._inflight: Dict[Key, Future] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def ttl(self, asset_type: Optional[AssetType]) -> float:
+        """Vigencia en segundos para un tipo de activo."""
+        return self.ttls.get(asset_type, self.default_ttl)
+
+    def _lookup(self, key: Key, now: float) -> Optional[float]:
+        """Busca una entrada vigente (con el lock tomado) y actualiza contadores y orden LRU."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            price, expires, size = entry
+            if expires > now:
+                self._entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return price
+            del self._entries[key]
+            self.bytes -= size
+            self.stats['expirations'] += 1
+        self.stats['misses'] += 1
+        return None
+
+    def _store(self, key: Key, price: float, asset_type: Optional[AssetType], now: float):
+        """Guarda una entrada (con el lock tomado) y desaloja las menos usadas si hace falta."""
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.bytes -= old[2]
+        size = sys.getsizeof(key[0]) + sys.getsizeof(key[1]) + _ENTRY_OVERHEAD
+        self._entries[key] = (float(price), now + self.ttl(asset_type), size)
+        self.bytes += size
+        while self.bytes > self.max_bytes and len(self._entries) > 1:
+            _, (_, _, evicted) = self._entries.popitem(last=False)
+            self.bytes -= evicted
+            self.stats['evictions'] += 1
+
+    def peek(self, symbol: str, source: str = '') -> Optional[float]:
+        """
+        Precio vigente sin buscarlo ni alterar contadores.
+        :param symbol: Símbolo del activo.
+        :param source: Fuente de la cotización.
+        :return: Precio o None.
+        """
+        with self._lock:
+            entry = self._entries.get((symbol, source))
+        return entry[0] if entry is not None and entry[1] > self.clock() else None
+
+    def put(self, symbol: str, price: float, source: str = '', asset_type: Optional[AssetType] = None):
+        """
+        Guarda un precio obtenido por otra vía.
+        :param symbol: Símbolo del activo.
+        :param price: Precio.
+        :param source: Fuente de la cotización.
+        :param asset_type: Tipo de activo (define la vigencia).
+        """
+        with self._lock:
+            self._store((symbol, source), price, asset_type, self.clock())
+
+    def get(self, symbol: str, loader: Callable[[str], float], source: str = '',
+            asset_type: Optional[AssetType] = None) -> float:
+        """
+        Precio de un símbolo: desde el caché si está vigente o, si no, del loader.
+        Los pedidos simultáneos del mismo símbolo comparten una sola llamada al loader.
+        :param symbol: Símbolo del activo.
+        :param loader: Función símbolo -> precio.
+        :param source: Fuente de la cotización.
+        :param asset_type: Tipo de activo (define la vigencia).
+        :return: Precio.
+        """
+        return self.get_many([symbol], lambda missing: {symbol: loader(symbol)}, source,
+                             None if asset_type is None else [asset_type])[symbol]
+
+    def get_many(self, symbols: Sequence[str], loader: Callable[[List[str]], Dict[str, float]], source: str = '',
+                 asset_types: Optional[Sequence[Optional[AssetType]]] = None) -> Dict[str, float]:
+        """
+        Precios de varios símbolos. Los que faltan se piden al loader en una sola llamada,
+        salvo los que otro hilo ya está buscando, que se esperan.
+        :param symbols: Símbolos.
+        :param loader: Función lista de símbolos -> diccionario símbolo -> precio
+                       (por ejemplo, QuoteIngestionService.fetch envuelto en asyncio.run).
+        :param source: Fuente de las cotizaciones.
+        :param asset_types: Tipo de cada símbolo (define la vigencia).
+        :return: Diccionario símbolo -> precio (los que el loader no devolvió se omiten).
+        """
+        types = dict(zip(symbols, asset_types)) if asset_types is not None else {}
+        result: Dict[str, float] = {}
+        owned: Dict[str, Future] = {}
+        waiting: Dict[str, Future] = {}
+        with self._lock:
+            now = self.clock()
+            for symbol in dict.fromkeys(symbols):
+                key = (symbol, source)
+                price = self._lookup(key, now)
+                if price is not None:
+                    result[symbol] = price
+                elif key in self._inflight:
+                    waiting[symbol] = self._inflight[key]
+                    self.stats['coalesced'] += 1
+                else:
+                    owned[symbol] = self._inflight[key] = Future()
+
+        if owned:
+            try:
+                loaded = loader(list(owned))
+            except BaseException as error:
+                with self._lock:
+                    for symbol, future in owned.items():
+                        del self._inflight[(symbol, source)]
+                        future.set_exception(error)
+                raise
+            with self._lock:
+                now = self.clock()
+                for symbol, future in owned.items():
+                    del self._inflight[(symbol, source)]
+                    price = loaded.get(symbol)
+                    if price is not None:
+                        self._store((symbol, source), price, types.get(symbol), now)
+                        result[symbol] = float(price)
+                    future.set_result(price)
+
+        for symbol, future in waiting.items():
+            price = future.result()
+            if price is not None:
+                result[symbol] = float(price)
+        return result
+
+    def invalidate(self, symbols: Optional[Iterable[str]] = None, source: Optional[str] = None):
+        """
+        Descarta entradas.
+        :param symbols: Símbolos a descartar (por defecto, todos).
+        :param source: Limita el descarte a una fuente.
+        """
+        with self._lock:
+            if symbols is None and source is None:
+                self._entries.clear()
+                self.bytes = 0
+                return
+            wanted = None if symbols is None else set(symbols)
+            for key in [key for key in self._entries
+                        if (wanted is None or key[0] in wanted) and (source is None or key[1] == source)]:
+                self.bytes -= self._entries.pop(key)[2]
+
+    def summary(self) -> str:
+        """Texto corto con los contadores, para mostrar en la interfaz."""
+        stats = self.stats
+        lookups = stats['hits'] + stats['misses']
+        rate = stats['hits'] / lookups * 100 if lookups else 0.0
+        return (f"Caché de precios: {len(self._entries):,} entradas ({self.bytes / 1024:.0f} KB), "
+                f"aciertos {stats['hits']:,} ({rate:.0f}%), fallos {stats['misses']:,}, "
+                f"desalojos {stats['evictions']:,}")
+
+
+_shared: Optional[QuoteCache] = None
+_shared_lock = threading.Lock()
+
+
+def shared_cache() -> QuoteCache:
+    """
+    Caché único del proceso, para que todas las vistas compartan las cotizaciones.
+    :return: QuoteCache.
+    """
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = QuoteCache()
+        return _shared
+
+
+def _benchmark(symbols: int = 100_000, lookups: int = 1_000_000):
+    """Mide aciertos y desalojos con una distribución de acceso sesgada."""
+    import numpy as np
+
+    cache = QuoteCache(max_bytes=2 * 1024 * 1024)
+    names = [f"SYM{code}" for code in range(symbols)]
+    rng = np.random.default_rng(0)
+    picks = np.minimum(rng.zipf(1.2, lookups) - 1, symbols - 1)
+    loader = lambda missing: {symbol: 1.0 for symbol in missing}
+
+    started = time.perf_counter()
+    for batch in np.array_split(picks, lookups // 1000):
+        cache.get_many([names[code] for code in batch.tolist()], loader, 'local')
+    elapsed = time.perf_counter() - started
+    print(f"{lookups:,} consultas sobre {symbols:,} símbolos en {elapsed:.2f} s")
+    print(f"  {cache.summary()}")
+
+    # Deduplicación: 16 hilos piden el mismo símbolo vencido al mismo tiempo
+    calls = []
+
+    def slow(missing):
+        calls.append(missing)
+        time.sleep(0.05)
+        return {symbol: 2.0 for symbol in missing}
+
+    cache.invalidate()
+    threads = [threading.Thread(target=cache.get_many, args=(['AAPL'], slow, 'local')) for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    print(f"  16 pedidos simultáneos -> {len(calls)} llamada(s) al proveedor")
+
+
+if __name__ == '__main__':
+    _benchmark()
@@ -0,0 +1,339 @@
+# -*- coding: utf-8 -*-
+#4.1 Ingesta asincrónica de cotizaciones
+
+import asyncio
+import json
+import math
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+from urllib.parse import quote
+
+from Entidades.holdings import HoldingsTable
+from Entidades.models import AssetType
+from Mercado.cache import QuoteCache
+
+
+@dataclass
+class QuoteProvider:
+    """Configuración de un proveedor HTTP de cotizaciones"""
+    name: str
+    host: str
+    port: int = 80
+    path: str = '/quotes'
+    batch_size: int = 100           # Símbolos por pedido
+    requests_per_second: float = 10.0
+    burst: int = 10                 # Pedidos que se pueden hacer de corrido
+    max_concurrency: int = 4        # Pedidos simultáneos (y conexiones del pool)
+    timeout: float = 10.0
+
+
+class TokenBucket:
+    """Limitador de tasa: `rate` permisos por segundo con ráfagas de hasta `capacity`."""
+
+    def __init__(self, rate: float, capacity: int):
+        if rate <= 0 or capacity < 1:
+            raise ValueError("La tasa y la capacidad deben ser positivas.")
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Espera hasta obtener un permiso."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                await asyncio.sleep((1.0 - self._tokens) / self.rate)
+
+
+class ConnectionPool:
+    """Pool de conexiones HTTP/1.1 persistentes a un mismo servidor."""
+
+    def __init__(self, host: str, port: int, size: int):
+        self.host = host
+        self.port = port
+        self.size = size
+        self.opened = 0
+        self._idle: 'asyncio.Queue[Tuple[asyncio.StreamReader, asyncio.StreamWriter]]' = asyncio.Queue()
+
+    async def acquire(self) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        """Toma una conexión libre, abre una nueva si no se llegó al tamaño, o espera."""
+        if self._idle.empty() and self.opened < self.size:
+            self.opened += 1
+            try:
+                return await asyncio.open_connection(self.host, self.port)
+            except OSError:
+                self.opened -= 1
+                raise
+        return await self._idle.get()
+
+    def release(self, connection: Tuple[asyncio.StreamReader, asyncio.StreamWriter], reusable: bool = True):
+        """Devuelve una conexión al pool, o la cierra si no se puede reutilizar."""
+        if reusable:
+            self._idle.put_nowait(connection)
+        else:
+            connection[1].close()
+            self.opened -= 1
+
+    async def close(self):
+        """Cierra las conexiones libres."""
+        writers = []
+        while not self._idle.empty():
+            _, writer = self._idle.get_nowait()
+            writer.close()
+            writers.append(writer)
+            self.opened -= 1
+        await asyncio.gather(*(writer.wait_closed() for writer in writers), return_exceptions=True)
+
+
+async def _read_chunked(reader: asyncio.StreamReader, timeout: float) -> bytes:
+    """Lee un cuerpo con Transfer-Encoding: chunked (y descarta los encabezados finales)."""
+    chunks = []
+    while True:
+        size_line = await asyncio.wait_for(reader.readline(), timeout)
+        try:
+            size = int(size_line.split(b';', 1)[0].strip(), 16)
+        except ValueError:
+            raise ConnectionError(f"Bloque chunked inválido: {size_line!r}") from None
+        if size == 0:
+            break
+        chunks.append(await asyncio.wait_for(reader.readexactly(size), timeout))
+        if await asyncio.wait_for(reader.readline(), timeout) not in (b'\r\n', b'\n'):
+            raise ConnectionError("Falta el fin de línea después de un bloque chunked.")
+    while await asyncio.wait_for(reader.readline(), timeout) not in (b'\r\n', b'\n', b''):
+        pass
+    return b''.join(chunks)
+
+
+async def _http_get(connection, host: str, target: str, timeout: float) -> Tuple[bytes, bool]:
+    """
+    Hace un GET por una conexión abierta. Acepta cuerpos con Content-Length, con
+    Transfer-Encoding: chunked o, con Connection: close, hasta el cierre de la conexión.
+    Devuelve (cuerpo, si la conexión sigue abierta).
+    """
+    reader, writer = connection
+    writer.write(f"GET {target} HTTP/1.1\r\nHost: {host}\r\nConnection: keep-alive\r\n\r\n".encode('latin-1'))
+    await writer.drain()
+    status_line = await asyncio.wait_for(reader.readline(), timeout)
+    if not status_line:
+        raise ConnectionError("El servidor cerró la conexión.")
+    parts = status_line.decode('latin-1').split(' ', 2)
+    length, chunked, keep_alive = None, False, True
+    while True:
+        header = await asyncio.wait_for(reader.readline(), timeout)
+        if header in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = header.decode('latin-1').partition(':')
+        name = name.strip().lower()
+        value = value.strip().lower()
+        if name == 'content-length':
+            try:
+                length = int(value)
+            except ValueError:
+                raise ConnectionError(f"Content-Length inválido: {value!r}") from None
+        elif name == 'transfer-encoding':
+            if value.split(',')[-1].strip() != 'chunked':
+                raise ConnectionError(f"Transfer-Encoding no soportado: {value!r}")
+            chunked = True
+        elif name == 'connection' and value == 'close':
+            keep_alive = False
+    if chunked:
+        body = await _read_chunked(reader, timeout)
+    elif length is not None:
+        body = await asyncio.wait_for(reader.readexactly(length), timeout)
+    elif not keep_alive:
+        body = await asyncio.wait_for(reader.read(), timeout)
+    else:
+        raise ConnectionError("La respuesta no indica el largo del cuerpo.")
+    if len(parts) < 2 or parts[1] != '200':
+        raise ConnectionError(f"Respuesta inesperada del proveedor: {status_line.decode('latin-1').strip()}")
+    return body, keep_alive
+
+
+def _parse_quotes(body: bytes) -> Dict[str, float]:
+    """
+    Interpreta la respuesta {"quotes": {"A": 1.0, ...}} del proveedor.
+    :param body: Cuerpo de la respuesta.
+    :return: Diccionario símbolo -> precio (se omiten los símbolos sin precio).
+    :raises ValueError: Si la respuesta no tiene ese formato o algún precio no es válido.
+    """
+    payload = json.loads(body)
+    quotes = payload.get('quotes', {}) if isinstance(payload, dict) else None
+    if not isinstance(quotes, dict):
+        raise ValueError("La respuesta del proveedor no tiene cotizaciones.")
+    result = {}
+    for symbol, price in quotes.items():
+        if price is None:
+            continue
+        if isinstance(price, bool) or not isinstance(price, (int, float, str)):
+            raise ValueError(f"Precio inválido para {symbol}: {price!r}")
+        price = float(price)
+        if not math.isfinite(price) or price < 0:
+            raise ValueError(f"Precio inválido para {symbol}: {price!r}")
+        result[symbol] = price
+    return result
+
+
+class QuoteIngestionService:
+    """
+    Obtiene cotizaciones de muchos símbolos en pedidos por lotes, reutilizando conexiones
+    de un pool, con un límite de pedidos por segundo (token bucket) y de pedidos simultáneos
+    (semáforo) por proveedor, y aplica el resultado con una sola actualización masiva a
+    través de update_prices (Portfolio o PortfolioRepository), así se notifica a los
+    suscriptores y, con repositorio, los precios quedan en el diario.
+    """
+
+    def __init__(self, provider: QuoteProvider, retries: int = 1, cache: Optional[QuoteCache] = None):
+        """
+        :param provider: Configuración del proveedor.
+        :param retries: Reintentos por lote ante errores de conexión.
+        :param cache: Caché compartido (opcional); refresh solo pide los precios vencidos.
+        """
+        self.provider = provider
+        self.retries = retries
+        self.cache = cache
+        self.stats = {'requests': 0, 'symbols': 0, 'errors': 0}
+
+    def batches(self, symbols: Sequence[str]) -> List[List[str]]:
+        """Divide los símbolos (sin repetidos) en lotes del tamaño del proveedor."""
+        unique = list(dict.fromkeys(symbol for symbol in symbols if symbol))
+        size = self.provider.batch_size
+        return [unique[start:start + size] for start in range(0, len(unique), size)]
+
+    async def fetch(self, symbols: Sequence[str]) -> Dict[str, float]:
+        """
+        Obtiene las cotizaciones de todos los símbolos.
+        :param symbols: Símbolos a consultar.
+        :return: Diccionario símbolo -> precio. Los lotes que fallan (errores de conexión después
+                 de los reintentos o respuestas mal formadas) se omiten y se cuentan en stats.
+        """
+        provider = self.provider
+        pool = ConnectionPool(provider.host, provider.port, provider.max_concurrency)
+        bucket = TokenBucket(provider.requests_per_second, provider.burst)
+        semaphore = asyncio.Semaphore(provider.max_concurrency)
+
+        async def fetch_batch(batch: List[str]) -> Dict[str, float]:
+            target = f"{provider.path}?symbols={quote(','.join(batch), safe=',')}"
+            async with semaphore:
+                for attempt in range(self.retries + 1):
+                    await bucket.acquire()
+                    connection = None
+                    try:
+                        connection = await pool.acquire()
+                        body, keep_alive = await _http_get(connection, provider.host, target, provider.timeout)
+                    except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+                        if connection is not None:
+                            pool.release(connection, reusable=False)
+                        if attempt == self.retries:
+                            self.stats['errors'] += 1
+                            return {}
+                        continue
+                    pool.release(connection, reusable=keep_alive)
+                    self.stats['requests'] += 1
+                    try:
+                        return _parse_quotes(body)
+                    except ValueError:
+                        # Reintentar no cambia una respuesta mal formada
+                        self.stats['errors'] += 1
+                        return {}
+            return {}
+
+        try:
+            results = await asyncio.gather(*(fetch_batch(batch) for batch in self.batches(symbols)))
+        finally:
+            await pool.close()
+        quotes: Dict[str, float] = {}
+        for result in results:
+            quotes.update(result)
+        self.stats['symbols'] += len(quotes)
+        return quotes
+
+    @staticmethod
+    def apply(target, quotes: Dict[str, float]) -> List[str]:
+        """
+        Aplica cotizaciones por símbolo en una sola actualización (target.update_prices).
+        :param target: Portfolio o PortfolioRepository; con el repositorio los precios se
+                       registran en el diario.
+        :param quotes: Diccionario símbolo -> precio.
+        :return: IDs de los activos cuyo precio cambió.
+        """
+        return target.update_prices(quotes) if quotes else []
+
+    def collect(self, symbols: Sequence[str], types: Optional[Sequence[AssetType]] = None) -> Dict[str, float]:
+        """
+        Obtiene las cotizaciones sin aplicarlas; con caché, solo se piden las vencidas.
+        Se puede llamar desde otro hilo y aplicar el resultado con apply en el hilo que
+        modifica el portafolio.
+        :param symbols: Símbolos a consultar.
+        :param types: Tipo de activo de cada símbolo (define la vigencia en el caché).
+        :return: Diccionario símbolo -> precio.
+        """
+        if self.cache is None:
+            return asyncio.run(self.fetch(symbols))
+        return self.cache.get_many(symbols, lambda missing: asyncio.run(self.fetch(missing)),
+                                   self.provider.name, types)
+
+    async def refresh_async(self, target) -> List[str]:
+        """Versión asincrónica de refresh (sin caché)."""
+        quotes = await self.fetch(_holdings_of(target).text_column('symbol'))
+        return self.apply(target, quotes)
+
+    def refresh(self, target) -> List[str]:
+        """
+        Actualiza los precios de todos los símbolos del portafolio.
+        :param target: Portfolio o PortfolioRepository.
+        :return: IDs de los activos cuyo precio cambió.
+        """
+        symbols, types = quote_request(target)
+        return self.apply(target, self.collect(symbols, types))
+
+
+def _holdings_of(target) -> HoldingsTable:
+    """Tabla de tenencias de un Portfolio o de un PortfolioRepository."""
+    return getattr(target, 'portfolio', target).holdings
+
+
+def quote_request(target) -> Tuple[List[str], List[AssetType]]:
+    """
+    Símbolos y tipos de activo a cotizar de un Portfolio o PortfolioRepository (para collect).
+    :param target: Portfolio o PortfolioRepository.
+    :return: (símbolos, tipo de cada uno).
+    """
+    holdings = _holdings_of(target)
+    return list(holdings.text_column('symbol')), [AssetType(code) for code in holdings.column('type_code').tolist()]
+
+def _benchmark(symbols: int = 5_000, latency: float = 0.02):
+    """Mide la actualización de 5.000 símbolos contra el proveedor local."""
+    from Entidades.models import Asset
+    from Mercado.standin import StandInQuoteServer
+
+    from dashboard.Portfolio import Portfolio
+
+    portfolio = Portfolio()
+    for code in range(symbols):
+        portfolio.add_asset(Asset(symbol=f"SYM{code}", quantity=1.0))
+
+    async def run():
+        async with StandInQuoteServer(latency=latency) as server:
+            provider = QuoteProvider('local', server.host, server.port, batch_size=100,
+                                     requests_per_second=200.0, burst=20, max_concurrency=8)
+            service = QuoteIngestionService(provider)
+            started = time.perf_counter()
+            changed = len(await service.refresh_async(portfolio))
+            elapsed = time.perf_counter() - started
+            return changed, elapsed, server.connections, server.requests
+
+    changed, elapsed, connections, requests = asyncio.run(run())
+    print(f"{symbols:,} símbolos ({requests} pedidos por {connections} conexiones, {latency * 1000:.0f} ms de latencia)")
+    print(f"  actualización: {elapsed:.2f} s, {changed:,} precios cambiados")
+
+
+if __name__ == '__main__':
+    _benchmark()
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+#4.2 Proveedor de cotizaciones local (reemplazo para pruebas y mediciones)
+
+import asyncio
+import json
+import zlib
+from typing import Dict, Optional, Set
+from urllib.parse import parse_qs, urlsplit
+
+
+def standin_price(symbol: str) -> float:
+    """Precio determinístico de un símbolo, para poder verificar lo recibido."""
+    return round(1.0 + zlib.crc32(symbol.encode('utf-8')) % 100_000 / 100.0, 2)
+
+
+class StandInQuoteServer:
+    """
+    Servidor HTTP/1.1 mínimo con conexiones persistentes que responde
+    GET /quotes?symbols=A,B,C con {"quotes": {"A": 1.0, ...}}.
+    Permite simular latencia y cuenta conexiones y pedidos para verificar el pooling.
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0,
+                 prices: Optional[Dict[str, float]] = None, chunked: bool = False):
+        """
+        :param host: Dirección de escucha.
+        :param port: Puerto (0 elige uno libre).
+        :param latency: Segundos de demora por pedido.
+        :param prices: Precios fijos por símbolo (los demás usan standin_price).
+        :param chunked: Si las respuestas se envían con Transfer-Encoding: chunked.
+        """
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.prices = prices or {}
+        self.chunked = chunked
+        self.connections = 0
+        self.requests = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._handlers: Set[asyncio.Task] = set()
+
+    async def start(self) -> 'StandInQuoteServer':
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            for task in self._handlers:
+                task.cancel()
+            await asyncio.gather(*self._handlers, return_exceptions=True)
+            await self._server.wait_closed()
+            self._server = None
+
+    async def __aenter__(self) -> 'StandInQuoteServer':
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        task = asyncio.current_task()
+        self._handlers.add(task)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                keep_alive = True
+                while True:
+                    header = await reader.readline()
+                    if header in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = header.decode('latin-1').partition(':')
+                    if name.strip().lower() == 'connection' and value.strip().lower() == 'close':
+                        keep_alive = False
+                self.requests += 1
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+                status, body = self._respond(request_line.decode('latin-1'))
+                if self.chunked:
+                    # Dos bloques (el segundo puede quedar vacío) y el bloque final
+                    middle = len(body) // 2
+                    framing = "Transfer-Encoding: chunked"
+                    body = b''.join(f"{len(part):x}\r\n".encode('latin-1') + part + b'\r\n'
+                                    for part in (body[:middle], body[middle:]) if part) + b'0\r\n\r\n'
+                else:
+                    framing = f"Content-Length: {len(body)}"
+                writer.write(
+                    f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n{framing}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + body
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionResetError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        finally:
+            self._handlers.discard(task)
+            writer.close()
+
+    def _respond(self, request_line: str):
+        parts = request_line.split()
+        if len(parts) < 2 or parts[0] != 'GET':
+            return '405 Method Not Allowed', b'{}'
+        target = urlsplit(parts[1])
+        if target.path != '/quotes':
+            return '404 Not Found', b'{}'
+        symbols = [symbol for value in parse_qs(target.query).get('symbols', []) for symbol in value.split(',') if symbol]
+        quotes = {symbol: self.prices.get(symbol, standin_price(symbol)) for symbol in symbols}
+        return '200 OK', json.dumps({'quotes': quotes}).encode('utf-8')
@@ -1,81 +1,272 @@
 ﻿# -*- coding: utf-8 -*-
 import uuid
-from dataclasses import dataclass, field
-from typing import List, Optional, Dict
-from Entidades.models import Asset, Transaction, AssetType  # Asegúrate de importar las clases necesarias
+from datetime import date
+from dataclasses import InitVar, dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Union
+import numpy as np
+from Entidades.models import Asset, Transaction, AssetType, PortfolioCategory  # Asegúrate de importar las clases necesarias
+from Entidades.holdings import HoldingsTable
+from Analisis.adjustments import CorporateActions
+from Analisis.cedear import CedearConverter, CedearReport
+from Analisis.correlation import OnlineCovariance, weighted_volatility
+from Analisis.fx import FxRateStore
+from Analisis.groupby import group_holdings
+from Analisis.ledger import TransactionLedger, quantity_deltas
+from Analisis.montecarlo import ProjectionResult, simulate, step_returns
+from Analisis.lots import LotMethod, LotReport, match_lots
+from Analisis.rebalance import RebalancePlan, rebalance
+from Analisis.returns import money_weighted_returns
+from Analisis.risk import CALENDAR_DAYS, price_returns, risk_summary, rolling_risk
+from Analisis.rollups import PeriodRollups
+from Analisis.valuation import flow_series, ledger_calendar, portfolio_valuation, transaction_price_matrix
+from Datos.prices import PriceStore
 
 @dataclass
 class Portfolio:
     """Contenedor de portafolio de inversiones."""
     id: str = field(default_factory=lambda: str(uuid.uuid4()))
     name: str = 'Mi Portafolio'
-    assets: List[Asset] = field(default_factory=list)
+    # Activos iniciales: se copian a `holdings` (ver la propiedad `assets` al final del módulo)
+    assets: InitVar[Iterable[Asset]] = ()
     transactions: List[Transaction] = field(default_factory=list)
+    holdings: HoldingsTable = field(default_factory=HoldingsTable, repr=False)
+    ledger: TransactionLedger = field(default_factory=TransactionLedger, repr=False, compare=False)
+    base_currency: str = 'USD'
+    fx: FxRateStore = field(default_factory=FxRateStore, repr=False, compare=False)
+    cedears: CedearConverter = field(default_factory=CedearConverter, repr=False, compare=False)
+    price_store: Optional[PriceStore] = field(default=None, repr=False, compare=False)
+    corporate_actions: CorporateActions = field(default_factory=CorporateActions, repr=False, compare=False)
+    _transaction_version: int = field(default=0, init=False, repr=False, compare=False)
+    _metrics_cache: Optional[tuple] = field(default=None, init=False, repr=False, compare=False)
+    _rollups_cache: Optional[tuple] = field(default=None, init=False, repr=False, compare=False)
+    _covariance_cache: Optional[list] = field(default=None, init=False, repr=False, compare=False)
+    _values_cache: Optional[tuple] = field(default=None, init=False, repr=False, compare=False)
+    _subscribers: List[Callable[[List[str]], None]] = field(default_factory=list, init=False, repr=False, compare=False)
 
-    def add_asset(self, asset: Asset):
+    def __post_init__(self, assets: Iterable[Asset]):
+        for asset in assets:
+            self.add_asset(asset)
+        self.ledger.extend(self.transactions)
+        if self.corporate_actions.price_store is None:
+            self.corporate_actions.price_store = self.price_store
+
+    @property
+    def version(self) -> int:
+        """
+        Contador que aumenta con cada cambio de activos, transacciones, cotizaciones de monedas
+        o precios históricos. Permite a las vistas saltear recálculos si no hubo cambios.
+        :return: Versión actual del portafolio.
+        """
+        return self.holdings.version + self.history_version + self.fx.version
+
+    @property
+    def history_version(self) -> int:
+        """
+        Versión de los datos históricos: transacciones, almacén de precios y eventos corporativos.
+        No cambia con los precios actuales, por lo que las vistas pueden saltear los gráficos del historial.
+        :return: Versión actual del historial.
+        """
+        store_version = self.price_store.version if self.price_store is not None else 0
+        return self._transaction_version + store_version + self.corporate_actions.version
+
+    def _get_assets(self) -> HoldingsTable:
+        """
+        Activos del portafolio como secuencia de vistas sobre la tabla columnar.
+        :return: HoldingsTable (iterable de AssetView).
+        """
+        return self.holdings
+
+    def _set_assets(self, assets: Iterable[Asset]):
+        """
+        Reemplaza todos los activos del portafolio.
+        :param assets: Instancias de Asset (o vistas de otra tabla) que quedan en el portafolio.
+        """
+        assets = list(assets)
+        if not all(isinstance(asset, Asset) for asset in assets):
+            raise TypeError("Los activos deben ser instancias de Asset.")
+        self.remove_assets(list(self.holdings.text_column('id')))
+        for asset in assets:
+            self.holdings.append(asset)
+
+    def add_asset(self, asset: Asset) -> Asset:
         """
         Añade un nuevo activo al portafolio.
         :param asset: Instancia de Asset a añadir.
+        :return: Vista del activo almacenado en el portafolio.
         """
         if not isinstance(asset, Asset):
             raise TypeError("El objeto añadido debe ser una instancia de Asset.")
-        self.assets.append(asset)
+        return self.holdings.append(asset)
 
     def remove_asset(self, asset_id: str):
         """
         Elimina un activo del portafolio por su ID.
         :param asset_id: ID del activo a eliminar.
         """
-        original_count = len(self.assets)
-        self.assets = [a for a in self.assets if a.id != asset_id]
-        if len(self.assets) == original_count:
+        row = self.holdings.row_of(asset_id)
+        if row is None:
             raise ValueError(f"No se encontró un activo con el ID {asset_id} para eliminar.")
+        self.holdings.remove_row(row)
+
+    def remove_assets(self, asset_ids: Iterable[str]):
+        """
+        Elimina varios activos del portafolio por sus IDs.
+        :param asset_ids: IDs de los activos a eliminar.
+        """
+        asset_ids = list(dict.fromkeys(asset_ids))
+        missing = [asset_id for asset_id in asset_ids if self.holdings.row_of(asset_id) is None]
+        if missing:
+            raise ValueError(f"No se encontraron activos con los IDs {missing} para eliminar.")
+        for asset_id in asset_ids:
+            self.holdings.remove_row(self.holdings.row_of(asset_id))
 
     @property
     def total_value(self) -> float:
         """
-        Calcula el valor total del portafolio.
+        Calcula el valor total del portafolio en la moneda base.
         :return: Valor total (float).
         """
-        return round(sum(asset.total_value for asset in self.assets), 2)
+        return round(self.value_in(), 2)
+
+    @property
+    def unrealized_gain_loss(self) -> float:
+        """
+        Calcula la ganancia/pérdida no realizada del portafolio en la moneda base.
+        :return: Ganancia/pérdida total (float).
+        """
+        if self._single_currency(self.base_currency):
+            return round(self.holdings.unrealized_gain_loss(), 2)
+        holdings = self.holdings
+        gains = holdings.market_values() - holdings.column('quantity') * holdings.column('purchase_price')
+        converted = self.fx.convert_codes(gains, holdings.column('currency_code'), holdings.labels('currency'),
+                                          self.base_currency)
+        return round(float(converted.sum()), 2)
+
+    def _single_currency(self, currency: str) -> bool:
+        """Indica si todos los activos ya están en la moneda indicada (no hace falta convertir)."""
+        return set(self.holdings.totals('currency')) <= {currency}
+
+    def value_in(self, currency: Optional[str] = None, as_of=None) -> float:
+        """
+        Valor total del portafolio convertido a una moneda. Usa los totales incrementales por
+        moneda, así que aplica una sola cotización por moneda.
+        :param currency: Moneda destino (por defecto, la moneda base).
+        :param as_of: Fecha de las cotizaciones (por defecto, la última disponible).
+        :return: Valor total convertido.
+        """
+        currency = currency or self.base_currency
+        if self._single_currency(currency):
+            return self.holdings.total_value()
+        totals = self.holdings.totals('currency')
+        currencies = list(totals)
+        factors = self.fx.factors(currencies, currency, as_of)
+        missing = [code for code, factor in zip(currencies, factors.tolist()) if factor != factor]
+        if missing:
+            raise ValueError(f"No hay cotización para convertir {', '.join(map(str, missing))} a {currency}.")
+        return float(sum(totals[code]['total_value'] * factor for code, factor in zip(currencies, factors.tolist())))
+
+    def market_values(self, currency: Optional[str] = None, as_of=None) -> np.ndarray:
+        """
+        Valor de mercado de cada activo convertido a una moneda, en el orden de la tabla.
+        El resultado se reutiliza mientras no cambien los activos ni las cotizaciones y no
+        venza el TTL de la caché de monedas.
+        :param currency: Moneda destino (por defecto, la moneda base).
+        :param as_of: Fecha de las cotizaciones (por defecto, la última disponible).
+        :return: Array con un valor por activo.
+        """
+        currency = currency or self.base_currency
+        holdings = self.holdings
+        labels = holdings.labels('currency')
+        factors = self.fx.factors(labels, currency, as_of)
+        key = (holdings.version, self.fx.version, currency, as_of)
+        if self._values_cache is not None and self._values_cache[0] == key and self._values_cache[1] is factors:
+            return self._values_cache[2]
+        values = self.fx.convert_codes(holdings.market_values(), holdings.column('currency_code'), labels,
+                                       currency, as_of)
+        self._values_cache = (key, factors, values)
+        return values
 
     @property
     def performance_metrics(self) -> Dict[str, float]:
         """
         Calcula métricas de rendimiento básicas del portafolio.
+        Se reutiliza el resultado anterior mientras la versión no cambie.
         :return: Diccionario con las métricas.
         """
-        return {
-            'total_value': self.total_value,
-            'asset_count': len(self.assets),
-            'diversification': self._calculate_diversification()
-        }
+        version = self.version
+        if self._metrics_cache is None or self._metrics_cache[0] != version:
+            self._metrics_cache = (version, {
+                'total_value': self.total_value,
+                'asset_count': len(self.assets),
+                'diversification': self._calculate_diversification()
+            })
+        return self._metrics_cache[1]
 
     def _calculate_diversification(self) -> Dict[str, Dict[str, float]]:
         """
-        Calcula la diversificación del portafolio por tipo de activo.
+        Calcula la diversificación del portafolio por tipo de activo, en la moneda base.
         :return: Diccionario con los datos de diversificación por AssetType.
         """
+        totals = self.holdings.totals('type')
+        if self._single_currency(self.base_currency):
+            values = {asset_type: total['total_value'] for asset_type, total in totals.items()}
+        else:
+            # Con varias monedas se suman los valores ya convertidos a la moneda base
+            sums = np.bincount(self.holdings.column('type_code'), weights=self.market_values(),
+                               minlength=max(t.value for t in AssetType) + 1)
+            values = {asset_type: float(sums[asset_type.value]) for asset_type in totals}
         diversification = {}
         for asset_type in AssetType:
-            type_assets = [a for a in self.assets if a.type == asset_type]
-            if type_assets:
+            if asset_type in totals:
                 diversification[asset_type.name] = {
-                    'count': len(type_assets),
-                    'total_value': round(sum(a.total_value for a in type_assets), 2)
+                    'count': totals[asset_type]['count'],
+                    'total_value': round(values[asset_type], 2)
                 }
         return diversification
 
+    def group_by(self, by: Union[str, Sequence[str]] = 'type', value: str = 'market_value',
+                 currency: Optional[str] = None) -> Dict[object, Dict[str, float]]:
+        """
+        Agrupa los activos por tipo, categoría, moneda, mercado y/o país.
+        :param by: Dimensión o lista de dimensiones ('type', 'category', 'currency', 'exchange', 'country').
+        :param value: Magnitud a agregar ('market_value', 'cost', 'unrealized_gain_loss', 'quantity').
+        :param currency: Moneda a la que se convierten los montos (por defecto, la moneda base).
+        :return: Diccionario grupo -> {'count', 'sum', 'weight', 'min', 'max'}.
+        """
+        return group_holdings(self.holdings, by, value, self._row_factors(currency))
+
+    def _row_factors(self, currency: Optional[str] = None, as_of=None) -> Optional[np.ndarray]:
+        """
+        Factor de conversión de cada activo a una moneda, con las mismas cotizaciones que
+        value_in y market_values.
+        :param currency: Moneda destino (por defecto, la moneda base).
+        :param as_of: Fecha de las cotizaciones (por defecto, la última disponible).
+        :return: Array con un factor por activo, o None si todos ya están en esa moneda.
+        """
+        currency = currency or self.base_currency
+        if self._single_currency(currency):
+            return None
+        holdings = self.holdings
+        return self.fx.convert_codes(np.ones(len(holdings)), holdings.column('currency_code'),
+                                     holdings.labels('currency'), currency, as_of)
+
     def find_asset(self, asset_id: str) -> Optional[Asset]:
         """
         Busca un activo por su ID.
         :param asset_id: ID del activo a buscar.
         :return: Instancia de Asset si se encuentra, None en caso contrario.
         """
-        for asset in self.assets:
-            if asset.id == asset_id:
-                return asset
-        return None
+        row = self.holdings.row_of(asset_id)
+        return None if row is None else self.holdings.view(row)
+
+    def find_asset_by_symbol(self, symbol: str) -> Optional[Asset]:
+        """
+        Busca un activo por su símbolo.
+        :param symbol: Símbolo del activo a buscar.
+        :return: Primer activo añadido con ese símbolo, None si no existe.
+        """
+        rows = self.holdings.rows_of_symbol(symbol)
+        return self.holdings.view(rows[0]) if rows else None
 
     def add_transaction(self, transaction: Transaction):
         """
@@ -85,3 +276,349 @@ class Portfolio:
         if not isinstance(transaction, Transaction):
             raise TypeError("El objeto añadido debe ser una instancia de Transaction.")
         self.transactions.append(transaction)
+        self.ledger.append(transaction)
+        self._transaction_version += 1
+
+    def add_transactions(self, transactions: Sequence[Transaction]):
+        """
+        Añade varias transacciones de una vez (carga masiva del libro).
+        :param transactions: Instancias de Transaction a añadir.
+        """
+        transactions = list(transactions)
+        if not all(isinstance(transaction, Transaction) for transaction in transactions):
+            raise TypeError("Los objetos añadidos deben ser instancias de Transaction.")
+        self.transactions.extend(transactions)
+        self.ledger.extend(transactions)
+        self._transaction_version += 1
+
+    def derived_positions(self) -> Dict[str, Dict[str, float]]:
+        """
+        Deriva las posiciones abiertas reproduciendo el historial de transacciones.
+        :return: Diccionario asset_id -> {'quantity', 'cost_basis', 'average_cost'}.
+        """
+        return self.ledger.positions()
+
+    def tax_lots(self, method: LotMethod = LotMethod.FIFO) -> LotReport:
+        """
+        Imputa las ventas a lotes de compra y calcula la ganancia realizada y no realizada.
+        :param method: LotMethod (FIFO, LIFO o AVERAGE_COST).
+        :return: LotReport con detalle por lote, por activo (by_asset) y por año (by_year).
+        """
+        return match_lots(self.ledger, method, self.current_prices())
+
+    def current_prices(self) -> Dict[str, float]:
+        """
+        Precio actual de cada activo.
+        :return: Diccionario asset_id -> current_price.
+        """
+        return dict(zip(self.holdings.text_column('id'), self.holdings.column('current_price').tolist()))
+
+    def update_prices(self, symbol_to_price: Dict[str, float]) -> List[str]:
+        """
+        Actualiza el precio actual de todos los activos con cada símbolo en una sola operación
+        vectorizada. Las filas que cambian quedan marcadas como sucias (holdings.dirty_rows)
+        y los suscriptores reciben una única notificación con los IDs afectados.
+        :param symbol_to_price: Diccionario símbolo -> nuevo precio.
+        :return: IDs de los activos cuyo precio cambió.
+        """
+        rows, prices = [], []
+        for symbol, price in symbol_to_price.items():
+            symbol_rows = self.holdings.rows_of_symbol(symbol)
+            rows.extend(symbol_rows)
+            prices.extend([price] * len(symbol_rows))
+        prices = np.array(prices, dtype=np.float64)
+        if not np.isfinite(prices).all() or (prices < 0).any():
+            raise ValueError("Los precios deben ser números finitos no negativos.")
+        changed = self.holdings.set_prices(np.array(rows, dtype=np.int64), prices)
+        if not len(changed):
+            return []
+        ids = self.holdings.text_column('id')
+        changed_ids = [ids[row] for row in changed.tolist()]
+        for callback in list(self._subscribers):
+            callback(changed_ids)
+        return changed_ids
+
+    def subscribe(self, callback: Callable[[List[str]], None]) -> Callable[[], None]:
+        """
+        Registra una función que se llama con la lista de IDs cuyo precio cambió
+        en cada actualización masiva.
+        :param callback: Función que recibe la lista de IDs.
+        :return: Función sin argumentos que cancela la suscripción.
+        """
+        self._subscribers.append(callback)
+
+        def unsubscribe():
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+        return unsubscribe
+
+    def _ledger_symbols(self) -> List[Optional[str]]:
+        """Símbolo de cada activo del libro, en el orden de ledger.asset_ids (None si ya no está)."""
+        symbols = dict(zip(self.holdings.text_column('id'), self.holdings.text_column('symbol')))
+        return [symbols.get(asset_id) for asset_id in self.ledger.asset_ids]
+
+    def _ledger_days(self) -> np.ndarray:
+        """Fecha (datetime64[D]) de cada fila del libro."""
+        return self.ledger.column('date').astype('datetime64[us]').astype('datetime64[D]')
+
+    def split_adjusted_quantities(self) -> np.ndarray:
+        """
+        Cantidad de cada transacción del libro expresada en acciones actuales (ajustada por los
+        splits posteriores a su fecha), para valuar junto con precios ajustados por splits.
+        :return: Array con una entrada por fila del libro.
+        """
+        return self.corporate_actions.adjust_quantity_column(
+            self._ledger_symbols(), self.ledger.column('asset_code'),
+            self._ledger_days(), self.ledger.column('quantity'))
+
+    def held_quantities(self) -> Dict[str, float]:
+        """
+        Cantidad actual de cada activo del libro según las transacciones, ajustada por splits.
+        :return: Diccionario asset_id -> cantidad.
+        """
+        deltas = quantity_deltas(self.ledger.column('type_code'), self.split_adjusted_quantities())
+        totals = np.bincount(self.ledger.column('asset_code'), weights=deltas, minlength=len(self.ledger.asset_ids))
+        return dict(zip(self.ledger.asset_ids, totals.tolist()))
+
+    def price_matrix(self, dates: np.ndarray, include_current: bool = True, adjusted: bool = False) -> np.ndarray:
+        """
+        Matriz fechas x activos (en el orden de ledger.asset_ids) de precios por acción actual:
+        cada cierre y cada precio de transacción se ajusta por los splits posteriores a su fecha
+        antes de completar hacia adelante, para que un split no produzca saltos.
+        Usa los cierres del almacén de precios si hay uno y completa con los precios de las
+        transacciones; con include_current, la última fecha toma los precios actuales.
+        :param dates: Calendario ordenado (datetime64[D]).
+        :param include_current: Si se usan los precios actuales en la última fecha.
+        :param adjusted: Si se ajustan también por dividendos (para rendimientos).
+        :return: Matriz de precios completada hacia adelante.
+        """
+        current = self.current_prices() if include_current else None
+        ledger_symbols = self._ledger_symbols()
+        transaction_prices = self.corporate_actions.adjust_price_column(
+            ledger_symbols, self.ledger.column('asset_code'), self._ledger_days(),
+            self.ledger.column('price'), splits_only=not adjusted)
+        prices = transaction_price_matrix(self.ledger, dates, current, transaction_prices)
+        if self.price_store is not None and len(dates):
+            stored = self.corporate_actions.adjust_matrix(ledger_symbols, dates,
+                                                          self.price_store.closes(ledger_symbols, dates),
+                                                          splits_only=not adjusted)
+            if current:
+                latest = np.array([current.get(asset_id, np.nan) for asset_id in self.ledger.asset_ids])
+                stored[-1] = np.where(np.isnan(latest), stored[-1], latest)
+            prices = np.where(np.isnan(stored), prices, stored)
+        return prices
+
+    def valuation(self, dates=None, prices=None):
+        """
+        Calcula la serie diaria de valor del portafolio a partir de las transacciones.
+        Las cantidades se expresan en acciones actuales (split_adjusted_quantities), por lo que
+        un split no cambia el valor.
+        :param dates: Calendario datetime64[D] (por defecto, de la primera transacción a hoy).
+        :param prices: Matriz fechas x activos de precios por acción actual, en el orden de
+                       ledger.asset_ids (por defecto, la de price_matrix).
+        :return: Tupla (fechas, valores).
+        """
+        if dates is None:
+            dates = ledger_calendar(self.ledger)
+        if prices is None:
+            prices = self.price_matrix(dates)
+        return portfolio_valuation(self.ledger, dates, prices, quantities=self.split_adjusted_quantities())
+
+    def rollups(self) -> PeriodRollups:
+        """
+        Agregados diarios, semanales y mensuales de valor, flujos y rendimiento.
+        Se recalculan solo cuando cambia la versión del portafolio (o el día).
+        :return: PeriodRollups listo para consultar por período.
+        """
+        key = (self.version, date.today())
+        if self._rollups_cache is None or self._rollups_cache[0] != key:
+            dates = ledger_calendar(self.ledger)
+            _, values = self.valuation(dates)
+            self._rollups_cache = (key, PeriodRollups(dates, values, flow_series(self.ledger, dates)))
+        return self._rollups_cache[1]
+
+    def time_weighted_return(self, period: Optional[str] = None) -> float:
+        """
+        Rendimiento ponderado por tiempo, neto de aportes y retiros.
+        :param period: Etiqueta de PERIODS (por ejemplo 'Último Mes'); por defecto, todo el historial.
+        :return: Rendimiento acumulado (0.1 = 10 %).
+        """
+        return self.rollups().period_return(period)
+
+    def money_weighted_returns(self, by: str = 'asset') -> Dict[object, float]:
+        """
+        Rendimiento ponderado por dinero (XIRR anual) a partir de las transacciones, tomando el
+        valor actual de cada posición como flujo final.
+        :param by: 'asset' (por asset_id), 'category' o 'portfolio'.
+        :return: Diccionario clave -> tasa anual (NaN si no tiene solución).
+        """
+        if by not in ('asset', 'category', 'portfolio'):
+            raise ValueError(f"Agrupación desconocida: {by}")
+        prices = self.current_prices()
+        current_values = {asset_id: quantity * prices.get(asset_id, 0.0)
+                          for asset_id, quantity in self.held_quantities().items() if quantity}
+        groups = None
+        if by == 'category':
+            categories = self.holdings.labels('category')
+            category_codes = self.holdings.column('category_code').tolist()
+            by_id = dict(zip(self.holdings.text_column('id'), (categories[code] for code in category_codes)))
+            groups = {asset_id: by_id.get(asset_id) for asset_id in self.ledger.asset_ids}
+        elif by == 'portfolio':
+            groups = dict.fromkeys(self.ledger.asset_ids, self.name)
+        return money_weighted_returns(self.ledger, current_values, groups)
+
+    def risk_metrics(self, window: int = CALENDAR_DAYS, risk_free: float = 0.0,
+                     confidence: float = 0.95) -> Dict[str, float]:
+        """
+        Métricas de riesgo del portafolio sobre la serie diaria de rendimientos netos de flujos.
+        :param window: Días calendario de la ventana (por defecto, un año).
+        :param risk_free: Tasa libre de riesgo anual.
+        :param confidence: Nivel de confianza del VaR.
+        :return: Diccionario con 'volatility', 'sharpe', 'sortino', 'max_drawdown',
+                 'historical_var' y 'parametric_var' (vacío si no hay historial).
+        """
+        daily = self.rollups().levels['daily']
+        if len(daily['return']) < 2:
+            return {}
+        metrics = risk_summary(daily['return'][1:], daily['value'][1:], window, risk_free, confidence, CALENDAR_DAYS)
+        # Volatilidad implícita en la matriz de covarianza con los pesos actuales (todo el historial)
+        tracker = self.covariance()
+        prices = self.current_prices()
+        quantities = self.held_quantities()
+        values = np.array([quantities.get(asset_id, 0.0) * prices.get(asset_id, 0.0)
+                           for asset_id in tracker.asset_ids])
+        if values.sum() > 0:
+            metrics['covariance_volatility'] = weighted_volatility(values / values.sum(), tracker.covariance(),
+                                                                   CALENDAR_DAYS)
+        return metrics
+
+    def risk_series(self, window: int = CALENDAR_DAYS, risk_free: float = 0.0,
+                    confidence: float = 0.95) -> Dict[str, np.ndarray]:
+        """
+        Series móviles de riesgo del portafolio (las de risk_metrics, fecha por fecha) para graficar.
+        :param window: Días calendario de la ventana (por defecto, un año).
+        :param risk_free: Tasa libre de riesgo anual.
+        :param confidence: Nivel de confianza del VaR.
+        :return: Diccionario con 'dates' y las series de rolling_risk (vacío si no hay historial).
+        """
+        daily = self.rollups().levels['daily']
+        if len(daily['return']) < 2:
+            return {}
+        series = rolling_risk(daily['return'][1:], daily['value'][1:], window, risk_free, confidence, CALENDAR_DAYS)
+        series['dates'] = daily['dates'][1:]
+        return series
+
+    def asset_risk(self, window: int = CALENDAR_DAYS, risk_free: float = 0.0,
+                   confidence: float = 0.95) -> Dict[str, Dict[str, float]]:
+        """
+        Métricas de riesgo de cada activo sobre su serie diaria de precios.
+        :param window: Días calendario de la ventana (por defecto, un año).
+        :param risk_free: Tasa libre de riesgo anual.
+        :param confidence: Nivel de confianza del VaR.
+        :return: Diccionario asset_id -> métricas (ver risk_metrics).
+        """
+        dates = ledger_calendar(self.ledger)
+        if len(dates) < 3:
+            return {}
+        prices = self.price_matrix(dates, adjusted=True)
+        summary = risk_summary(price_returns(prices)[1:], prices[1:], window, risk_free, confidence, CALENDAR_DAYS)
+        return {asset_id: {name: float(values[code]) for name, values in summary.items()}
+                for code, asset_id in enumerate(self.ledger.asset_ids)}
+
+    def covariance(self) -> OnlineCovariance:
+        """
+        Covarianza de los rendimientos diarios de los activos del libro. El historial hasta ayer
+        se mantiene entre llamadas y solo se recalcula completo cuando cambian las transacciones;
+        los días nuevos se agregan en línea y el día de hoy se suma con los precios actuales.
+        :return: OnlineCovariance (copia; modificarlo no altera el historial guardado).
+        """
+        dates = ledger_calendar(self.ledger)
+        cache = self._covariance_cache
+        if cache is None or cache[0] != self.history_version:
+            prices = self.price_matrix(dates, include_current=False, adjusted=True)
+            history = OnlineCovariance(self.ledger.asset_ids)
+            history.update_batch(price_returns(prices)[1:-1])
+            last_prices = prices[-1] if len(dates) else np.zeros(len(self.ledger.asset_ids))
+            cache = self._covariance_cache = [self.history_version, len(dates), history, last_prices]
+        elif len(dates) > cache[1]:
+            # Días nuevos sin transacciones: el precio se completa hacia adelante (rendimiento cero)
+            cache[2].update_batch(np.zeros((len(dates) - cache[1], len(cache[2]))))
+            cache[1] = len(dates)
+
+        tracker = cache[2].copy()
+        if len(dates) > 1:
+            current = self.current_prices()
+            latest = np.array([current.get(asset_id, np.nan) for asset_id in tracker.asset_ids])
+            latest = np.where(np.isnan(latest), cache[3], latest)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                tracker.update(latest / cache[3] - 1.0)
+        return tracker
+
+    def projection_inputs(self, method: str = 'bootstrap') -> Dict[str, object]:
+        """
+        Datos del portafolio que necesita la simulación Monte Carlo, como valores y arrays
+        independientes del portafolio: se pueden calcular en el hilo de la interfaz y pasar
+        a Analisis.montecarlo.simulate en otro hilo sin compartir el Portfolio.
+        :param method: 'bootstrap' (remuestreo de rendimientos mensuales históricos) o 'normal'
+                       (lognormal con la media y el desvío históricos).
+        :return: Argumentos de simulate: 'initial' y 'history' o 'mu' y 'sigma'.
+        """
+        if method not in ('bootstrap', 'normal'):
+            raise ValueError(f"Método de proyección desconocido: {method}")
+        # La serie diaria es calendario: un mes son ~30 días (bloques sin superposición)
+        monthly = step_returns(self.rollups().levels['daily']['return'][1:], 30)
+        if not len(monthly):
+            raise ValueError("Se necesita al menos un mes de historial para proyectar.")
+        if method == 'bootstrap':
+            return {'initial': self.total_value, 'history': monthly}
+        logs = np.log1p(monthly)
+        return {'initial': self.total_value, 'mu': float(logs.mean()), 'sigma': float(logs.std())}
+
+    def project(self, months: int = 120, contribution: float = 0.0, paths: int = 100_000,
+                method: str = 'bootstrap', seed: int = 0, workers: Optional[int] = None) -> ProjectionResult:
+        """
+        Proyecta el valor del portafolio mes a mes con simulación Monte Carlo, partiendo del valor
+        actual y usando el historial de rendimientos diarios netos de flujos.
+        :param months: Horizonte en meses.
+        :param contribution: Aporte mensual (negativo para retiros).
+        :param paths: Cantidad de caminos.
+        :param method: 'bootstrap' o 'normal' (ver projection_inputs).
+        :param seed: Semilla para resultados reproducibles.
+        :param workers: Procesos a usar (1 simula en el proceso actual).
+        :return: ProjectionResult.
+        """
+        return simulate(horizon=months, paths=paths, contribution=contribution, seed=seed, workers=workers,
+                        **self.projection_inputs(method))
+
+    def rebalance(self, targets: Dict[str, float], categories: Optional[Sequence[PortfolioCategory]] = None,
+                  cash: float = 0.0, lot_sizes: Union[None, float, Dict[str, float]] = None,
+                  fee_rate: float = 0.0, fixed_fee: float = 0.0, tolerance: float = 0.0) -> RebalancePlan:
+        """
+        Calcula las operaciones para llevar el portafolio a pesos objetivo (ver Analisis.rebalance).
+        :param targets: Peso objetivo por asset_id o, con categorías, por nombre de categoría.
+        :param categories: PortfolioCategory que agrupan los activos.
+        :param cash: Efectivo disponible para comprar, en la moneda base.
+        :param lot_sizes: Lote mínimo (escalar o por asset_id).
+        :param fee_rate: Comisión proporcional estimada.
+        :param fixed_fee: Comisión fija estimada por operación.
+        :param tolerance: Desvío mínimo (fracción del total) para operar un activo.
+        :return: RebalancePlan con las operaciones sugeridas. Los pesos, el efectivo y las
+                 comisiones fijas están en la moneda base.
+        """
+        return rebalance(self.holdings, targets, categories, cash, lot_sizes, fee_rate, fixed_fee, tolerance,
+                         self._row_factors())
+
+    def cedear_report(self, dollar: str = 'CCL', as_of=None) -> CedearReport:
+        """
+        Valúa los CEDEARs del portafolio contra su subyacente con el dólar MEP o CCL.
+        Los ratios, precios de subyacentes y cotizaciones se cargan en `self.cedears`.
+        :param dollar: 'MEP' o 'CCL'.
+        :param as_of: Fecha del dólar (por defecto, la última cotización).
+        :return: CedearReport con precio implícito, brecha y dólar implícito por tenencia.
+        """
+        return self.cedears.report(self.holdings, dollar, as_of)
+
+
+# `assets` es a la vez argumento de inicialización (InitVar) y propiedad: la propiedad se asigna
+# después de generar la dataclass para que no se tome como valor por defecto del argumento
+Portfolio.assets = property(Portfolio._get_assets, Portfolio._set_assets, doc=Portfolio._get_assets.__doc__)
@@ -1,39 +1,97 @@
 # -*- coding: utf-8 -*-
 from PyQt5.QtWidgets import (
-    QWidget, QVBoxLayout, QLabel, QHBoxLayout, QComboBox, QScrollArea
+    QWidget, QVBoxLayout, QLabel, QHBoxLayout, QComboBox, QScrollArea, QGridLayout, QFrame
 )
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QTimer, QThread, pyqtSignal
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
 from dashboard.dashboardModel import DashboardModel
-from dashboard.Portfolio import Portfolio  # Importa la clase Portfolio
-from Entidades.models import Asset, AssetType  # Importa las clases Asset y AssetType
-import json
-import os
+from Datos.repository import shared_repository
+from Mercado.cache import shared_cache
+from Mercado.quotes import QuoteIngestionService, QuoteProvider, quote_request
 import mplcursors
+import os
+
+# Proveedor de cotizaciones (solo si se configura con variables de entorno; sin él no se
+# consultan precios) y frecuencia de actualización
+QUOTE_PROVIDER = None
+if os.environ.get('PORTFOLIO_QUOTES_HOST'):
+    QUOTE_PROVIDER = QuoteProvider('default', os.environ['PORTFOLIO_QUOTES_HOST'],
+                                   int(os.environ.get('PORTFOLIO_QUOTES_PORT', '8080')))
+QUOTE_REFRESH_INTERVAL_MS = 60000
+
+
+class QuoteWorker(QThread):
+    """Busca las cotizaciones fuera del hilo de la interfaz; se aplican al recibir la señal."""
+    fetched = pyqtSignal(object)
+
+    def __init__(self, service, symbols, types, parent=None):
+        super().__init__(parent)
+        self.service = service
+        self.symbols = symbols
+        self.types = types
+
+    def run(self):
+        self.fetched.emit(self.service.collect(self.symbols, self.types))
+
 
 class Dashboard(QWidget):
     def __init__(self):
         super().__init__()
-        self.portfolio = Portfolio()
+        # Portafolio compartido por todas las vistas (con el historial de precios en disco)
         self.data_file = "portfolio_data.json"
-        self.load_saved_assets()
+        self.repository = shared_repository(self.data_file)
+        self.portfolio = self.repository.view()
+        self.model = DashboardModel(self.portfolio)
+        self._shown_ids = frozenset()
+        self._shown_history_version = None
         self.init_ui()
+        # El repositorio avisa después del primer lote, al terminar y cuando cambian precios
+        self.portfolio.subscribe(self.on_portfolio_changed)
+        # El caché compartido evita pedir precios vigentes y alimenta los contadores de la ventana principal
+        self.quote_service = None
+        if QUOTE_PROVIDER is not None:
+            self.quote_service = QuoteIngestionService(QUOTE_PROVIDER, cache=shared_cache())
+        self._quote_worker = None
+        self.quote_timer = QTimer(self)
+        self.quote_timer.timeout.connect(self.refresh_quotes)
+        self.load_saved_assets()
 
     def load_saved_assets(self):
-        if os.path.exists(self.data_file):
-            with open(self.data_file, 'r') as file:
-                data = json.load(file)
-                for asset_data in data:
-                    asset_type = AssetType[asset_data['type']]
-                    asset = Asset(
-                        symbol=asset_data['symbol'],
-                        name=asset_data['name'],
-                        type=asset_type,
-                        quantity=asset_data['quantity'],
-                        current_price=asset_data['current_price']
-                    )
-                    self.portfolio.assets.append(asset)
+        """Carga los activos guardados de a lotes sin bloquear la interfaz."""
+        self._asset_batches = self.repository.load_batches(progress=self.show_load_progress)
+        QTimer.singleShot(0, self.load_next_batch)
+
+    def load_next_batch(self):
+        """Avanza un lote de la carga y programa el siguiente."""
+        if next(self._asset_batches, None) is None:
+            self.loading_label.hide()
+            if self.quote_service is not None:
+                self.refresh_quotes()
+                self.quote_timer.start(QUOTE_REFRESH_INTERVAL_MS)
+            return
+        QTimer.singleShot(0, self.load_next_batch)
+
+    def refresh_quotes(self):
+        """Pide las cotizaciones en segundo plano (si hay proveedor y no hay un pedido en curso)."""
+        if self.quote_service is None:
+            return
+        if self._quote_worker is not None and self._quote_worker.isRunning():
+            return
+        symbols, types = quote_request(self.repository)
+        if not symbols:
+            return
+        self._quote_worker = QuoteWorker(self.quote_service, symbols, types, self)
+        self._quote_worker.fetched.connect(self.apply_quotes)
+        self._quote_worker.start()
+
+    def apply_quotes(self, quotes):
+        """Aplica las cotizaciones por el repositorio: notifica a las vistas y las guarda en el diario."""
+        self.quote_service.apply(self.repository, quotes)
+
+    def show_load_progress(self, read, total):
+        """Muestra el avance de la carga del archivo."""
+        self.loading_label.setText(f"Cargando activos... {read / total:.0%}" if total else "")
 
     def init_ui(self):
         layout = QVBoxLayout()
@@ -63,16 +121,37 @@ class Dashboard(QWidget):
         title_label.setStyleSheet("font-size: 24px; font-weight: bold; color: #ff69b4;")
         layout.addWidget(title_label, alignment=Qt.AlignCenter)
 
+        # Avance de la carga de activos guardados
+        self.loading_label = QLabel("")
+        self.loading_label.setStyleSheet("font-size: 12px; color: #aaaaaa;")
+        layout.addWidget(self.loading_label, alignment=Qt.AlignCenter)
+
         # Selección de Período
         period_layout = QHBoxLayout()
         period_label = QLabel("Período de Análisis:")
         self.period_selector = QComboBox()
         self.period_selector.addItems(["Hoy", "Última Semana", "Último Mes", "Últimos 6 Meses", "Último Año"])
-        self.period_selector.currentIndexChanged.connect(self.update_dashboard)
+        self.period_selector.currentIndexChanged.connect(self.plot_portfolio_performance)
         period_layout.addWidget(period_label)
         period_layout.addWidget(self.period_selector)
         layout.addLayout(period_layout)
 
+        # Panel de métricas de riesgo
+        risk_panel = QFrame()
+        risk_panel.setStyleSheet("QFrame { border: 1px solid #00ffcc; }")
+        risk_layout = QGridLayout(risk_panel)
+        self.risk_values = []
+        labels, _ = self.model.get_risk_metrics()
+        for column, label in enumerate(labels):
+            title = QLabel(label)
+            title.setStyleSheet("font-size: 12px; color: #00ffcc; border: none;")
+            value = QLabel('—')
+            value.setStyleSheet("font-size: 18px; font-weight: bold; border: none;")
+            risk_layout.addWidget(title, 0, column, alignment=Qt.AlignCenter)
+            risk_layout.addWidget(value, 1, column, alignment=Qt.AlignCenter)
+            self.risk_values.append(value)
+        layout.addWidget(risk_panel)
+
         # Scroll Area para gráficos
         scroll_area = QScrollArea()
         scroll_area.setWidgetResizable(True)
@@ -97,6 +176,12 @@ class Dashboard(QWidget):
         self.canvas_composition.setMinimumHeight(400)
         scroll_layout.addWidget(self.canvas_composition)
 
+        # Mapa de calor de correlaciones
+        self.figure_correlation = Figure(facecolor='#1e1e2f')
+        self.canvas_correlation = FigureCanvas(self.figure_correlation)
+        self.canvas_correlation.setMinimumHeight(400)
+        scroll_layout.addWidget(self.canvas_correlation)
+
         scroll_area.setWidget(scroll_content)
         layout.addWidget(scroll_area)
 
@@ -115,9 +200,7 @@ class Dashboard(QWidget):
         ax.spines['right'].set_color('#ffffff')
         ax.spines['left'].set_color('#ffffff')
 
-        # Ejemplo de datos de rendimiento
-        self.performance = [1000, 1050, 1100, 1080, 1150]
-        self.dates = ["Lun", "Mar", "Mié", "Jue", "Vie"]
+        self.dates, self.performance = self.model.get_portfolio_performance(self.period_selector.currentText())
 
         line, = ax.plot(self.dates, self.performance, color='#00ffcc', linewidth=3, marker='o', markersize=8)
         ax.set_title('Rendimiento del Portafolio', color='#ffffff', fontsize=16)
@@ -134,10 +217,7 @@ class Dashboard(QWidget):
         ax = self.figure_distribution.add_subplot(111)
         ax.set_facecolor("#1e1e2f")
 
-        # Datos ficticios para prototipo
-        labels = ['Acciones', 'Bonos', 'Efectivo', 'Criptomonedas']
-        sizes = [40, 30, 20, 10]
-        colors = ['#ff69b4', '#00ffcc', '#ff9800', '#4caf50']
+        labels, sizes, colors = self.model.get_asset_distribution()
 
         wedges, texts, autotexts = ax.pie(
             sizes, labels=labels, autopct='%1.1f%%',
@@ -159,10 +239,7 @@ class Dashboard(QWidget):
         ax = self.figure_composition.add_subplot(111)
         ax.set_facecolor("#1e1e2f")
 
-        # Datos ficticios de composición
-        categories = ['Dinero Líquido', 'Conservadores', 'Medios', 'Arriesgados', 'Ultra Arriesgados']
-        values = [10000, 30000, 20000, 25000, 15000]  # Valores en dólares
-        colors = ['#00ffcc', '#4caf50', '#ff9800', '#ff69b4', '#ff4444']
+        categories, values, colors = self.model.get_asset_composition()
 
         bars = ax.barh(categories, values, color=colors)
 
@@ -189,8 +266,74 @@ class Dashboard(QWidget):
 
         self.canvas_composition.draw()
 
+    def plot_correlation_heatmap(self):
+        """Mapa de calor de la correlación entre los rendimientos diarios de los activos."""
+        self.figure_correlation.clear()
+        ax = self.figure_correlation.add_subplot(111)
+        ax.set_facecolor("#1e1e2f")
+        ax.set_title('Correlación entre Activos', color='#ffffff', fontsize=16)
+
+        labels, matrix = self.model.get_correlation_matrix()
+        if matrix is None:
+            ax.axis('off')
+            ax.text(0.5, 0.5, 'Sin historial suficiente', ha='center', va='center', color='#ffffff', fontsize=14)
+            self.canvas_correlation.draw()
+            return
+
+        image = ax.imshow(matrix, cmap='coolwarm', vmin=-1, vmax=1, interpolation='nearest')
+        # Con muchos activos las etiquetas no entran: se muestran solo para carteras chicas
+        if len(labels) <= 30:
+            ax.set_xticks(range(len(labels)))
+            ax.set_xticklabels(labels, rotation=90)
+            ax.set_yticks(range(len(labels)))
+            ax.set_yticklabels(labels)
+        ax.tick_params(axis='both', colors='#ffffff', labelsize=10)
+        colorbar = self.figure_correlation.colorbar(image, ax=ax)
+        colorbar.ax.tick_params(colors='#ffffff')
+
+        # Hacer el gráfico interactivo
+        mplcursors.cursor(image, hover=True).connect(
+            "add", lambda sel: sel.annotation.set_text(
+                f"{labels[int(sel.index[0])]} / {labels[int(sel.index[1])]}: "
+                f"{matrix[int(sel.index[0]), int(sel.index[1])]:.2f}")
+        )
+
+        self.canvas_correlation.draw()
+
+    def update_risk_panel(self):
+        """Actualizar el panel de métricas de riesgo."""
+        _, values = self.model.get_risk_metrics()
+        for label, value in zip(self.risk_values, values):
+            label.setText(value)
+
     def update_dashboard(self):
-        """Actualizar gráficos según el período seleccionado."""
+        """Actualizar todos los gráficos; el selector de período solo redibuja el rendimiento."""
         self.plot_portfolio_performance()
         self.plot_asset_distribution()
         self.plot_asset_composition()
+        self.plot_correlation_heatmap()
+        self.update_risk_panel()
+        self._shown_history_version = self.portfolio.history_version
+        self._shown_ids = frozenset(self.portfolio.holdings.text_column('id'))
+
+    def on_portfolio_changed(self, asset_ids):
+        """
+        Redibuja solo lo que depende de los activos cambiados. Si el historial (transacciones,
+        precios guardados o eventos) no cambió, el gráfico de rendimiento, la correlación y el
+        panel de riesgo se conservan y solo se recalculan la distribución y la composición.
+        :param asset_ids: IDs de los activos afectados.
+        """
+        if not asset_ids:
+            return
+        if self.portfolio.history_version != self._shown_history_version:
+            self.update_dashboard()
+            return
+        if self._shown_ids.isdisjoint(asset_ids) and all(
+                self.portfolio.find_asset(asset_id) is None for asset_id in asset_ids):
+            return
+        self.plot_asset_distribution()
+        self.plot_asset_composition()
+        if not self.portfolio.transactions:
+            # Sin historial, el gráfico de rendimiento muestra el valor actual
+            self.plot_portfolio_performance()
+        self._shown_ids = frozenset(self.portfolio.holdings.text_column('id'))
@@ -1,50 +1,101 @@
 ﻿# -*- coding: utf-8 -*-
 
 
-import json
-import os
+from datetime import date
 
-from Entidades.models import Asset, AssetType
-from dashboard.Portfolio import Portfolio
+from Datos.repository import shared_repository
+from Entidades.models import AssetType
+
+# Etiquetas de los gráficos para cada tipo de activo
+TYPE_LABELS = {
+    AssetType.STOCK: 'Acciones',
+    AssetType.CRYPTO: 'Criptomonedas',
+    AssetType.BOND: 'Bonos',
+    AssetType.CEDEAR: 'CEDEARs',
+    AssetType.FUND: 'Fondos',
+    AssetType.COMMODITY: 'Commodities',
+}
+CHART_COLORS = ['#ff69b4', '#00ffcc', '#ff9800', '#4caf50', '#ff4444', '#9c27b0']
+# Métricas del panel de riesgo: clave de Portfolio.risk_metrics -> (etiqueta, formato)
+RISK_LABELS = {
+    'volatility': ('Volatilidad anual', '{:.2%}'),
+    'sharpe': ('Sharpe', '{:.2f}'),
+    'sortino': ('Sortino', '{:.2f}'),
+    'max_drawdown': ('Caída máxima', '{:.2%}'),
+    'historical_var': ('VaR 95% histórico', '{:.2%}'),
+    'parametric_var': ('VaR 95% paramétrico', '{:.2%}'),
+}
 
 
 class DashboardModel:
-    def __init__(self):
-        self.portfolio = Portfolio()
+    def __init__(self, portfolio=None):
         self.data_file = "portfolio_data.json"
-        self.load_saved_assets()
+        if portfolio is None:
+            # Vista compartida: el archivo se lee una sola vez por proceso
+            self.portfolio = self.load_saved_assets()
+        else:
+            self.portfolio = portfolio
 
     def load_saved_assets(self):
-        if os.path.exists(self.data_file):
-            with open(self.data_file, 'r') as file:
-                data = json.load(file)
-                for asset_data in data:
-                    asset_type = AssetType(name=asset_data['type'])
-                    asset = Asset(
-                        symbol=asset_data['symbol'],
-                        name=asset_data['name'],
-                        type=asset_type,
-                        quantity=asset_data['quantity'],
-                        current_price=asset_data['current_price']
-                    )
-                    self.portfolio.assets.append(asset)
-
-    def get_portfolio_performance(self):
-        # Ejemplo de datos de rendimiento
+        return shared_repository(self.data_file).load()
+
+    def get_portfolio_performance(self, period=None):
+        if self.portfolio.transactions:
+            rollups = self.portfolio.rollups()
+            series = rollups.period(period) if period else rollups.levels['daily']
+            return series['dates'].astype(object).tolist(), series['value'].round(2).tolist()
+        if len(self.portfolio.assets):
+            # Sin historial de transacciones solo se conoce el valor actual
+            return [date.today()], [self.portfolio.total_value]
+        # Ejemplo de datos de rendimiento (portafolio vacío)
         performance = [1000, 1050, 1100, 1080, 1150]
         dates = ["Lun", "Mar", "Mie", "Jue", "Vie"]
         return dates, performance
 
     def get_asset_distribution(self):
-        # Datos ficticios para prototipo
+        groups = self.portfolio.group_by('type')
+        if groups:
+            asset_types = [t for t in AssetType if t in groups]
+            labels = [TYPE_LABELS[t] for t in asset_types]
+            sizes = [round(groups[t]['weight'] * 100, 1) for t in asset_types]
+            colors = [CHART_COLORS[i % len(CHART_COLORS)] for i in range(len(labels))]
+            return labels, sizes, colors
+        # Datos ficticios para prototipo (portafolio vacío)
         labels = ['Acciones', 'Bonos', 'Efectivo', 'Criptomonedas']
         sizes = [40, 30, 20, 10]
         colors = ['#ff69b4', '#00ffcc', '#ff9800', '#4caf50']
         return labels, sizes, colors
 
     def get_asset_composition(self):
-        # Datos ficticios de composición
+        groups = self.portfolio.group_by('category')
+        if groups:
+            ordered = sorted(groups.items(), key=lambda item: item[1]['sum'], reverse=True)
+            categories = [category or 'Sin categoría' for category, _ in ordered]
+            values = [round(group['sum'], 2) for _, group in ordered]
+            colors = [CHART_COLORS[i % len(CHART_COLORS)] for i in range(len(categories))]
+            return categories, values, colors
+        # Datos ficticios de composición (portafolio vacío)
         categories = ['Dinero Liquido', 'Conservadores', 'Medios', 'Arriesgados', 'Ultra Arriesgados']
         values = [10000, 30000, 20000, 25000, 15000]  # Valores en dólares
         colors = ['#00ffcc', '#4caf50', '#ff9800', '#ff69b4', '#ff4444']
         return categories, values, colors
+
+    def get_risk_metrics(self):
+        metrics = self.portfolio.risk_metrics() if self.portfolio.transactions else {}
+        labels, values = [], []
+        for key, (label, fmt) in RISK_LABELS.items():
+            value = metrics.get(key)
+            labels.append(label)
+            # Sin historial suficiente no hay métrica que mostrar
+            values.append('—' if value is None or value != value else fmt.format(value))
+        return labels, values
+
+    def get_correlation_matrix(self):
+        if not self.portfolio.transactions:
+            return [], None
+        tracker = self.portfolio.covariance()
+        if tracker.count < 2:
+            return [], None
+        symbols = dict(zip(self.portfolio.holdings.text_column('id'), self.portfolio.holdings.text_column('symbol')))
+        labels = [symbols.get(asset_id, asset_id) for asset_id in tracker.asset_ids]
+        return labels, tracker.correlation()
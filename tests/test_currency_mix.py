@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from Entidades.models import Asset, AssetType
+from dashboard.Portfolio import Portfolio
+
+
+def mixed_portfolio() -> Portfolio:
+    portfolio = Portfolio()
+    portfolio.fx.add_rate('ARS', 1000.0)
+    portfolio.add_asset(Asset(id='usd', symbol='AAPL', name='Apple', type=AssetType.STOCK, purchase_price=100.0,
+                              quantity=10.0, current_price=100.0, currency='USD'))
+    portfolio.add_asset(Asset(id='ars', symbol='GGAL', name='Galicia', type=AssetType.STOCK, purchase_price=50_000.0,
+                              quantity=20.0, current_price=50_000.0, currency='ARS'))
+    portfolio.add_asset(Asset(id='bond', symbol='AL30', name='Bonar', type=AssetType.BOND, purchase_price=60_000.0,
+                              quantity=10.0, current_price=50_000.0, currency='ARS'))
+    return portfolio
+
+
+def test_diversification_is_in_base_currency():
+    diversification = mixed_portfolio()._calculate_diversification()
+    assert diversification['STOCK'] == {'count': 2, 'total_value': 2000.0}
+    assert diversification['BOND'] == {'count': 1, 'total_value': 500.0}
+
+
+def test_group_by_converts_amounts_but_not_quantities():
+    portfolio = mixed_portfolio()
+    by_type = portfolio.group_by('type')
+    assert by_type[AssetType.STOCK]['sum'] == pytest.approx(2000.0)
+    assert by_type[AssetType.BOND]['weight'] == pytest.approx(0.2)
+    assert portfolio.group_by('type', 'unrealized_gain_loss')[AssetType.BOND]['sum'] == pytest.approx(-100.0)
+    assert portfolio.group_by('type', 'quantity')[AssetType.STOCK]['sum'] == 30.0
+    assert portfolio.group_by('currency', currency='ARS')['USD']['sum'] == pytest.approx(1_000_000.0)
+
+
+def test_rebalance_weights_in_base_currency():
+    plan = mixed_portfolio().rebalance({'usd': 0.5, 'ars': 0.3, 'bond': 0.2})
+    assert plan.weights_before == pytest.approx({'usd': 0.4, 'ars': 0.4, 'bond': 0.2})
+    trades = {trade.asset_id: trade for trade in plan.trades}
+    assert set(trades) == {'usd', 'ars'}
+    assert trades['usd'].quantity == pytest.approx(2.5)
+    assert trades['ars'].quantity == pytest.approx(5.0)
+    assert trades['ars'].price == 50_000.0
+    assert plan.cash_after == pytest.approx(0.0)
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+import random
+
+import numpy as np
+import pytest
+
+from Entidades.holdings import HoldingsTable
+from Entidades.models import Asset, AssetType
+
+
+def make_asset(code: int) -> Asset:
+    return Asset(symbol=f"SYM{code % 7}", name=f"Activo {code}", type=list(AssetType)[code % len(AssetType)],
+                 category=['Acciones', 'Renta fija', None][code % 3], purchase_price=10.0 + code % 5,
+                 quantity=1.0 + code % 4, current_price=12.0 + code % 3, currency=['USD', 'ARS'][code % 2],
+                 exchange=['NYSE', 'BYMA', None][code % 3])
+
+
+def test_append_and_remove_keep_totals_consistent():
+    table = HoldingsTable(make_asset(code) for code in range(50))
+    assert table.check_consistency() == []
+    for asset_id in list(table.text_column('id'))[::3]:
+        table.remove_row(table.row_of(asset_id))
+        assert table.check_consistency() == []
+    assert len(table) == 33
+
+
+def test_set_value_updates_every_dimension():
+    table = HoldingsTable(make_asset(code) for code in range(20))
+    view = table[4]
+    view.quantity = 100.0
+    view.current_price = 3.5
+    view.purchase_price = 1.0
+    view.type = AssetType.BOND
+    view.category = 'Nueva'
+    view.currency = 'EUR'
+    view.exchange = 'LSE'
+    view.symbol = 'OTRO'
+    assert table.check_consistency() == []
+    assert table.totals('currency')['EUR'] == {'count': 1, 'total_value': 350.0}
+    assert table.rows_of_symbol('OTRO') == [4]
+
+
+def test_set_prices_marks_dirty_and_keeps_totals():
+    table = HoldingsTable(make_asset(code) for code in range(30))
+    version = table.version
+    rows = np.array([0, 5, 9, 12])
+    prices = np.array([table[0].current_price, 50.0, 60.0, 70.0])
+    changed = table.set_prices(rows, prices)
+    assert changed.tolist() == [5, 9, 12]
+    assert table.dirty_rows().tolist() == [5, 9, 12]
+    assert table.version == version + 1
+    assert table.check_consistency() == []
+    table.clear_dirty()
+    assert len(table.dirty_rows()) == 0
+
+
+def test_random_sequence_of_changes():
+    rng = random.Random(0)
+    table = HoldingsTable()
+    code = 0
+    for _ in range(500):
+        action = rng.random()
+        if action < 0.4 or not len(table):
+            table.append(make_asset(code))
+            code += 1
+        elif action < 0.6:
+            table.remove_row(rng.randrange(len(table)))
+        elif action < 0.8:
+            view = table[rng.randrange(len(table))]
+            setattr(view, rng.choice(['quantity', 'current_price', 'purchase_price']), rng.uniform(0, 100))
+            view.currency = rng.choice(['USD', 'ARS', 'EUR'])
+        else:
+            rows = np.array(rng.sample(range(len(table)), min(5, len(table))))
+            table.set_prices(rows, np.array([rng.uniform(1, 100) for _ in rows]))
+        assert table.check_consistency() == []
+
+
+
+def test_invalid_value_leaves_totals_untouched():
+    table = HoldingsTable(make_asset(code) for code in range(10))
+    version = table.version
+    for field, value in (('type', 'bogus'), ('quantity', 'mucho'), ('current_price', None), ('nada', 1.0)):
+        with pytest.raises((ValueError, TypeError)):
+            table.set_value(0, field, value)
+        assert table.check_consistency() == []
+    assert table.version == version
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+
+import pytest
+
+import Datos.journal as journal_module
+from Datos.journal import PortfolioJournal
+from Datos.repository import PortfolioRepository
+from Entidades.models import Asset, AssetType
+from dashboard.Portfolio import Portfolio
+
+
+def make_asset(code: int) -> Asset:
+    return Asset(id=f"id{code}", symbol=f"SYM{code}", name=f"Activo {code}", type=AssetType.STOCK,
+                 quantity=1.0, current_price=10.0)
+
+
+def write_file(path, codes):
+    path.write_text(json.dumps([{'id': f"id{code}", 'symbol': f"SYM{code}", 'name': f"Activo {code}",
+                                 'type': 'STOCK', 'quantity': 1.0, 'current_price': 10.0} for code in codes]))
+
+
+def replayed_ids(directory) -> list:
+    with PortfolioJournal(directory) as journal:
+        portfolio = Portfolio()
+        journal.replay(portfolio)
+    return sorted(portfolio.holdings.text_column('id'))
+
+
+def test_failed_rotation_keeps_the_writer_alive(tmp_path, monkeypatch):
+    replace = os.replace
+    calls = []
+
+    def failing_replace(source, target):
+        calls.append(target)
+        if len(calls) == 1:
+            raise OSError("disco lleno")
+        replace(source, target)
+
+    monkeypatch.setattr(journal_module.os, 'replace', failing_replace)
+    with PortfolioJournal(str(tmp_path), compact_bytes=1) as journal:
+        journal.add_asset(make_asset(0))
+        journal.add_asset(make_asset(1))
+        journal.sync()
+        assert isinstance(journal.error, OSError)
+    assert replayed_ids(str(tmp_path)) == ['id0', 'id1']
+
+
+def test_failed_compaction_is_retried(tmp_path, monkeypatch):
+    write_snapshot = journal_module.write_snapshot
+
+    def failing_write(*args, **kwargs):
+        raise OSError("disco lleno")
+
+    with PortfolioJournal(str(tmp_path), compact_bytes=1 << 30) as journal:
+        journal.add_asset(make_asset(0))
+        monkeypatch.setattr(journal_module, 'write_snapshot', failing_write)
+        with pytest.raises(OSError):
+            journal.compact()
+        assert os.path.exists(tmp_path / 'journal.sealed.jsonl')
+        journal.add_asset(make_asset(1))
+        monkeypatch.setattr(journal_module, 'write_snapshot', write_snapshot)
+        journal.compact()
+        assert not os.path.exists(tmp_path / 'journal.sealed.jsonl')
+        assert journal.stats['compactions'] == 2
+    assert os.path.getsize(tmp_path / 'journal.jsonl') == 0
+    assert replayed_ids(str(tmp_path)) == ['id0', 'id1']
+
+
+def test_changed_file_replaces_imported_assets(tmp_path):
+    path = tmp_path / 'portfolio.json'
+    journal_dir = str(tmp_path / 'journal')
+    write_file(path, [0, 1])
+    repository = PortfolioRepository(str(path), price_store_root=None, journal_dir=journal_dir)
+    repository.load()
+    repository.add_asset(make_asset(9))
+    assert not repository.is_stale()
+
+    write_file(path, [1, 2, 3])
+    assert repository.is_stale()
+    assert repository.refresh()
+    assert sorted(repository.portfolio.holdings.text_column('id')) == ['id1', 'id2', 'id3', 'id9']
+    repository.journal.compact()
+    repository.close()
+
+    write_file(path, [4])
+    reopened = PortfolioRepository(str(path), price_store_root=None, journal_dir=journal_dir)
+    try:
+        reopened.load()
+        assert sorted(reopened.portfolio.holdings.text_column('id')) == ['id4', 'id9']
+        assert not reopened.is_stale()
+    finally:
+        reopened.close()
+
+
+def test_update_asset_is_journaled(tmp_path):
+    path = tmp_path / 'portfolio.json'
+    journal_dir = str(tmp_path / 'journal')
+    write_file(path, [0, 1])
+    repository = PortfolioRepository(str(path), price_store_root=None, journal_dir=journal_dir)
+    repository.load()
+    notified = []
+    repository.subscribe(notified.append)
+    repository.update_asset('id1', quantity=4.0, type=AssetType.BOND, category='Renta fija')
+    assert notified == [['id1']]
+    with pytest.raises(ValueError):
+        repository.update_asset('id1', quantity=5.0, currency=None, type='x')
+    with pytest.raises(ValueError):
+        repository.update_asset('id1', id='otro')
+    assert repository.portfolio.find_asset('id1').quantity == 4.0
+    assert repository.portfolio.holdings.check_consistency() == []
+    repository.close()
+
+    for compacted in (False, True):
+        reopened = PortfolioRepository(str(path), price_store_root=None, journal_dir=journal_dir)
+        try:
+            reopened.load()
+            asset = reopened.portfolio.find_asset('id1')
+            assert (asset.quantity, asset.type, asset.category) == (4.0, AssetType.BOND, 'Renta fija')
+            if not compacted:
+                reopened.journal.compact()
+        finally:
+            reopened.close()
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from Analisis.ledger import TransactionLedger, cash_flows, external_flows, quantity_deltas
+from Entidades.models import Transaction, TransactionType
+
+BUY, SELL, DIVIDEND, TRANSFER = (kind.value for kind in TransactionType)
+
+
+def random_transactions(count: int, seed: int) -> list:
+    rng = np.random.default_rng(seed)
+    kinds = list(TransactionType)
+    start = datetime(2020, 1, 1)
+    transactions = []
+    for _ in range(count):
+        kind = kinds[int(rng.integers(len(kinds)))]
+        quantity = float(rng.integers(1, 20))
+        if kind is TransactionType.TRANSFER and rng.random() < 0.5:
+            quantity = -quantity
+        transactions.append(Transaction(asset_id=f"id{int(rng.integers(5))}", type=kind,
+                                        date=start + timedelta(days=int(rng.integers(1000))),
+                                        price=float(rng.uniform(1.0, 100.0)), quantity=quantity,
+                                        fees=float(rng.uniform(0.0, 2.0))))
+    return transactions
+
+
+def test_checkpointed_replay_matches_full_replay():
+    transactions = random_transactions(400, seed=3)
+    ledger = TransactionLedger(checkpoint_interval=16)
+    batches = []
+    for start in range(0, len(transactions), 37):
+        # Cada lote trae fechas desordenadas respecto de lo ya cargado
+        batches.append(transactions[start:start + 37] + [transactions[start]])
+        ledger.extend(batches[-1])
+        full = TransactionLedger(checkpoint_interval=10 ** 9)
+        for batch in batches:
+            full.extend(batch)
+        expected, actual = full.state(), ledger.state()
+        assert actual.row == expected.row == len(full)
+        assert actual.quantity == pytest.approx(expected.quantity)
+        assert actual.cost_basis == pytest.approx(expected.cost_basis)
+        assert actual.cash == pytest.approx(expected.cash)
+    assert len(ledger._checkpoints) > 1
+
+
+def test_quantity_deltas_by_type():
+    types = np.array([BUY, SELL, SELL, DIVIDEND, TRANSFER, TRANSFER])
+    quantities = np.array([3.0, 2.0, -2.0, 5.0, 4.0, -4.0])
+    assert quantity_deltas(types, quantities).tolist() == [3.0, -2.0, -2.0, 0.0, 4.0, -4.0]
+
+
+def test_flow_signs_by_type():
+    types = np.array([BUY, SELL, DIVIDEND, TRANSFER, TRANSFER])
+    prices = np.array([10.0, 10.0, 0.5, 10.0, 10.0])
+    quantities = np.array([2.0, 2.0, 4.0, 3.0, -3.0])
+    fees = np.array([1.0, 1.0, 0.25, 0.5, 0.5])
+    assert cash_flows(types, prices, quantities, fees).tolist() == [-21.0, 19.0, 1.75, -0.5, -0.5]
+    assert external_flows(types, prices, quantities, fees).tolist() == [-21.0, 19.0, 1.75, -30.5, 29.5]
+
+
+def test_cash_follows_cash_flows():
+    transactions = random_transactions(50, seed=5)
+    ledger = TransactionLedger()
+    ledger.extend(transactions)
+    expected = cash_flows(ledger.column('type_code'), ledger.column('price'), ledger.column('quantity'),
+                          ledger.column('fees')).sum()
+    assert ledger.cash == pytest.approx(expected)
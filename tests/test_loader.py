@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+import json
+
+import pytest
+
+from Datos.loader import asset_from_record, asset_to_record, iter_asset_batches, iter_records
+from Entidades.models import Asset, AssetType
+
+CHUNK_SIZES = [1, 2, 3, 7, 64, 1 << 16]
+
+RECORDS = [
+    {'id': 'a', 'name': 'Coma, corchete ] y llave }', 'nested': {'list': [1, [2, 3], {'x': None}]}},
+    {'id': 'b', 'name': 'Comillas \" y barra \\\\', 'unicode': 'Año ñandú €', 'flags': [True, False, None]},
+    {'id': 'c', 'numbers': [0, -12345678, 3.25, -1.5e-7, 6.02e23]},
+    12345678901234,
+    -0.125,
+    'texto',
+    [],
+    {},
+]
+
+
+def write(tmp_path, text: str, encoding: str = 'utf-8'):
+    path = tmp_path / 'data.json'
+    path.write_text(text, encoding=encoding)
+    return str(path)
+
+
+@pytest.mark.parametrize('chunk_size', CHUNK_SIZES)
+@pytest.mark.parametrize('indent', [None, 2])
+def test_round_trip_matches_json_load(tmp_path, chunk_size, indent):
+    path = write(tmp_path, json.dumps(RECORDS, indent=indent, ensure_ascii=False))
+    with open(path, encoding='utf-8') as file:
+        expected = json.load(file)
+    assert list(iter_records(path, chunk_size)) == expected
+
+
+@pytest.mark.parametrize('chunk_size', CHUNK_SIZES)
+def test_whitespace_bom_and_separators(tmp_path, chunk_size):
+    path = write(tmp_path, ' \n [ \t{"a": 1}\r\n ,\n\n  {"b": [2 , 3]} ,7 ,  8.5\n]\n\t ', encoding='utf-8-sig')
+    assert list(iter_records(path, chunk_size)) == [{'a': 1}, {'b': [2, 3]}, 7, 8.5]
+    assert list(iter_records(write(tmp_path, '[ ]'), chunk_size)) == []
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 5])
+def test_numbers_split_across_buffers_are_not_cut(tmp_path, chunk_size):
+    path = write(tmp_path, '[123456789,-98765.4321e-2,1]')
+    assert list(iter_records(path, chunk_size)) == [123456789, -98765.4321e-2, 1]
+
+
+@pytest.mark.parametrize('chunk_size', [1, 4, 64])
+@pytest.mark.parametrize('text', [
+    '{"a": 1}',
+    '[{"a": 1}',
+    '[{"a": 1},',
+    '[{"a": ',
+    '[1, 2',
+    '[1 2]',
+    '[{"a": 1} {"b": 2}]',
+    '[,1]',
+    '[1,,2]',
+    '[1,]',
+    '[1] 2',
+    '[1, {"a": tru}]',
+    '[1, "sin cerrar]',
+])
+def test_truncated_or_malformed_input_raises(tmp_path, chunk_size, text):
+    with pytest.raises(ValueError):
+        list(iter_records(write(tmp_path, text), chunk_size))
+
+
+def test_progress_reaches_the_file_size(tmp_path):
+    path = write(tmp_path, json.dumps(RECORDS))
+    calls = []
+    list(iter_records(path, 16, progress=lambda read, total: calls.append((read, total))))
+    total = calls[-1][1]
+    assert calls[-1] == (total, total)
+    assert [read for read, _ in calls] == sorted(read for read, _ in calls)
+
+
+def test_asset_batches_round_trip(tmp_path):
+    assets = [Asset(id=f"id{code}", symbol=f"SYM{code}", name=f"Activo {code}", type=list(AssetType)[code % 6],
+                    quantity=code + 0.5, current_price=10.0 + code, category=None if code % 2 else 'A')
+              for code in range(23)]
+    path = write(tmp_path, json.dumps([asset_to_record(asset) for asset in assets]))
+    batches = list(iter_asset_batches(path, batch_size=5))
+    assert [len(batch) for batch in batches] == [5, 5, 5, 5, 3]
+    assert [asset for batch in batches for asset in batch] == assets
+    assert asset_from_record(asset_to_record(assets[3])) == assets[3]
+    assert list(iter_asset_batches(str(tmp_path / 'no_existe.json'))) == []
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime
+
+import pytest
+
+from Analisis.ledger import TransactionLedger
+from Analisis.lots import LotMethod, match_lots
+from Entidades.models import Transaction, TransactionType
+
+
+def ledger_of(*rows) -> TransactionLedger:
+    ledger = TransactionLedger()
+    ledger.extend(Transaction(asset_id='A', type=kind, date=datetime(2024, 1, day), price=price,
+                              quantity=quantity, fees=fees) for day, kind, price, quantity, fees in rows)
+    return ledger
+
+
+def test_zero_quantity_sell_books_its_fee():
+    ledger = ledger_of((1, TransactionType.BUY, 10.0, 5.0, 0.0), (2, TransactionType.SELL, 12.0, 0.0, 1.0))
+    report = match_lots(ledger, LotMethod.FIFO)
+    assert report.realized['quantity'].tolist() == [0.0]
+    assert report.realized['gain'].tolist() == [-1.0]
+    assert report.open_lots['quantity'].tolist() == [5.0]
+
+
+def test_transfer_fees_are_not_dropped():
+    ledger = ledger_of((1, TransactionType.TRANSFER, 10.0, 4.0, 2.0), (2, TransactionType.TRANSFER, 11.0, -1.0, 0.5),
+                       (3, TransactionType.SELL, 12.0, 3.0, 0.0))
+    report = match_lots(ledger, LotMethod.FIFO)
+    assert report.open_lots['quantity'].tolist() == []
+    assert report.realized['quantity'].tolist() == [3.0, 0.0]
+    assert report.realized['cost'].tolist() == pytest.approx([3.0 * 10.5, 0.5])
+    summary = report.by_asset()['A']
+    assert summary['realized'] == pytest.approx(3.0 * 12.0 - 3.0 * 10.5 - 0.5)
+    assert report.by_year()[2024]['cost'] == pytest.approx(3.0 * 10.5 + 0.5)
+
+
+def test_partial_fill_keeps_the_whole_sell_fee():
+    ledger = ledger_of((1, TransactionType.BUY, 10.0, 2.0, 0.0), (2, TransactionType.SELL, 12.0, 4.0, 4.0))
+    report = match_lots(ledger, LotMethod.FIFO)
+    assert report.realized['quantity'].tolist() == [2.0]
+    assert report.realized['proceeds'].sum() == pytest.approx(2.0 * 12.0 - 4.0)
+
+
+def test_fee_is_spread_over_matched_lots():
+    ledger = ledger_of((1, TransactionType.BUY, 10.0, 1.0, 0.0), (2, TransactionType.BUY, 11.0, 3.0, 0.0),
+                       (3, TransactionType.SELL, 12.0, 4.0, 2.0))
+    report = match_lots(ledger, LotMethod.FIFO)
+    assert report.realized['proceeds'].tolist() == pytest.approx([12.0 - 0.5, 36.0 - 1.5])
@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+
+from Analisis.montecarlo import simulate, step_returns
+
+
+def test_step_returns_uses_non_overlapping_blocks():
+    daily = np.full(95, 0.01)
+    daily[:5] = np.nan
+    monthly = step_returns(daily, 30)
+    assert len(monthly) == 3
+    assert monthly == pytest.approx(np.full(3, 1.01 ** 30 - 1))
+
+
+def test_step_returns_keeps_the_most_recent_blocks():
+    daily = np.concatenate((np.full(10, 0.5), np.zeros(30), np.full(30, 0.01)))
+    assert step_returns(daily, 30) == pytest.approx([0.0, 1.01 ** 30 - 1])
+    assert len(step_returns(daily[:29], 30)) == 0
+
+
+def test_simulate_with_bootstrap_history_is_reproducible():
+    history = np.array([-0.02, 0.01, 0.03])
+    first = simulate(1000.0, 12, paths=2_000, contribution=10.0, history=history, seed=3, workers=1)
+    second = simulate(1000.0, 12, paths=2_000, contribution=10.0, history=history, seed=3, workers=1)
+    assert np.array_equal(first.percentile(50), second.percentile(50))
+    assert first.percentile(5)[-1] <= first.percentile(50)[-1] <= first.percentile(95)[-1]
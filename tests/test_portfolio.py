@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from Entidades.models import Asset, AssetType, Transaction, TransactionType
+from dashboard.Portfolio import Portfolio
+
+
+def make_asset(code: int) -> Asset:
+    return Asset(id=f"id{code}", symbol=f"SYM{code}", name=f"Activo {code}", type=AssetType.STOCK,
+                 quantity=1.0 + code, current_price=10.0)
+
+
+def test_assets_init_argument_is_kept():
+    portfolio = Portfolio('p1', 'Mi cartera', [make_asset(0), make_asset(1)])
+    assert [asset.id for asset in portfolio.assets] == ['id0', 'id1']
+    assert portfolio.total_value == 30.0
+    assert Portfolio(assets=[make_asset(2)]).holdings.text_column('id') == ['id2']
+    assert len(Portfolio().assets) == 0
+
+
+def test_assigning_assets_replaces_the_holdings():
+    portfolio = Portfolio(assets=[make_asset(0), make_asset(1)])
+    portfolio.assets = [make_asset(2)]
+    assert portfolio.holdings.text_column('id') == ['id2']
+    portfolio.assets = portfolio.assets
+    assert portfolio.holdings.text_column('id') == ['id2']
+    assert portfolio.holdings.check_consistency() == []
+
+
+def test_split_does_not_change_the_valuation():
+    portfolio = Portfolio(assets=[Asset(id='a', symbol='AAA', quantity=20.0, current_price=50.0)])
+    portfolio.add_transactions([
+        Transaction(asset_id='a', date=datetime(2024, 1, 2), price=100.0, quantity=10.0),
+        Transaction(asset_id='a', type=TransactionType.SELL, date=datetime(2024, 1, 15), price=50.0, quantity=4.0),
+        Transaction(asset_id='a', date=datetime(2024, 1, 16), price=50.0, quantity=4.0),
+    ])
+    portfolio.corporate_actions.add_split('AAA', '2024-01-10', 2.0)
+    dates = np.arange(np.datetime64('2024-01-02'), np.datetime64('2024-01-21'))
+    _, values = portfolio.valuation(dates)
+    sold = dates == np.datetime64('2024-01-15')
+    assert values[~sold] == pytest.approx(np.full((~sold).sum(), 1000.0))
+    assert values[sold] == pytest.approx([800.0])
+    assert portfolio.held_quantities() == {'a': 20.0}
+    assert portfolio.time_weighted_return() == pytest.approx(0.0, abs=1e-12)
+    assert portfolio.money_weighted_returns()['a'] == pytest.approx(0.0, abs=1e-9)
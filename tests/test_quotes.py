@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import json
+
+from Datos.repository import PortfolioRepository
+from Entidades.models import Asset
+from Mercado.cache import QuoteCache
+from Mercado.quotes import QuoteIngestionService, QuoteProvider
+from Mercado.standin import StandInQuoteServer, standin_price
+from dashboard.Portfolio import Portfolio
+
+
+def run_with_server(action, **server_options):
+    """Corre action(service, server) con un proveedor local levantado."""
+    async def run():
+        async with StandInQuoteServer(**server_options) as server:
+            provider = QuoteProvider('local', server.host, server.port, batch_size=2, max_concurrency=2)
+            service = QuoteIngestionService(provider, retries=0)
+            return await action(service, server), service
+    return asyncio.run(run())
+
+
+def test_fetch_reuses_pooled_connections():
+    symbols = [f"SYM{code}" for code in range(7)]
+
+    async def action(service, server):
+        return await service.fetch(symbols), server.requests, server.connections
+
+    (quotes, requests, connections), service = run_with_server(action)
+    assert quotes == {symbol: standin_price(symbol) for symbol in symbols}
+    assert requests == 4
+    assert connections <= 2
+    assert service.stats == {'requests': 4, 'symbols': 7, 'errors': 0}
+
+
+def test_malformed_batch_counts_as_failed():
+    async def action(service, server):
+        return await service.fetch(['BAD', 'NEG', 'OK1', 'OK2'])
+
+    quotes, service = run_with_server(action, prices={'BAD': 'x', 'NEG': -1.0})
+    assert quotes == {'OK1': standin_price('OK1'), 'OK2': standin_price('OK2')}
+    assert service.stats['errors'] == 1
+
+
+def test_refresh_updates_prices_through_the_portfolio():
+    portfolio = Portfolio()
+    for symbol in ('AAA', 'BBB', 'AAA'):
+        portfolio.add_asset(Asset(symbol=symbol, quantity=1.0, current_price=1.0))
+    notifications = []
+    portfolio.subscribe(notifications.append)
+
+    async def action(service, server):
+        return await service.refresh_async(portfolio)
+
+    changed, _ = run_with_server(action)
+    assert len(changed) == 3
+    assert notifications == [changed]
+    assert portfolio.holdings.column('current_price').tolist() == [standin_price('AAA'), standin_price('BBB'),
+                                                                   standin_price('AAA')]
+
+
+def test_repository_refresh_is_journaled(tmp_path):
+    path = tmp_path / 'portfolio.json'
+    path.write_text(json.dumps([{'id': 'a', 'symbol': 'AAA', 'name': 'A', 'type': 'STOCK',
+                                     'quantity': 1.0, 'current_price': 1.0}]))
+    repository = PortfolioRepository(str(path), price_store_root=None, journal_dir=str(tmp_path / 'journal'))
+    repository.load()
+    notifications = []
+    repository.subscribe(notifications.append)
+
+    async def action(service, server):
+        return await service.refresh_async(repository)
+
+    changed, _ = run_with_server(action)
+    assert changed == ['a'] and ['a'] in notifications
+    repository.close()
+
+    reopened = PortfolioRepository(str(path), price_store_root=None, journal_dir=str(tmp_path / 'journal'))
+    try:
+        reopened.load()
+        assert reopened.portfolio.holdings.column('current_price').tolist() == [standin_price('AAA')]
+    finally:
+        reopened.close()
+
+
+def test_collect_with_cache_only_requests_expired_symbols():
+    symbols = ['AAA', 'BBB', 'CCC']
+
+    async def action(service, server):
+        service.cache = QuoteCache()
+        first = await asyncio.to_thread(service.collect, symbols)
+        requests = server.requests
+        second = await asyncio.to_thread(service.collect, symbols)
+        return first, second, requests, server.requests, service.cache
+
+    (first, second, before, after, cache), _ = run_with_server(action)
+    assert first == second == {symbol: standin_price(symbol) for symbol in symbols}
+    assert before == after == 2
+    assert len(cache) == 3 and cache.stats['hits'] == 3
+
+
+def test_fetch_decodes_chunked_responses():
+    symbols = [f"SYM{code}" for code in range(5)]
+
+    async def action(service, server):
+        return await service.fetch(symbols), server.connections
+
+    (quotes, connections), service = run_with_server(action, chunked=True)
+    assert quotes == {symbol: standin_price(symbol) for symbol in symbols}
+    assert connections <= 2
+    assert service.stats['errors'] == 0
+
+
+def test_invalid_chunk_fails_the_batch():
+    async def run():
+        async def handle(reader, writer):
+            await reader.readuntil(b'\r\n\r\n')
+            writer.write(b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\nzz\r\n{}\r\n0\r\n\r\n")
+            await writer.drain()
+            writer.close()
+
+        server = await asyncio.start_server(handle, '127.0.0.1', 0)
+        async with server:
+            port = server.sockets[0].getsockname()[1]
+            service = QuoteIngestionService(QuoteProvider('local', '127.0.0.1', port), retries=0)
+            return await service.fetch(['AAA']), service
+    quotes, service = asyncio.run(run())
+    assert quotes == {}
+    assert service.stats['errors'] == 1
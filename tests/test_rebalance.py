@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+
+from Analisis.rebalance import rebalance
+from Entidades.holdings import HoldingsTable
+from Entidades.models import Asset, PortfolioCategory, TransactionType
+
+
+def make_holdings(quantities, prices) -> HoldingsTable:
+    return HoldingsTable(Asset(id=f"id{code}", symbol=f"SYM{code}", quantity=quantity, current_price=price)
+                         for code, (quantity, price) in enumerate(zip(quantities, prices)))
+
+
+def random_case(seed: int):
+    rng = np.random.default_rng(seed)
+    count = int(rng.integers(2, 12))
+    holdings = make_holdings(rng.uniform(0.0, 50.0, count).round(1), rng.uniform(1.0, 200.0, count))
+    targets = dict(zip(holdings.text_column('id'), (rng.dirichlet(np.ones(count)) * rng.uniform(0.5, 1.0)).tolist()))
+    return holdings, targets, float(rng.uniform(0.0, 500.0))
+
+
+@pytest.mark.parametrize('seed', range(25))
+def test_trades_respect_cash_holdings_and_lots(seed):
+    holdings, targets, cash = random_case(seed)
+    lot = [0.0, 1.0, 5.0][seed % 3]
+    plan = rebalance(holdings, targets, cash=cash, lot_sizes=lot, fee_rate=0.01, fixed_fee=2.0)
+    assert plan.cash_after >= -1e-9
+    spent = sum(t.value + t.fees if t.type is TransactionType.BUY else t.fees - t.value for t in plan.trades)
+    assert plan.cash_after == pytest.approx(cash - spent)
+    for trade in plan.trades:
+        if trade.type is TransactionType.SELL:
+            row = holdings.row_of(trade.asset_id)
+            assert trade.quantity <= holdings.get_value(row, 'quantity') + 1e-12
+        if lot:
+            assert trade.quantity / lot == pytest.approx(round(trade.quantity / lot))
+
+
+def test_buys_are_scaled_down_to_the_available_cash():
+    holdings = make_holdings([10.0, 0.0, 0.0], [10.0, 10.0, 20.0])
+    plan = rebalance(holdings, {'id0': 0.0, 'id1': 0.5, 'id2': 0.5}, cash=0.0, lot_sizes=1.0,
+                     fee_rate=0.05, fixed_fee=1.0)
+    trades = {trade.asset_id: trade for trade in plan.trades}
+    assert trades['id0'].type is TransactionType.SELL and trades['id0'].quantity == 10.0
+    # Al lote compraría 5 y 2; con las comisiones no alcanza y se achican las dos compras
+    assert trades['id1'].quantity < 5.0 and trades['id2'].quantity < 2.0
+    assert plan.cash_after >= 0.0
+
+
+def test_sells_are_capped_at_the_holding():
+    holdings = make_holdings([2.5, 1.0], [10.0, 10.0])
+    plan = rebalance(holdings, {'id0': 0.0}, lot_sizes=1.0)
+    assert [(trade.asset_id, trade.type, trade.quantity) for trade in plan.trades] == \
+        [('id0', TransactionType.SELL, 2.0)]
+
+
+def test_tolerance_skips_small_deviations():
+    holdings = make_holdings([49.0, 51.0], [1.0, 1.0])
+    assert rebalance(holdings, {'id0': 0.5, 'id1': 0.5}, tolerance=0.02).trades == []
+    plan = rebalance(holdings, {'id0': 0.5, 'id1': 0.5}, tolerance=0.005)
+    assert {trade.asset_id: trade.quantity for trade in plan.trades} == pytest.approx({'id0': 1.0, 'id1': 1.0})
+
+
+def test_category_targets_keep_the_mix_inside_each_category():
+    holdings = make_holdings([10.0, 30.0, 60.0], [1.0, 1.0, 1.0])
+    categories = [PortfolioCategory(name='renta variable', assets=['id0', 'id1']),
+                  PortfolioCategory(name='renta fija', assets=['id2'])]
+    plan = rebalance(holdings, {'renta variable': 0.6, 'renta fija': 0.4}, categories)
+    assert plan.targets == pytest.approx({'id0': 0.15, 'id1': 0.45, 'id2': 0.4})
+    assert plan.weights_after == pytest.approx(plan.targets)
+    with pytest.raises(ValueError):
+        rebalance(holdings, {'renta variable': 0.5, 'otra': 0.5}, categories)
+    with pytest.raises(ValueError):
+        rebalance(holdings, {'a': 0.5, 'b': 0.5}, [PortfolioCategory(name='a', assets=['id0']),
+                                                   PortfolioCategory(name='b', assets=['id0', 'id1'])])
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+import json
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from Datos.repository import PortfolioRepository
+from Entidades.models import Transaction
+
+
+def make_repository(tmp_path) -> PortfolioRepository:
+    path = tmp_path / 'portfolio.json'
+    path.write_text(json.dumps([
+        {'id': 'a', 'symbol': 'AAA', 'name': 'A', 'type': 'STOCK', 'quantity': 2.0,
+         'purchase_price': 5.0, 'current_price': 10.0},
+        {'id': 'b', 'symbol': 'BBB', 'name': 'B', 'type': 'STOCK', 'quantity': 1.0,
+         'purchase_price': 5.0, 'current_price': 20.0},
+    ]))
+    repository = PortfolioRepository(str(path), price_store_root=None)
+    repository.load()
+    repository.portfolio.add_transaction(Transaction(asset_id='a', date=datetime(2024, 1, 1), price=5.0,
+                                                     quantity=2.0))
+    return repository
+
+
+def test_view_reads_live_data(tmp_path):
+    repository = make_repository(tmp_path)
+    view = repository.view()
+    assert len(view.assets) == 2
+    assert view.holdings.text_column('id') == ('a', 'b')
+    assert view.find_asset('b').current_price == 20.0
+    assert len(view.transactions) == 1
+    repository.portfolio.find_asset('a').current_price = 11.0
+    assert view.find_asset('a').current_price == 11.0
+    assert view.total_value == repository.portfolio.total_value
+
+
+def test_writes_through_the_view_raise(tmp_path):
+    repository = make_repository(tmp_path)
+    view = repository.view()
+    with pytest.raises(TypeError):
+        view.holdings.set_value(0, 'quantity', 0.0)
+    with pytest.raises(TypeError):
+        view.holdings.set_prices(np.array([0]), np.array([1.0]))
+    with pytest.raises(TypeError):
+        view.assets[0].quantity = 0.0
+    with pytest.raises(TypeError):
+        next(iter(view.assets)).current_price = 0.0
+    with pytest.raises(TypeError):
+        view.find_asset('a').quantity = 0.0
+    with pytest.raises(ValueError):
+        view.holdings.column('quantity')[0] = 0.0
+    with pytest.raises(AttributeError):
+        view.transactions.append(Transaction(asset_id='a', date=datetime(2024, 1, 2), price=1.0, quantity=1.0))
+    with pytest.raises(TypeError):
+        view.ledger.extend([])
+    assert repository.portfolio.holdings.column('quantity').tolist() == [2.0, 1.0]
+    assert len(repository.portfolio.transactions) == 1
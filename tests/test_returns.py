@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+from datetime import date, datetime
+
+import numpy as np
+import pytest
+
+from Analisis.ledger import TransactionLedger
+from Analisis.returns import money_weighted_returns, time_weighted_return, xirr, xirr_batch
+from Analisis.valuation import flow_series
+from Entidades.models import Transaction, TransactionType
+
+AS_OF = date(2024, 1, 1)
+
+
+def ledger_of(*rows) -> TransactionLedger:
+    ledger = TransactionLedger()
+    ledger.extend(Transaction(asset_id=asset_id, type=kind, date=day, price=price, quantity=quantity)
+                  for asset_id, kind, day, price, quantity in rows)
+    return ledger
+
+
+def test_xirr_matches_a_simple_annual_return():
+    dates = np.array(['2023-01-01', '2024-01-01'], dtype='datetime64[D]')
+    assert xirr(dates, np.array([-100.0, 110.0])) == pytest.approx(0.10)
+    assert np.isnan(xirr(dates, np.array([100.0, 110.0])))
+
+
+def test_xirr_batch_solves_each_set():
+    dates = np.array(['2023-01-01', '2023-07-02', '2024-01-01'], dtype='datetime64[D]')
+    results = xirr_batch([(dates, np.array([-100.0, 0.0, 90.0])), (dates, np.array([-100.0, -100.0, 250.0]))])
+    assert results[0] == pytest.approx(-0.10)
+    npv = -100.0 - 100.0 / (1 + results[1]) ** (182 / 365) + 250.0 / (1 + results[1])
+    assert npv == pytest.approx(0.0, abs=1e-6)
+
+
+def test_time_weighted_return_ignores_external_flows():
+    assert time_weighted_return(np.array([100.0, 110.0, 220.0]), np.array([0.0, 0.0, 110.0])) == pytest.approx(0.10)
+
+
+def test_transfer_in_counts_as_a_contribution():
+    ledger = ledger_of(('A', TransactionType.TRANSFER, datetime(2023, 1, 1), 100.0, 10.0))
+    result = money_weighted_returns(ledger, {'A': 1100.0}, as_of=AS_OF)
+    assert result['A'] == pytest.approx(0.10)
+
+
+def test_buy_plus_transfer_is_not_inflated():
+    ledger = ledger_of(('A', TransactionType.BUY, datetime(2023, 1, 1), 100.0, 5.0),
+                       ('A', TransactionType.TRANSFER, datetime(2023, 1, 1), 100.0, 5.0),
+                       ('B', TransactionType.BUY, datetime(2023, 1, 1), 100.0, 10.0),
+                       ('B', TransactionType.TRANSFER, datetime(2023, 7, 2), 120.0, -5.0))
+    result = money_weighted_returns(ledger, {'A': 1100.0, 'B': 5.0 * 126.0}, as_of=AS_OF)
+    assert result['A'] == pytest.approx(0.10)
+    npv = -1000.0 + 600.0 / (1 + result['B']) ** (182 / 365) + 630.0 / (1 + result['B'])
+    assert npv == pytest.approx(0.0, abs=1e-6)
+
+
+def test_flow_series_agrees_with_the_money_weighted_flows():
+    ledger = ledger_of(('A', TransactionType.TRANSFER, datetime(2023, 1, 1), 100.0, 10.0),
+                       ('A', TransactionType.TRANSFER, datetime(2023, 1, 2), 100.0, -4.0))
+    dates = np.array(['2023-01-01', '2023-01-02'], dtype='datetime64[D]')
+    assert flow_series(ledger, dates).tolist() == [1000.0, -400.0]
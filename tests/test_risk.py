@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+
+from Analisis.risk import historical_var, rolling_historical_var, rolling_risk
+
+
+def test_rolling_historical_var_matches_trailing_window():
+    returns = np.random.default_rng(0).normal(0.0, 0.02, (400, 2))
+    returns[10, 0] = np.nan
+    rolling = rolling_historical_var(returns, 60)
+    assert np.isnan(rolling[:59]).all()
+    for end in (59, 200, 399):
+        assert rolling[end] == pytest.approx(historical_var(returns[:end + 1], window=60))
+
+
+def test_rolling_risk_series_have_the_input_shape():
+    returns = np.random.default_rng(1).normal(0.0, 0.01, 120)
+    series = rolling_risk(returns, window=30)
+    assert set(series) == {'volatility', 'sharpe', 'sortino', 'drawdown', 'historical_var', 'parametric_var'}
+    assert all(values.shape == returns.shape for values in series.values())
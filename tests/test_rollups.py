@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+
+from Analisis.rollups import PERIODS, PeriodRollups
+
+
+def make_rollups() -> PeriodRollups:
+    dates = np.arange(np.datetime64('2023-01-01'), np.datetime64('2024-12-31'))
+    values = 100.0 * np.cumprod(1.0 + np.sin(np.arange(len(dates))) / 100.0)
+    return PeriodRollups(dates, values)
+
+
+def test_today_is_a_single_point():
+    today = make_rollups().period('Hoy')
+    assert today['dates'].tolist() == [np.datetime64('2024-12-30')]
+
+
+@pytest.mark.parametrize('label', list(PERIODS))
+def test_period_return_matches_daily_values(label):
+    rollups = make_rollups()
+    daily = rollups.levels['daily']
+    days = PERIODS[label][1]
+    expected = daily['value'][-1] / daily['value'][-1 - days] - 1.0
+    assert rollups.period_return(label) == pytest.approx(expected)
+    if PERIODS[label][0] == 'daily':
+        assert len(rollups.period(label)['dates']) == days
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import struct
+from datetime import datetime
+
+import pytest
+
+from Datos.journal import PortfolioJournal
+from Datos.repository import PortfolioRepository
+from Datos.snapshot import MAGIC, SNAPSHOT_VERSION, load_snapshot, read_header, write_snapshot
+from Entidades.models import Asset, AssetType, Transaction
+from dashboard.Portfolio import Portfolio
+
+
+def make_portfolio(count: int = 20) -> Portfolio:
+    portfolio = Portfolio()
+    for code in range(count):
+        portfolio.add_asset(Asset(id=f"id{code}", symbol=f"SYM{code % 7}", name=f"Activo {code}",
+                                  type=list(AssetType)[code % len(AssetType)], quantity=1.0 + code,
+                                  purchase_price=5.0, current_price=10.0 + code % 3,
+                                  currency=['USD', 'ARS'][code % 2], category=['A', None][code % 2]))
+    portfolio.add_transactions([Transaction(asset_id=f"id{code}", date=datetime(2024, 1, 1 + code), price=5.0,
+                                            quantity=1.0, notes='nota' if code % 2 else None)
+                                for code in range(5)])
+    return portfolio
+
+
+def test_round_trip_loads_columns_consistently(tmp_path):
+    original = make_portfolio()
+    path = str(tmp_path / 'portfolio.snapshot')
+    write_snapshot(path, original.holdings, original.transactions, sequence=7, source=(1, 2))
+    restored = Portfolio()
+    header = load_snapshot(path, restored, source=(1, 2))
+    assert header['sequence'] == 7
+    assert restored.holdings.check_consistency() == []
+    assert restored.holdings.totals('currency') == original.holdings.totals('currency')
+    assert restored.holdings.text_column('id') == original.holdings.text_column('id')
+    assert [t.notes for t in restored.transactions] == [t.notes for t in original.transactions]
+    assert load_snapshot(path, Portfolio(), source=(1, 3)) is None
+
+
+@pytest.mark.parametrize('header', [b'{no es json', b'\xff\xfe', b'[1, 2]', b'{"sequence": 1}'])
+def test_corrupt_header_is_ignored(tmp_path, header):
+    path = tmp_path / 'portfolio.snapshot'
+    path.write_bytes(struct.pack('<8sII', MAGIC, SNAPSHOT_VERSION, len(header)) + header)
+    assert read_header(str(path)) is None
+    assert load_snapshot(str(path), Portfolio()) is None
+
+
+def test_damaged_section_leaves_target_empty(tmp_path):
+    original = make_portfolio()
+    path = tmp_path / 'portfolio.snapshot'
+    write_snapshot(str(path), original.holdings, original.transactions)
+    data = path.read_bytes().replace(b'"holdings.quantity"', b'"holdings.quantitx"', 1)
+    path.write_bytes(data)
+    target = Portfolio()
+    assert load_snapshot(str(path), target) is None
+    assert len(target.holdings) == 0 and not target.transactions
+
+
+def test_journal_sets_aside_a_snapshot_from_another_version(tmp_path):
+    path = tmp_path / 'portfolio.json'
+    path.write_text(json.dumps([{'id': 'a', 'symbol': 'AAA', 'name': 'A', 'type': 'STOCK',
+                                 'quantity': 1.0, 'current_price': 1.0}]))
+    journal_dir = tmp_path / 'journal'
+    journal_dir.mkdir()
+    (journal_dir / 'snapshot.bin').write_bytes(struct.pack('<8sII', MAGIC, SNAPSHOT_VERSION + 1, 2) + b'{}')
+    (journal_dir / 'journal.jsonl').write_text('{"seq":5,"op":"remove_asset","data":{"id":"x"}}\n')
+
+    with PortfolioJournal(str(journal_dir)) as journal:
+        assert not journal.has_data()
+        assert isinstance(journal.error, ValueError)
+    assert os.path.exists(journal_dir / 'snapshot.bin.unreadable')
+
+    repository = PortfolioRepository(str(path), price_store_root=None, journal_dir=str(journal_dir))
+    try:
+        assert repository.load().holdings.text_column('id') == ('a',)
+    finally:
+        repository.close()
+
+
+def test_view_rejects_add_transactions(tmp_path):
+    path = tmp_path / 'portfolio.json'
+    path.write_text('[]')
+    repository = PortfolioRepository(str(path), price_store_root=None)
+    with pytest.raises(TypeError):
+        repository.view().add_transactions([])